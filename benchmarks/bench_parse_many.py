@@ -0,0 +1,56 @@
+"""
+parse_many scaling benchmark, parses the same batch of definitions with an
+increasing number of worker processes.
+
+    $ python benchmarks/bench_parse_many.py --sources 20000 --unique 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from django.conf import settings
+if not settings.configured:
+    settings.configure()
+
+from param_field.parser import parse_many
+
+
+def make_sources(count, unique):
+    """Generate count definitions with only unique distinct ones"""
+    sources = []
+    for i in range(count):
+        n = i % unique
+        sources.append(
+            'width_{0}: Dimmension-> max:{1}.0 min:1.0 default:2.0\n'
+            'count_{0}: Integer-> choices:[1, 2, 3, {1}] default:2\n'
+            'label_{0}: Text-> max_length:30 label:"Label {0}"\n'
+            'painted_{0}: Bool-> default:False'.format(n, n+10))
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sources', type=int, default=20000)
+    parser.add_argument('--unique', type=int, default=5000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    sources = make_sources(args.sources, args.unique)
+
+    baseline = None
+    workers = 1
+    while workers <= args.max_workers:
+        start = time.perf_counter()
+        parse_many(sources, workers=workers)
+        elapsed = time.perf_counter()-start
+        baseline = baseline or elapsed
+        print("workers: {:3d}  time: {:8.3f}s  speedup: {:5.2f}x".format(
+            workers, elapsed, baseline/elapsed))
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Pathological input benchmark, times the parser on crafted definitions of
+increasing size and reports how the time grows each time the size doubles.
+Linear growth shows up as a ratio close to 2.0.
+
+Resource limits are disabled so the grammar itself is measured, use
+--limits to enable the PARAM_MAX_* limits suggested for untrusted input.
+
+    $ python benchmarks/bench_pathological.py [--limits]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+PATTERNS = {
+    # Many fields
+    'fields': lambda n: '\n'.join('f{}: Integer-> max:10'.format(i) for i in range(n)),
+    # Long choices list
+    'choices': lambda n: 'a: Integer-> choices:[{}]'.format(', '.join(['1']*n)),
+    # Long number literal, ends in an out of range error
+    'number': lambda n: 'a: Decimal-> default:{}.0'.format('9'*n),
+    # Escaped quotes, ends in a length error
+    'escapes': lambda n: 'a: Text-> default:"{}"'.format('\\"'*n),
+    # Unterminated string forces every alternative to fail
+    'unterminated': lambda n: 'a: Text-> label:"{}'.format('x'*n),
+    # Repeated properties, fails in Param validation
+    'properties': lambda n: 'a: Integer->{}'.format(' max:10'*n),
+    # Partial field prefixes that never complete
+    'prefixes': lambda n: 'a: Integer ' + 'b: '*n,
+    # Nested brackets
+    'brackets': lambda n: 'a: Integer-> choices:' + '['*n + '1' + ']'*n,
+}
+
+
+def time_parse(parse, source, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            parse(source)
+        except Exception:
+            pass
+        elapsed = time.perf_counter()-start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limits', action='store_true', default=False)
+    parser.add_argument('--min-size', type=int, default=250)
+    parser.add_argument('--steps', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from django.conf import settings
+    if not settings.configured:
+        if args.limits:
+            settings.configure(PARAM_MAX_FIELDS=200, PARAM_MAX_CHOICES=100,
+                PARAM_MAX_TOKENS=10000)
+        else:
+            settings.configure()
+
+    from param_field.parser import parse_fields
+
+    worst = 0
+    for name, pattern in sorted(PATTERNS.items()):
+        size, previous = args.min_size, None
+        ratios = []
+        line = "{:14s}".format(name)
+        for _ in range(args.steps):
+            elapsed = time_parse(parse_fields, pattern(size), args.repeat)
+            line += " {:6d}:{:8.4f}s".format(size, elapsed)
+            if previous:
+                ratios.append(elapsed/previous)
+            previous, size = elapsed, size*2
+
+        max_ratio = max(ratios) if ratios else 0
+        worst = max(worst, max_ratio)
+        print(line + "   max ratio: {:5.2f}".format(max_ratio))
+
+    print("worst ratio when doubling size: {:.2f} (linear ~2.0)".format(worst))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Pickle size and speed of ParamDict, using its compact __reduce__ and the
+default pickling of an OrderedDict subclass with the Params full __dict__
+(the format used before __reduce__ was implemented).
+
+    $ python benchmarks/bench_pickle.py [--sizes 1 10 50 200]
+"""
+import argparse
+import copyreg
+import io
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def default_reduce_param(param):
+    state = dict(param.__dict__)
+    state['_prop_type_dict'] = dict(param._property_types())
+    return (copyreg.__newobj__, (param.__class__,), state)
+
+def default_reduce_params(params):
+    return (params.__class__, (), dict(params.__dict__), None, iter(params.items()))
+
+
+def default_dumps(obj, protocol):
+    from param_field.parser import FIELD_TO_PARAM
+    from param_field.params import ParamDict
+
+    f = io.BytesIO()
+    pickler = pickle.Pickler(f, protocol)
+    pickler.dispatch_table = copyreg.dispatch_table.copy()
+    pickler.dispatch_table[ParamDict] = default_reduce_params
+    for cls in FIELD_TO_PARAM.values():
+        pickler.dispatch_table[cls] = default_reduce_param
+    pickler.dump(obj)
+    return f.getvalue()
+
+
+def best_time(func, repeat=5, number=100):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter()-start)/number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(params, size, canonical, protocol):
+    default = default_dumps(params, protocol)
+    compact = pickle.dumps(params, protocol)
+    assert pickle.loads(default).to_str() == pickle.loads(compact).to_str()
+
+    times = [
+        best_time(lambda: default_dumps(params, protocol)),
+        best_time(lambda: pickle.dumps(params, protocol)),
+        best_time(lambda: pickle.loads(default)),
+        best_time(lambda: pickle.loads(compact)),
+    ]
+    return "{:6d} {:>9s} {:10d} {:10d} {:6.1f}% ".format(size,
+        'canonical' if canonical else 'raw', len(default), len(compact),
+        100.0*len(compact)/len(default)) +\
+        ' '.join("{:9.3f}ms".format(t*1000) for t in times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--protocol', type=int, default=pickle.HIGHEST_PROTOCOL)
+    args = parser.parse_args()
+
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure()
+
+    from param_field.generator import DefinitionGenerator
+    from param_field.params import ParamDict
+
+    protocol = args.protocol
+    print("{:>6s} {:>9s} {:>10s} {:>10s} {:>7s} {:>11s} {:>11s} {:>11s} {:>11s}".format(
+        'fields', 'source', 'default', 'compact', 'ratio', 'dumps def', 'dumps new',
+        'loads def', 'loads new'))
+    for size in args.sizes:
+        # Canonical definitions, as stored after paramfield_canonicalize,
+        # don't need to pickle the source
+        for canonical in (False, True):
+            source = DefinitionGenerator(seed=size, choices_ratio=0.3,
+                    canonical=canonical).definition(size)
+            print(bench(ParamDict(source), size, canonical, protocol))
+
+
+if __name__ == '__main__':
+    main()
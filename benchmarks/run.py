@@ -0,0 +1,246 @@
+"""
+Benchmark suite for the parse, load, validate, form and serialization paths.
+
+Runs offline against an in-memory SQLite database, using synthetic
+definitions with 1, 10, 50 and 200 fields that include every parameter
+type and large choices lists. Results are stored as JSON in
+benchmarks/results/<git revision>.json, and can be compared with the
+results from another commit to spot regressions:
+
+    $ python benchmarks/run.py
+    $ python benchmarks/run.py --compare benchmarks/results/<revision>.json
+    $ python benchmarks/run.py --filter parse_fields --sizes 10 50
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from django.conf import settings
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=['param_field'],
+        DATABASES={'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:'}},
+        TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'APP_DIRS': True}],
+        PARAM_FIELD_MAX_LENGTH=1000000,
+        PARAM_QUARANTINE_SIZE=0)
+
+import django
+django.setup()
+
+from django.db import connection, models
+from param_field.models import ParamField, ParamManager
+from param_field.params import ParamDict
+from param_field.parser import parse_fields
+
+
+SIZES = [1, 10, 50, 200]
+
+CHOICES_SIZE = 100
+
+# One definition of each type, the choices lists are large
+FIELD_TEMPLATES = [
+    'int_{0}: Integer-> min:0 max:1000 default:2 label:"Integer {0}" '
+        'choices:[' + ', '.join(str(i*2) for i in range(CHOICES_SIZE)) + ']',
+    'dec_{0}: Decimal-> max_digits:8 max_decimals:2 min:0.0 max:100.0 default:3.50',
+    'dim_{0}: Dimmension-> max:50.0 min:5.0 default:10.0 help_text:"Dimmension {0}"',
+    'bool_{0}: Bool-> default:False label:"Bool {0}"',
+    'text_{0}: Text-> max_length:30 default:"c1" '
+        'choices:[' + ', '.join('"c{}"'.format(i) for i in range(CHOICES_SIZE)) + ']',
+    'area_{0}: TextArea-> max_length:300 required:False',
+    'file_{0}: File-> label:"File {0}" required:False',
+    'image_{0}: Image-> help_text:"Image {0}" required:False',
+]
+
+
+def make_definition(fields):
+    """Definition with the requested number of fields cycling through types"""
+    return '\n'.join(FIELD_TEMPLATES[i%len(FIELD_TEMPLATES)].format(i)
+            for i in range(fields))
+
+
+def make_request(params):
+    """Valid request with a value for each parameter"""
+    request = {}
+    for name, param in params.items():
+        default = getattr(param, 'default', None)
+        request[name] = default if default is not None else param.native_type('1')
+    return request
+
+
+class BenchProduct(models.Model):
+    params = ParamField(file_support=True)
+
+    objects = ParamManager()
+
+    class Meta:
+        app_label = 'param_field'
+
+
+def timeit(func, repeat, number):
+    """Return (best, median) seconds per call"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter()-start)/number)
+    return min(times), statistics.median(times)
+
+
+def bench_parse_fields(size, rows):
+    source = make_definition(size)
+    return lambda: parse_fields(source, file_support=True)
+
+def bench_from_db_value(size, rows):
+    """Load rows rows, parsing each one in from_db_value"""
+    BenchProduct.objects.all().delete()
+    source = make_definition(size)
+    BenchProduct.objects.bulk_create(
+        [BenchProduct(params=source+'\n'*(i%4)) for i in range(rows)])
+    return lambda: list(BenchProduct.objects.all())
+
+def bench_with_parsed_params(size, rows):
+    """Load rows rows, parsing each distinct definition once"""
+    bench_from_db_value(size, rows)
+    return lambda: list(BenchProduct.objects.with_parsed_params())
+
+def bench_validate(size, rows):
+    params = ParamDict(make_definition(size), file_support=True)
+    request = make_request(params)
+    return lambda: params.validate(request)
+
+def bench_add_defaults(size, rows):
+    params = ParamDict(make_definition(size), file_support=True)
+    return lambda: params.add_defaults({})
+
+def bench_form(size, rows):
+    params = ParamDict(make_definition(size), file_support=True)
+    return lambda: params.form()
+
+def bench_form_render(size, rows):
+    params = ParamDict(make_definition(size), file_support=True)
+    return lambda: params.form().as_p()
+
+def bench_to_str(size, rows):
+    """Serialization without memoized strings"""
+    params = ParamDict(make_definition(size), file_support=True)
+    items = list(params.values())
+    return lambda: [p._render_str() for p in items]
+
+def bench_to_str_memoized(size, rows):
+    params = ParamDict(make_definition(size), file_support=True)
+    return lambda: params.to_str()
+
+
+BENCHMARKS = [
+    ('parse_fields', bench_parse_fields),
+    ('from_db_value', bench_from_db_value),
+    ('with_parsed_params', bench_with_parsed_params),
+    ('validate', bench_validate),
+    ('add_defaults', bench_add_defaults),
+    ('form', bench_form),
+    ('form_render', bench_form_render),
+    ('to_str', bench_to_str),
+    ('to_str_memoized', bench_to_str_memoized),
+]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BENCH_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, previous, threshold):
+    """Print change against previous results, returns number of regressions"""
+    regressions = 0
+    for name, result in sorted(results.items()):
+        if name not in previous:
+            continue
+        change = result['best']/previous[name]['best']-1.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print("{:32s} {:+7.1%}{}".format(name, change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--rows', type=int, default=50,
+            help="Rows loaded by the db benchmarks")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2,
+            help="Min seconds for each timing run")
+    parser.add_argument('--filter', default=None,
+            help="Only run benchmarks containing this string")
+    parser.add_argument('--output', default=None,
+            help="Results file (default results/<git revision>.json)")
+    parser.add_argument('--compare', default=None, help="Previous results file")
+    parser.add_argument('--threshold', type=float, default=0.10,
+            help="Slowdown reported as regression (default 0.10)")
+    args = parser.parse_args()
+
+    with connection.schema_editor() as editor:
+        editor.create_model(BenchProduct)
+
+    results = {}
+    for bench_name, bench in BENCHMARKS:
+        if args.filter and args.filter not in bench_name:
+            continue
+        for size in args.sizes:
+            name = '{}[{}]'.format(bench_name, size)
+            func = bench(size, args.rows)
+
+            # Calibrate number of calls per run
+            start = time.perf_counter()
+            func()
+            once = max(time.perf_counter()-start, 1e-7)
+            number = max(1, int(args.min_time/once))
+
+            best, median = timeit(func, args.repeat, number)
+            results[name] = {'best': best, 'median': median, 'number': number}
+            print("{:32s} best: {:12.6f}ms  median: {:12.6f}ms".format(
+                name, best*1000, median*1000))
+
+    revision = git_revision()
+    output = args.output or os.path.join(BENCH_DIR, 'results', revision+'.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'revision': revision,
+            'date': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'rows': args.rows,
+            'results': results}, f, indent=2, sort_keys=True)
+    print("Results stored in", output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['results']
+        regressions = compare(results, previous, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
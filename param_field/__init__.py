@@ -1,2 +1,2 @@
-from .models import ParamField
+from .models import ParamField, ParamQuerySet, ParamManager
 from .params import ParamDict
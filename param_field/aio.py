@@ -0,0 +1,207 @@
+"""
+asyncio counterparts of the CPU bound operations: parse, validate and form
+(kept out of params.py so the package still imports on Python < 3.5). The
+work is sent to the executor configured with PARAM_ASYNC_EXECUTOR so it
+doesn't block the event loop, except when it's cheap enough to run inline:
+definitions in the process cache, definitions shorter than
+PARAM_ASYNC_INLINE_SIZE and ParamDicts with up to PARAM_ASYNC_INLINE_FIELDS
+parameters. Lookups in the shared file and the
+Django cache are I/O, so they run in the executor with the parse.
+"""
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+import asyncio
+import functools
+import threading
+from .conf import settings
+from .cache import definition_cache
+from .params import ParamDict
+from .parser import parse_fields
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the executor used to offload work, or None to run it inline"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            return _executor
+
+        kind = settings.PARAM_ASYNC_EXECUTOR
+        if kind is None:
+            return None
+        elif kind == 'thread':
+            _executor = ThreadPoolExecutor(settings.PARAM_ASYNC_WORKERS)
+        elif kind == 'process':
+            _executor = ProcessPoolExecutor(settings.PARAM_ASYNC_WORKERS)
+        else:
+            raise ValueError("PARAM_ASYNC_EXECUTOR must be 'thread', 'process' "
+                    "or None, received '{}'".format(kind))
+        return _executor
+
+
+def set_executor(executor):
+    """
+    Use executor instead of the one configured in the settings, the
+    previous one isn't shut down.
+
+    Arguments:
+        executor (concurrent.futures.Executor): None reverts to the settings
+    """
+    global _executor
+    with _executor_lock:
+        _executor = executor
+
+
+async def run(func, *args, **kwargs):
+    """Run func in the executor, or inline when there isn't one"""
+    call = functools.partial(func, *args, **kwargs)
+    executor = get_executor()
+    if executor is None:
+        return call()
+    return await asyncio.get_event_loop().run_in_executor(executor, call)
+
+
+async def _run_in_thread(executor, func, *args, **kwargs):
+    """Run func in executor, or in the loop's default thread executor when
+    it's a process pool"""
+    if isinstance(executor, ProcessPoolExecutor):
+        executor = None
+    return await asyncio.get_event_loop().run_in_executor(executor,
+            functools.partial(func, *args, **kwargs))
+
+
+async def parse(source, file_support=False):
+    """
+    Async ParamDict(source, file_support), the parsed fields are stored in
+    the definition cache when it's enabled.
+
+    Raises:
+        ParseBaseException, ValueError: Invalid definition
+    """
+    if not source:
+        fields = {}
+    elif definition_cache.local_only:
+        fields = definition_cache.get(source, file_support)
+        if fields is None:
+            if len(source) <= settings.PARAM_ASYNC_INLINE_SIZE:
+                fields = parse_fields(source, file_support)
+            else:
+                fields = await run(parse_fields, source, file_support)
+            definition_cache.set(source, file_support, fields)
+    elif not isinstance(get_executor(), ProcessPoolExecutor):
+        fields = await run(definition_cache.load, source, file_support)
+    else:
+        # The cache can't be pickled, only the parse is sent to the process
+        executor = get_executor()
+        fields = await _run_in_thread(executor, definition_cache.get, source, file_support)
+        if fields is None:
+            fields = await run(parse_fields, source, file_support)
+            await _run_in_thread(executor, definition_cache.set, source, 
+                    file_support, fields)
+
+    params = ParamDict(source, file_support, parse=False)
+    params._set_fields(fields)
+    return params
+
+
+async def validate(params, request):
+    """Async params.validate(request)"""
+    executor = get_executor()
+    if executor is None or len(params) <= settings.PARAM_ASYNC_INLINE_FIELDS:
+        return params.validate(request)
+
+    # Pickling the ParamDict to a process on each call costs more than
+    # the validation, it runs in a thread instead
+    return await _run_in_thread(executor, params.validate, request)
+
+
+async def form(params, *args, **kwargs):
+    """Async params.form(*args, **kwargs)"""
+    executor = get_executor()
+    if executor is None or len(params) <= settings.PARAM_ASYNC_INLINE_FIELDS:
+        return params.form(*args, **kwargs)
+
+    # Forms can't be pickled, so they are built in a thread
+    return await _run_in_thread(executor, params.form, *args, **kwargs)
+
+
+class ParamAsyncIterator(object):
+    """
+    Async iterator yielding a (pk, ParamDict) tuple for each row of a
+    queryset. Rows are fetched and parsed in chunks by a thread owned by
+    the iterator, so the db cursor and connection are only used from it.
+
+    Arguments:
+        queryset (QuerySet):
+        field_name (str): ParamField name
+        chunk_size (int): Rows fetched at once
+    """
+    def __init__(self, queryset, field_name, chunk_size=2000):
+        self.queryset = queryset
+        self.field = queryset.model._meta.get_field(field_name)
+        self.chunk_size = chunk_size
+        self._rows = None
+        self._buffer = deque()
+        self._executor = ThreadPoolExecutor(1)
+        self._done = False
+
+    def _fetch(self):
+        """Read and parse the next chunk, runs in the iterator's thread"""
+        from .models import iter_param_sources # Solve circular import
+        if self._rows is None:
+            self._rows = iter_param_sources(self.queryset, self.field, self.chunk_size)
+
+        chunk = list(islice(self._rows, self.chunk_size))
+        if not chunk:
+            self._close_connections()
+            return []
+        values = self.field.from_db_values([source for pk, source in chunk])
+        return [(pk, params) for (pk, _), params in zip(chunk, values)]
+
+    def _close_connections(self):
+        from django.db import connections
+        self._rows = None
+        for connection in connections.all():
+            connection.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._buffer:
+            if self._done:
+                raise StopAsyncIteration
+            chunk = await asyncio.get_event_loop().run_in_executor(
+                    self._executor, self._fetch)
+            if not chunk:
+                self._done = True
+                self._executor.shutdown(wait=False)
+                raise StopAsyncIteration
+            self._buffer.extend(chunk)
+
+        return self._buffer.popleft()
+
+    async def aclose(self):
+        """Release the thread and its db connection when the iteration is
+        abandoned before the end"""
+        if not self._done:
+            self._done = True
+            self._buffer.clear()
+            await asyncio.get_event_loop().run_in_executor(
+                    self._executor, self._close_connections)
+            self._executor.shutdown(wait=False)
+
+
+def aiter_params(queryset, field_name, chunk_size=2000):
+    """
+    Iterate the ParamField values of a queryset from a coroutine:
+
+        async for pk, params in aiter_params(Product.objects.all(), 'params'):
+            ...
+    """
+    return ParamAsyncIterator(queryset, field_name, chunk_size)
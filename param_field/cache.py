@@ -0,0 +1,226 @@
+"""
+Cache of compiled definitions, a process LRU backed by an optional host wide
+memory mapped file (PARAM_SHARED_CACHE_PATH, see sharedcache.py) and an
+optional shared Django cache (PARAM_CACHE_ALIAS), so workers, short-lived
+processes and other hosts can skip parsing definitions already parsed
+elsewhere.
+
+Entries are keyed by the source digest (see quarantine.source_digest) and
+FORMAT_VERSION, and store the pickled parameters so each lookup returns new
+Param instances that can be modified without affecting other rows.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
+import pickle
+import threading
+from .conf import settings
+from .quarantine import source_digest
+from .sharedcache import SharedFileCache
+from .stats import stats
+
+
+logger = logging.getLogger('param_field.cache')
+
+# Increase when the pickled representation of Param changes
+FORMAT_VERSION = 2
+
+
+class DefinitionCache(object):
+    """
+    Arguments:
+        size (int): Max entries in the process LRU (0 disables it)
+        alias (str): Django cache used as second level (None disables it)
+        timeout (int): Seconds entries are kept in the Django cache
+        path (str): File shared by the processes of the host (None
+            disables it)
+        path_size (int): Bytes available in the shared file
+    """
+    def __init__(self, size=0, alias=None, timeout=None, path=None,
+            path_size=64*1024*1024):
+        self._lock = threading.Lock()
+        self._bypass = threading.local()
+        self._entries = OrderedDict()
+        self._file = None
+        self.configure(size, alias, timeout, path, path_size)
+
+    def configure(self, size=0, alias=None, timeout=None, path=None,
+            path_size=64*1024*1024):
+        self.size = size
+        self.alias = alias
+        self.timeout = timeout
+        self.path = path
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        if path is not None:
+            self._file = SharedFileCache(path, path_size, max(1024, path_size//1024))
+        self.enabled = bool(size) or alias is not None or path is not None
+        self.clear()
+
+    @contextmanager
+    def disabled(self):
+        """Bypass the cache in the calling thread within the with block, 
+        lookups miss and parsed definitions aren't stored. Blocks can be 
+        nested, other threads keep using the cache."""
+        self._bypass.depth = getattr(self._bypass, 'depth', 0)+1
+        try:
+            yield self
+        finally:
+            self._bypass.depth -= 1
+
+    @property
+    def bypassed(self):
+        """True within a disabled() block of the calling thread"""
+        return getattr(self._bypass, 'depth', 0) > 0
+
+    @property
+    def local_only(self):
+        """True when lookups don't leave the process memory (no shared file
+        or Django cache)"""
+        return self._file is None and self.alias is None
+
+    def key(self, source, file_support=False):
+        return 'param_field:{}:{}'.format(FORMAT_VERSION,
+                source_digest(source, file_support))
+
+    @staticmethod
+    def dumps(fields):
+        return pickle.dumps(list(fields.items()), pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def loads(payload):
+        return OrderedDict(pickle.loads(payload))
+
+    def _shared(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def _get_payload(self, key):
+        if self.size:
+            with self._lock:
+                payload = self._entries.get(key, None)
+                if payload is not None:
+                    self._entries.move_to_end(key)
+            if stats.enabled:
+                stats.incr('cache.local.hits' if payload is not None else 'cache.local.misses')
+            if payload is not None:
+                return payload
+
+        if self._file is not None:
+            payload = self._get_file(key)
+            if stats.enabled:
+                stats.incr('cache.file.hits' if payload is not None else 'cache.file.misses')
+            if payload is not None:
+                self._set_local(key, payload)
+                return payload
+
+        if self.alias is None:
+            return None
+
+        try:
+            payload = self._shared().get(key, None)
+        except Exception as err:
+            logger.warning("Couldn't read definition from cache '%s': %s", self.alias, err)
+            payload = None
+        if stats.enabled:
+            stats.incr('cache.shared.hits' if payload is not None else 'cache.shared.misses')
+
+        if payload is not None:
+            self._set_local(key, payload)
+            self._set_file(key, payload)
+        return payload
+
+    def _get_file(self, key):
+        try:
+            return self._file.get(key)
+        except (OSError, ValueError) as err:
+            logger.warning("Couldn't read shared cache file: %s", err)
+            return None
+
+    def _set_file(self, key, payload):
+        if self._file is None:
+            return
+        try:
+            self._file.set(key, payload)
+        except (OSError, ValueError) as err:
+            logger.warning("Couldn't write shared cache file: %s", err)
+
+    def _set_local(self, key, payload):
+        if not self.size:
+            return
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def get(self, source, file_support=False):
+        """Return the cached fields of a definition or None"""
+        if not self.enabled or self.bypassed:
+            return None
+
+        payload = self._get_payload(self.key(source, file_support))
+        if payload is None:
+            return None
+
+        try:
+            return self.loads(payload)
+        except Exception as err:
+            # Written by an incompatible version
+            logger.warning("Discarded cached definition: %s", err)
+            return None
+
+    def set(self, source, file_support, fields):
+        """
+        Store parsed definition
+
+        Arguments:
+            source (str): Definition string
+            file_support (bool):
+            fields (OrderedDict): parse_fields result
+        """
+        if not self.enabled or self.bypassed:
+            return
+
+        key = self.key(source, file_support)
+        payload = self.dumps(fields)
+        self._set_local(key, payload)
+        self._set_file(key, payload)
+        if self.alias is not None:
+            try:
+                self._shared().set(key, payload, self.timeout)
+            except Exception as err:
+                logger.warning("Couldn't store definition in cache '%s': %s",
+                        self.alias, err)
+
+    def load(self, source, file_support=False):
+        """
+        Return the fields of a definition from the cache, parsing and
+        caching it on a miss.
+
+        Raises:
+            ParseBaseException, ValueError: Invalid definition
+        """
+        from .parser import parse_fields # Solve circular import
+        fields = self.get(source, file_support)
+        if fields is None:
+            fields = parse_fields(source, file_support)
+            self.set(source, file_support, fields)
+        return fields
+
+    def clear(self, shared_file=False):
+        """Clear process LRU, and the shared file for all processes when
+        shared_file is True (the Django cache isn't modified)"""
+        with self._lock:
+            self._entries.clear()
+        if shared_file and self._file is not None:
+            self._file.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+definition_cache = DefinitionCache(settings.PARAM_CACHE_SIZE,
+        settings.PARAM_CACHE_ALIAS, settings.PARAM_CACHE_TIMEOUT,
+        settings.PARAM_SHARED_CACHE_PATH, settings.PARAM_SHARED_CACHE_SIZE)
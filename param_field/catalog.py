@@ -0,0 +1,188 @@
+"""
+Read-only catalog of compiled definitions, built offline with the
+paramfield_catalog command and memory mapped by services that only read
+definitions, so they don't parse nor warm up anything at startup.
+
+File layout:
+    header  magic, format version, pickle version, entries, index offset
+    data    pickled ParamDict of each definition (in canonical form)
+    index   (digest, offset, length) entries sorted by digest
+
+Definitions are looked up by fingerprint (see ParamDict.fingerprint) with a
+binary search over the index, and only unpickled when requested.
+"""
+import mmap
+import os
+import pickle
+import struct
+from .cache import FORMAT_VERSION
+from .params import _unpickle_param_dict
+
+
+MAGIC = b'PFCT'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHHIQ')    # magic, version, pickle version, entries, index offset
+HEADER_SIZE = 32
+INDEX = struct.Struct('<20sQI')      # digest, offset, length
+INDEX_SIZE = INDEX.size
+
+
+class CatalogWriter(object):
+    """
+    Build a catalog file, definitions are written to a temporary file as
+    they are added and it replaces path once closed. Only the index is kept
+    in memory.
+
+    Arguments:
+        path (str): Catalog file
+    """
+    def __init__(self, path):
+        self.path = path
+        self._tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(bytes(HEADER_SIZE))
+        self._index = {}
+        self._offset = 0
+
+    def add(self, params):
+        """
+        Add a ParamDict, returns False if an equivalent definition was
+        already added.
+        """
+        digest = bytes.fromhex(params.fingerprint)
+        if digest in self._index:
+            return False
+
+        # Stored without source nor loaded string, they are generated from
+        # the fields when needed
+        canonical = _unpickle_param_dict(None, params._file_support, None,
+                tuple(params.items()))
+        payload = pickle.dumps(canonical, pickle.HIGHEST_PROTOCOL)
+        self._file.write(payload)
+        self._index[digest] = (self._offset, len(payload))
+        self._offset += len(payload)
+        return True
+
+    def __len__(self):
+        return len(self._index)
+
+    def close(self):
+        """Write the index and replace the catalog file"""
+        index_offset = HEADER_SIZE+self._offset
+        for digest in sorted(self._index):
+            offset, length = self._index[digest]
+            self._file.write(INDEX.pack(digest, offset, length))
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, FORMAT_VERSION,
+            len(self._index), index_offset))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard the catalog being written"""
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class Catalog(object):
+    """
+    Memory mapped catalog file. Each lookup returns a new ParamDict that
+    can be modified without affecting later lookups.
+
+    Arguments:
+        path (str): Catalog file built by CatalogWriter
+
+    Raises:
+        ValueError: Not a catalog, or built by an incompatible version
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            if len(self._map) < HEADER_SIZE:
+                raise ValueError("'{}' isn't a definition catalog".format(path))
+            magic, version, pickle_version, self._count, self._index_offset = \
+                HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError("'{}' isn't a definition catalog".format(path))
+            if version != VERSION or pickle_version != FORMAT_VERSION:
+                raise ValueError("Catalog '{}' was built by an incompatible "
+                        "version, it must be rebuilt".format(path))
+        except ValueError:
+            self._map.close()
+            raise
+
+        self._view = memoryview(self._map)
+
+    def _digest(self, index):
+        start = self._index_offset+index*INDEX_SIZE
+        return self._map[start:start+20]
+
+    def _find(self, fingerprint):
+        """Return (offset, length) of a definition or None"""
+        try:
+            digest = bytes.fromhex(fingerprint)
+        except (TypeError, ValueError):
+            return None
+
+        low, high = 0, self._count
+        while low < high:
+            middle = (low+high)//2
+            if self._digest(middle) < digest:
+                low = middle+1
+            else:
+                high = middle
+
+        if low == self._count or self._digest(low) != digest:
+            return None
+        _, offset, length = INDEX.unpack_from(self._map,
+                self._index_offset+low*INDEX_SIZE)
+        return offset, length
+
+    def get(self, fingerprint, default=None):
+        """Return the ParamDict with fingerprint, or default"""
+        found = self._find(fingerprint)
+        if found is None:
+            return default
+        offset, length = found
+        start = HEADER_SIZE+offset
+        return pickle.loads(self._view[start:start+length])
+
+    def __getitem__(self, fingerprint):
+        params = self.get(fingerprint)
+        if params is None:
+            raise KeyError(fingerprint)
+        return params
+
+    def __contains__(self, fingerprint):
+        return self._find(fingerprint) is not None
+
+    def __len__(self):
+        return self._count
+
+    def fingerprints(self):
+        """Iterate the fingerprints in the catalog (sorted)"""
+        for index in range(self._count):
+            yield self._digest(index).hex()
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -46,5 +46,63 @@ class Settings(AppSettings):
     # Max_length used by ParamField when it isn't supplied
     PARAM_FIELD_MAX_LENGTH = 3000
 
+    # Enable pyparsing packrat memoization and its cache entries (None
+    # unbounded). Off by default, the grammar parses faster without it. The
+    # cache is a single process wide one, shared by all threads and all
+    # pyparsing grammars, so the size isn't per thread.
+    PARAM_PACKRAT = False
+    PARAM_PACKRAT_CACHE_SIZE = 128
+
+    # Invalid stored definitions remembered so they aren't parsed again
+    # each time they are loaded (0 disables it)
+    PARAM_QUARANTINE_SIZE = 1000
+
+    # Definition outlines cached by outline_fields
+    PARAM_OUTLINE_CACHE_SIZE = 1000
+
+    # Parser resource limits for untrusted definitions (None disables the 
+    # limit), they apply to every parse including stored values
+    PARAM_MAX_FIELDS = None
+    PARAM_MAX_CHOICES = None
+    PARAM_MAX_TOKENS = None
+    PARAM_PARSE_TIMEOUT = None # seconds
+
+    # Compiled definitions cached by each process (0 disables it) and Django
+    # cache shared by all the processes (None disables it), see cache.py
+    PARAM_CACHE_SIZE = 0
+    PARAM_CACHE_ALIAS = None
+    PARAM_CACHE_TIMEOUT = 86400 # seconds
+
+    # Memory mapped file shared by all the processes of a host, and bytes
+    # available for definitions (None disables it)
+    PARAM_SHARED_CACHE_PATH = None
+    PARAM_SHARED_CACHE_SIZE = 64*1024*1024
+
+    # Executor used by aio.parse, aio.validate and aio.form ('thread', 'process' or 
+    # None to run inline) and its workers (None for the executor default).
+    # Definitions up to PARAM_ASYNC_INLINE_SIZE characters, and validations
+    # and forms of up to PARAM_ASYNC_INLINE_FIELDS parameters run inline.
+    PARAM_ASYNC_EXECUTOR = 'thread'
+    PARAM_ASYNC_WORKERS = None
+    PARAM_ASYNC_INLINE_SIZE = 500
+    PARAM_ASYNC_INLINE_FIELDS = 10
+
+    # Fields ('app_label.Model.field') whose PARAM_WARMUP_DEFINITIONS most
+    # common definitions are preloaded into the definition cache by warmup()
+    # and the paramfield_warmup command
+    PARAM_WARMUP_FIELDS = []
+    PARAM_WARMUP_DEFINITIONS = 100
+
+    # Record counters and timing histograms (see param_field.stats)
+    PARAM_STATS = False
+
+    # Parses, validations and form builds slower than this are logged to
+    # the 'param_field.slow' logger (None disables it)
+    PARAM_SLOW_PARSE_MS = None
+
+    # Directory where slow operations are profiled with cProfile (None
+    # disables profiling)
+    PARAM_SLOW_PROFILE_DIR = None
+
 
 settings = Settings()
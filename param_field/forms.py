@@ -1,6 +1,7 @@
 from django import forms
 from .validators import *
 from .params import *
+from .stats import timed
 
 
 FORM_FIELD_CLASS = {
@@ -99,6 +100,7 @@ def StdFieldFactory(param, name):
         return FORM_FIELD_CLASS[type(param)](**field_args)
 
 
+@timed('form_field')
 def ParamFieldFactory(param, name):
     field_class = FORM_FIELD_CLASS[type(param)]
     if field_class in (forms.FileField, forms.ImageField):
@@ -0,0 +1,401 @@
+"""
+Synthetic definition and request generator, produces random but valid
+definitions within the configured limits, and matching valid and invalid
+requests for them. Used for benchmarks, load tests and fuzzing.
+
+    >>> gen = DefinitionGenerator(seed=1)
+    >>> params = ParamDict(gen.definition(20))
+    >>> params.validate(gen.valid_request(params))
+"""
+import random
+import string
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+from .conf import settings
+from .params import (ParamDict, BoolParam, IntegerParam, DecimalParam,
+        DimmensionParam, TextParam, TextAreaParam, FileParam, ImageParam)
+from .parser import is_valid_name
+
+
+TYPES = {
+    'Bool': BoolParam,
+    'Decimal': DecimalParam,
+    'Dimmension': DimmensionParam,
+    'Integer': IntegerParam,
+    'Text': TextParam,
+    'TextArea': TextAreaParam,
+    'File': FileParam,
+    'Image': ImageParam,
+}
+
+# Relative frequency of each type in generated definitions
+DEFAULT_TYPE_MIX = {
+    'Integer': 3,
+    'Decimal': 2,
+    'Dimmension': 2,
+    'Bool': 2,
+    'Text': 3,
+    'TextArea': 1,
+    'File': 1,
+    'Image': 1,
+}
+
+FILE_TYPES = ('File', 'Image')
+
+TEXT_CHARS = string.ascii_letters+string.digits+' '
+
+
+class DefinitionGenerator(object):
+
+    def __init__(self, seed=None, type_mix=None, property_density=0.5,
+            choices_ratio=0.2, choices_size=(2, 10), name_length=(4, 16),
+            file_support=False, canonical=False):
+        """
+        Arguments:
+            seed: Random seed, generated definitions are reproducible
+            type_mix (dict): Relative frequency of each type {type_name: weight}
+            property_density (float): Probability of each optional property
+                being defined (0.0-1.0)
+            choices_ratio (float): Probability of a parameter having choices
+            choices_size (tuple): (min, max) number of choices
+            name_length (tuple): (min, max) parameter name length
+            file_support (bool): Generate File and Image parameters
+            canonical (bool): Render fields as Param.to_str(), otherwise
+                properties are shuffled and the whitespace varies as in
+                hand-written definitions.
+        """
+        if type_mix is None:
+            type_mix = dict(DEFAULT_TYPE_MIX)
+            if not file_support:
+                for type_name in FILE_TYPES:
+                    del type_mix[type_name]
+
+        for type_name, weight in type_mix.items():
+            if type_name not in TYPES:
+                raise ValueError("Unknown type '{}'".format(type_name))
+            if type_name in FILE_TYPES and weight and not file_support:
+                raise ValueError("File parameters not supported")
+
+        self._types = [t for t, w in sorted(type_mix.items()) if w > 0]
+        self._weights = [type_mix[t] for t in self._types]
+        if not self._types:
+            raise ValueError("type_mix must contain at least one type")
+
+        max_choices = settings.PARAM_MAX_CHOICES
+        max_name = settings.PARAM_NAME_MAX_LENGTH
+        self.choices_size = (
+            max(1, min(choices_size[0], max_choices or choices_size[0])),
+            max(1, min(choices_size[1], max_choices or choices_size[1])))
+        self.name_length = (
+            max(1, min(name_length[0], max_name)),
+            max(1, min(name_length[1], max_name)))
+
+        self.property_density = property_density
+        self.choices_ratio = choices_ratio
+        self.file_support = file_support
+        self.canonical = canonical
+        self.rng = random.Random(seed)
+
+    def _maybe(self, probability=None):
+        if probability is None:
+            probability = self.property_density
+        return self.rng.random() < probability
+
+    def _text(self, min_length, max_length):
+        length = self.rng.randint(min_length, max_length)
+        return ''.join(self.rng.choice(TEXT_CHARS) for _ in range(length))
+
+    def _choices_count(self):
+        return self.rng.randint(*self.choices_size)
+
+    def name(self):
+        """Random valid parameter name"""
+        while True:
+            length = self.rng.randint(*self.name_length)
+            name = self.rng.choice(string.ascii_lowercase)+''.join(
+                self.rng.choice(string.ascii_lowercase+string.digits+'_')
+                for _ in range(length-1))
+            if is_valid_name(name):
+                return name
+
+    def _common_props(self, props):
+        if self._maybe():
+            props['label'] = self._text(1, min(24, settings.PARAM_LABEL_MAX_LENGTH))
+        if self._maybe():
+            props['help_text'] = self._text(1, min(80, settings.PARAM_HELP_TEXT_MAX_LENGTH))
+        if self._maybe():
+            props['required'] = False
+
+    def _hidden_props(self, props):
+        # Hidden parameters require a default value
+        if 'default' in props and self._maybe(self.property_density/4):
+            props['hidden'] = True
+
+    def _integer_value(self, lo, hi, parity=None):
+        value = self.rng.randint(lo, hi)
+        if parity is not None and value%2 != parity:
+            value = value+1 if value+1 <= hi else value-1
+        return value
+
+    def _integer_props(self, cls):
+        props = {}
+        self._common_props(props)
+        parity = None
+        if self._maybe():
+            parity = self.rng.choice((0, 1))
+            props['even' if parity == 0 else 'odd'] = True
+
+        lo, hi = settings.PARAM_INT_MIN, settings.PARAM_INT_MAX
+        magnitude = 10**self.rng.randint(1, 6)
+        a = self.rng.randint(-magnitude, magnitude)
+        b = self.rng.randint(-magnitude, magnitude)
+        a, b = min(a, b), max(a, b)
+        if parity is not None:
+            a += (a%2 != parity)
+            b -= (b%2 != parity)
+            b = max(a, b)
+
+        if self._maybe():
+            props['min'] = lo = a
+        if self._maybe():
+            props['max'] = hi = b
+
+        if self._maybe(self.choices_ratio):
+            props['choices'] = [self._integer_value(lo, hi, parity)
+                    for _ in range(self._choices_count())]
+        if self._maybe():
+            if 'choices' in props:
+                props['default'] = self.rng.choice(props['choices'])
+            else:
+                props['default'] = self._integer_value(lo, hi, parity)
+        self._hidden_props(props)
+        return props
+
+    def _decimal_value(self, lo, hi, max_digits, max_decimals):
+        """Random Decimal in [lo, hi] with at least one decimal, so it
+        is rendered as a real number"""
+        decimals = self.rng.randint(1, max(1, min(max_decimals, max_digits)))
+        units = 10**decimals
+        limit = 10**max_digits-1
+        lo_units = max(-limit, int((lo*units).to_integral_value(rounding=ROUND_CEILING)))
+        hi_units = min(limit, int((hi*units).to_integral_value(rounding=ROUND_FLOOR)))
+        if lo_units > hi_units:
+            # No value with that many decimals in the range
+            return lo
+        return Decimal(self.rng.randint(lo_units, hi_units)).scaleb(-decimals)
+
+    def _decimal_props(self, cls):
+        props = {}
+        self._common_props(props)
+        defaults = dict((name, default) for name, typ, default in cls.allowed_properties)
+
+        max_digits = defaults['max_digits']
+        max_decimals = defaults['max_decimals']
+        if self._maybe():
+            props['max_digits'] = max_digits = self.rng.randint(2, cls.abs_max_digits)
+        if self._maybe():
+            props['max_decimals'] = max_decimals = self.rng.randint(1,
+                    min(cls.abs_max_decimals, max_digits-1))
+        max_decimals = min(max_decimals, max_digits)
+
+        lo, hi = defaults['min'], defaults['max']
+        magnitude = Decimal(10**self.rng.randint(0, max(0, max_digits-max_decimals)))
+        limit_lo, limit_hi = max(lo, -magnitude), min(hi, magnitude)
+        a = self._decimal_value(limit_lo, limit_hi, max_digits, max_decimals)
+        b = self._decimal_value(limit_lo, limit_hi, max_digits, max_decimals)
+        if self._maybe():
+            props['min'] = lo = min(a, b)
+        if self._maybe():
+            props['max'] = hi = max(a, b)
+
+        if self._maybe(self.choices_ratio):
+            props['choices'] = [self._decimal_value(lo, hi, max_digits, max_decimals)
+                    for _ in range(self._choices_count())]
+        if self._maybe():
+            if 'choices' in props:
+                props['default'] = self.rng.choice(props['choices'])
+            else:
+                props['default'] = self._decimal_value(lo, hi, max_digits, max_decimals)
+        self._hidden_props(props)
+        return props
+
+    def _bool_props(self, cls):
+        props = {}
+        self._common_props(props)
+        if self._maybe():
+            props['default'] = self.rng.choice((True, False))
+        self._hidden_props(props)
+        return props
+
+    def _text_props(self, cls):
+        props = {}
+        self._common_props(props)
+        min_length, max_length = 0, settings.PARAM_TEXT_MAX_LENGTH
+        if self._maybe():
+            props['max_length'] = max_length = self.rng.randint(1, max_length)
+        if self._maybe():
+            props['min_length'] = min_length = self.rng.randint(0, min(max_length, 10))
+
+        # Keep generated strings short
+        text_max = min(max_length, min_length+20)
+        if self._maybe(self.choices_ratio):
+            props['choices'] = [self._text(min_length, text_max)
+                    for _ in range(self._choices_count())]
+        if self._maybe():
+            if 'choices' in props:
+                props['default'] = self.rng.choice(props['choices'])
+            else:
+                props['default'] = self._text(min_length, text_max)
+        self._hidden_props(props)
+        return props
+
+    def _file_props(self, cls):
+        props = {}
+        self._common_props(props)
+        return props
+
+    _props_generators = {
+        'Bool': _bool_props,
+        'Decimal': _decimal_props,
+        'Dimmension': _decimal_props,
+        'Integer': _integer_props,
+        'Text': _text_props,
+        'TextArea': _text_props,
+        'File': _file_props,
+        'Image': _file_props,
+    }
+
+    def param(self, type_name=None):
+        """Random Param of type_name, or of a type chosen using the type mix"""
+        if type_name is None:
+            type_name = self._weighted_type()
+        cls = TYPES[type_name]
+        return cls(**self._props_generators[type_name](self, cls))
+
+    def _weighted_type(self):
+        point = self.rng.uniform(0, sum(self._weights))
+        for type_name, weight in zip(self._types, self._weights):
+            point -= weight
+            if point <= 0:
+                return type_name
+        return self._types[-1]
+
+    def _render(self, name, param):
+        if self.canonical:
+            return "{}:{}".format(name, param.to_str())
+
+        props = []
+        for prop, typ, default in param.allowed_properties:
+            value = getattr(param, prop, default)
+            if value != default:
+                props.append('{}:{}'.format(prop, param.value_to_str(value)))
+
+        self.rng.shuffle(props)
+        sep = self.rng.choice((' ', ' ', '  ', '\n    '))
+        field_str = "{}{}:{}{}".format(name, self.rng.choice(('', ' ')),
+                self.rng.choice(('', ' ')), param.type_name)
+        if props:
+            field_str += self.rng.choice(('->', '-> ', ' -> '))+sep.join(props)
+        return field_str
+
+    def fields(self, count):
+        """Return a list of count (name, Param) tuples with unique names"""
+        max_fields = settings.PARAM_MAX_FIELDS
+        if max_fields is not None and count > max_fields:
+            raise ValueError("At most {} fields per definition (PARAM_MAX_FIELDS)"\
+                    .format(max_fields))
+
+        names = set()
+        fields = []
+        while len(fields) < count:
+            name = self.name()
+            if name in names:
+                continue
+            names.add(name)
+            fields.append((name, self.param()))
+        return fields
+
+    def definition(self, count):
+        """Random definition string with count fields"""
+        separator = '\n' if self.canonical else self.rng.choice(('\n', '\n\n'))
+        return separator.join(self._render(name, param)
+                for name, param in self.fields(count))
+
+    def _valid_value(self, param):
+        if getattr(param, 'hidden', False):
+            return param.default
+
+        choices = getattr(param, 'choices', None)
+        if choices:
+            return self.rng.choice(choices)
+
+        if isinstance(param, BoolParam):
+            return self.rng.choice((True, False))
+        elif isinstance(param, IntegerParam):
+            parity = 0 if param.even else 1 if param.odd else None
+            return self._integer_value(param.min, param.max, parity)
+        elif isinstance(param, DecimalParam):
+            return self._decimal_value(param.min, param.max, param.max_digits,
+                    param.max_decimals)
+        elif isinstance(param, FileParam):
+            return '{}.png'.format(self._text(1, 10).replace(' ', '_'))
+        else:
+            return self._text(param.min_length,
+                    min(param.max_length, param.min_length+20))
+
+    def valid_request(self, params):
+        """
+        Return a request that validates against params, parameters with
+        a default value are sometimes left out.
+
+        Arguments:
+            params (ParamDict):
+        """
+        request = {}
+        for name, param in params.items():
+            if param.required and param.get_default() is not None and self._maybe(0.25):
+                continue
+            request[name] = self._valid_value(param)
+        return request
+
+    def _invalid_value(self, param):
+        """Value that fails param validation, or None if there is none"""
+        if isinstance(param, BoolParam):
+            return 'True'
+        elif isinstance(param, IntegerParam):
+            return self.rng.choice((str(param.max), param.max+1, param.min-1))
+        elif isinstance(param, DecimalParam):
+            return self.rng.choice((int(param.max), param.max+1, param.min-1))
+        elif isinstance(param, FileParam):
+            return 1
+        else:
+            if param.max_length < settings.PARAM_TEXT_MAX_LENGTH or self._maybe():
+                return 'x'*(param.max_length+1)
+            return 1
+
+    def invalid_request(self, params):
+        """
+        Return a request that fails validation against params: a valid
+        request with a single parameter value of the wrong type or out of
+        its limits, a missing required parameter or an unknown parameter.
+
+        Arguments:
+            params (ParamDict):
+        """
+        request = self.valid_request(params)
+
+        missing = [name for name, param in params.items()
+                if param.required and param.get_default() is None]
+        strategy = self.rng.choice(('value', 'value', 'missing', 'unknown'))
+
+        if strategy == 'missing' and missing:
+            del request[self.rng.choice(missing)]
+        elif strategy != 'unknown' and len(params):
+            name = self.rng.choice(list(params.keys()))
+            request[name] = self._invalid_value(params[name])
+        else:
+            name = self.name()
+            while name in params:
+                name = self.name()
+            request[name] = 1
+
+        return request
@@ -0,0 +1,297 @@
+"""
+Lint of the definitions stored in files: '.params' files holding a single
+definition, and the ParamField values of the Django fixtures found in
+'fixtures' directories. Files are parsed on a process pool, and the results
+can be cached by content hash so unchanged files aren't parsed again.
+"""
+from pyparsing import ParseBaseException
+import hashlib
+import json
+import multiprocessing
+import os
+from .parser import field_spans, parse_fields
+
+
+# Increase when the cached results may change for the same content
+CACHE_VERSION = 2
+
+PARAMS_EXTENSION = '.params'
+FIXTURES_DIR = 'fixtures'
+
+
+def definition_errors(source, file_support=False):
+    """Return the (line, column, message) error of a definition, or None"""
+    try:
+        parse_fields(source, file_support)
+    except ParseBaseException as err:
+        return err.lineno, err.col, err.msg
+    except ValueError as err:
+        # Raised while building a Param, reported at the field start
+        return _invalid_field_position(source, file_support)+(str(err),)
+    return None
+
+
+def _position(text, offset):
+    """(line, column) of offset in text, both starting at 1"""
+    line = text.count('\n', 0, offset)+1
+    return line, offset-(text.rfind('\n', 0, offset)+1)+1
+
+
+def _invalid_field_position(source, file_support):
+    """(line, column) of the first field that can't be parsed"""
+    for start, end in field_spans(source):
+        try:
+            parse_fields(source[start:end], file_support)
+        except (ParseBaseException, ValueError):
+            while start < end and source[start].isspace():
+                start += 1
+            return _position(source, start)
+    return None, None
+
+
+def lint_params(text, file_support=False):
+    """Return the errors of a '.params' file as a list of dicts"""
+    error = definition_errors(text, file_support)
+    if error is None:
+        return []
+    line, column, message = error
+    return [{'line': line, 'column': column, 'message': message}]
+
+
+def lint_fixture(text):
+    """
+    Return the errors of the ParamField values in a JSON fixture, line and
+    column are the position of the value in the file (when it can be
+    found) and definition_line and definition_column the position of the
+    error within the definition.
+    """
+    from django.apps import apps
+    from django.core.exceptions import FieldDoesNotExist
+    from .models import ParamField # Solve circular import
+
+    try:
+        objects = json.loads(text)
+        if not isinstance(objects, list):
+            raise ValueError("Expected a list of objects")
+    except ValueError as err:
+        line, column = (err.lineno, err.colno) if hasattr(err, 'lineno') else (None, None)
+        return [{'line': line, 'column': column, 'message': 'Invalid fixture: {}'.format(err)}]
+
+    errors = []
+    for obj in objects:
+        try:
+            model = apps.get_model(obj['model'])
+            values = obj.get('fields', {})
+        except (KeyError, LookupError, TypeError, ValueError, AttributeError):
+            continue
+
+        for name, value in values.items():
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if not isinstance(field, ParamField) or not isinstance(value, str):
+                continue
+
+            error = definition_errors(value, field._file_support)
+            if error is None:
+                continue
+
+            offset = _find_value(text, value)
+            line, column = _position(text, offset) if offset >= 0 else (None, None)
+            errors.append({'line': line, 'column': column, 'message': error[2],
+                'model': obj['model'], 'pk': obj.get('pk', None), 'field': name,
+                'definition_line': error[0], 'definition_column': error[1]})
+    return errors
+
+
+def _find_value(text, value):
+    """Offset of the JSON string value in text, non-ASCII characters may be
+    written as is or escaped"""
+    offset = text.find(json.dumps(value, ensure_ascii=False))
+    if offset < 0:
+        offset = text.find(json.dumps(value))
+    return offset
+
+
+def fixture_signature():
+    """
+    Return a string identifying the ParamFields of the installed models, the
+    results of a fixture depend on them and not only on its content.
+    """
+    from django.apps import apps
+    from .models import ParamField # Solve circular import
+
+    fields = []
+    for model in apps.get_models():
+        for field in model._meta.fields:
+            if isinstance(field, ParamField):
+                fields.append('{}.{}:{}'.format(model._meta.label_lower,
+                    field.name, 'F' if field._file_support else 'N'))
+    return ' '.join(sorted(fields))
+
+
+def lint_text(kind, text, file_support=False):
+    if kind == 'fixture':
+        return lint_fixture(text)
+    return lint_params(text, file_support)
+
+
+def _lint_job(job):
+    """Pool worker, job is a (kind, text, file_support) tuple"""
+    return lint_text(*job)
+
+
+def file_kind(path):
+    """Return 'params', 'fixture' or None for the files that aren't linted"""
+    if path.endswith(PARAMS_EXTENSION):
+        return 'params'
+    if path.endswith('.json') and \
+            os.path.basename(os.path.dirname(os.path.abspath(path))) == FIXTURES_DIR:
+        return 'fixture'
+    return None
+
+
+def discover(paths):
+    """Yield the files to lint in paths (files or directories), hidden
+    directories are skipped"""
+    for path in paths:
+        if os.path.isfile(path):
+            if file_kind(path) is not None or path.endswith('.json'):
+                yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                if file_kind(file_path) is not None:
+                    yield file_path
+
+
+class LintCache(object):
+    """
+    Results cached by content hash, stored in a JSON file. Entries not used
+    by the last run are dropped when it's saved.
+
+    Arguments:
+        path (str): Cache file, None disables it
+    """
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._used = {}
+        if path is None or not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+            if cached.get('version') == CACHE_VERSION:
+                self._entries = cached['entries']
+        except (OSError, ValueError, KeyError, AttributeError):
+            # Rebuilt on save
+            pass
+
+    @staticmethod
+    def key(kind, text, file_support, signature=''):
+        """
+        Arguments:
+            kind (str): 'params' or 'fixture'
+            text (str): File content
+            file_support (bool): 
+            signature (str): Anything else the results depend on, see
+                fixture_signature()
+        """
+        prefix = '{}:{}:{}\n'.format(kind, 'F' if file_support else 'N', signature)
+        return hashlib.sha1((prefix+text).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        errors = self._entries.get(key, None)
+        if errors is not None:
+            self._used[key] = errors
+        return errors
+
+    def set(self, key, errors):
+        self._used[key] = errors
+
+    def save(self):
+        if self.path is None:
+            return
+        tmp_path = self.path+'.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self._used}, f)
+        os.replace(tmp_path, self.path)
+
+
+def lint_files(paths, workers=None, cache_path=None, file_support=False):
+    """
+    Lint the files found in paths.
+
+    Arguments:
+        paths (list): Files or directories
+        workers (int): Number of processes, defaults to the number of CPUs.
+            With 1 all files are parsed in the calling process.
+        cache_path (str): Results cache file, None (default) disables it
+        file_support (bool): Allow File and Image parameters in '.params' files
+
+    Returns:
+        (results, totals): results is a list of (path, errors) tuples in
+            discovery order, and totals a {'files', 'cached', 'errors'} dict
+    """
+    cache = LintCache(cache_path)
+    signature = None
+    results = []
+    pending = []
+    totals = {'files': 0, 'cached': 0, 'errors': 0}
+
+    for path in discover(paths):
+        totals['files'] += 1
+        kind = file_kind(path) or 'fixture'
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as err:
+            results.append((path, [{'line': None, 'column': None,
+                'message': "Couldn't read file: {}".format(err)}]))
+            continue
+
+        # Fixtures use the file support of each field
+        if kind == 'params':
+            key = cache.key(kind, text, file_support)
+        else:
+            if signature is None:
+                signature = fixture_signature()
+            key = cache.key(kind, text, False, signature)
+        errors = cache.get(key)
+        if errors is not None:
+            totals['cached'] += 1
+            results.append((path, errors))
+        else:
+            results.append((path, None))
+            pending.append((len(results)-1, key, (kind, text, file_support)))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(pending))
+
+    jobs = [job for _, _, job in pending]
+    if workers <= 1:
+        linted = [_lint_job(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            linted = pool.map(_lint_job, jobs,
+                    chunksize=max(1, len(jobs)//(workers*4)))
+        finally:
+            pool.terminate()
+            pool.join()
+
+    for (index, key, _), errors in zip(pending, linted):
+        cache.set(key, errors)
+        results[index] = (results[index][0], errors)
+
+    totals['errors'] = sum(len(errors) for _, errors in results)
+    try:
+        cache.save()
+    except OSError:
+        pass
+    return results, totals
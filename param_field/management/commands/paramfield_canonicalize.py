@@ -0,0 +1,141 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from collections import OrderedDict
+from itertools import islice
+import difflib
+import json
+import os
+from param_field.models import get_param_field, iter_param_sources
+from param_field.params import ParamDict
+from param_field.parser import parse_many
+
+
+# Max canonical forms remembered between chunks
+CACHE_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = "Rewrite the definitions stored in a ParamField column in canonical "\
+           "form, so equivalent definitions are stored with the same string."
+
+    def add_arguments(self, parser):
+        parser.add_argument('field', metavar='app_label.Model.field')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+            help="Rows read and written in each transaction (default 1000)")
+        parser.add_argument('--workers', type=int, default=1,
+            help="Processes used for parsing (default 1)")
+        parser.add_argument('--start-after', default=None, metavar='PK',
+            help="Only rows with a greater primary key")
+        parser.add_argument('--checkpoint', default=None, metavar='FILE',
+            help="File storing the last processed primary key, used to "
+                 "resume an interrupted run")
+        parser.add_argument('--dry-run', action='store_true', default=False,
+            help="Show a diff of the changes without writing them")
+
+    def handle(self, *args, **options):
+        try:
+            model, field = get_param_field(options['field'])
+        except (LookupError, ValueError) as err:
+            raise CommandError(str(err))
+
+        checkpoint = options['checkpoint']
+        start_after = options['start_after']
+        if start_after is None and checkpoint and os.path.exists(checkpoint):
+            start_after = self.read_checkpoint(checkpoint, options['field'])
+
+        queryset = model._default_manager.exclude(**{field.attname+'__isnull': True})
+        if start_after is not None:
+            queryset = queryset.filter(pk__gt=start_after)
+            self.stdout.write("Starting after pk {}".format(start_after))
+        queryset = queryset.order_by('pk')
+
+        self.canonical = OrderedDict()
+        self.totals = {'rows': 0, 'changed': 0, 'invalid': 0}
+
+        chunk_size = max(1, options['chunk_size'])
+        rows = iter_param_sources(queryset, field, chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+
+            self.process_chunk(model, field, chunk, options)
+            if checkpoint and not options['dry_run']:
+                self.write_checkpoint(checkpoint, options['field'], chunk[-1][0])
+
+        self.stdout.write("{} rows, {} {}, {} invalid".format(
+            self.totals['rows'], self.totals['changed'],
+            'would change' if options['dry_run'] else 'changed',
+            self.totals['invalid']))
+
+    def canonicalize(self, sources, field, workers):
+        """Add the canonical form of sources to self.canonical, None for the
+        definitions that can't be parsed"""
+        pending = [s for s in sources if s not in self.canonical]
+        for source, fields in zip(pending,
+                parse_many(pending, field._file_support, workers)):
+            if isinstance(fields, Exception):
+                self.canonical[source] = None
+            else:
+                params = ParamDict(source, field._file_support, parse=False)
+                params._set_fields(fields)
+                self.canonical[source] = params.to_str()
+
+        while len(self.canonical) > max(CACHE_SIZE, len(sources)):
+            self.canonical.popitem(last=False)
+
+    def process_chunk(self, model, field, chunk, options):
+        # pks grouped by the stored definition
+        by_source = OrderedDict()
+        for pk, source in chunk:
+            by_source.setdefault(source, []).append(pk)
+
+        self.canonicalize(list(by_source.keys()), field, options['workers'])
+        self.totals['rows'] += len(chunk)
+
+        changes = []
+        for source, pks in by_source.items():
+            canonical = self.canonical[source]
+            if canonical is None:
+                self.totals['invalid'] += len(pks)
+            elif canonical != source:
+                changes.append((source, canonical, pks))
+
+        if options['dry_run']:
+            for source, canonical, pks in changes:
+                self.totals['changed'] += len(pks)
+                for pk in pks:
+                    self.write_diff(pk, source, canonical)
+            return
+
+        # Only rows still holding the definition that was read are updated,
+        # so changes made since then aren't overwritten.
+        manager = model._default_manager
+        with transaction.atomic(using=manager.db):
+            for source, canonical, pks in changes:
+                self.totals['changed'] += manager.filter(pk__in=pks,
+                    **{field.attname: source}).update(**{field.attname: canonical})
+
+    def write_diff(self, pk, source, canonical):
+        diff = difflib.unified_diff(source.splitlines(), canonical.splitlines(),
+            'pk:{} stored'.format(pk), 'pk:{} canonical'.format(pk), lineterm='')
+        for line in diff:
+            self.stdout.write(line)
+
+    def read_checkpoint(self, path, label):
+        try:
+            with open(path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as err:
+            raise CommandError("Invalid checkpoint file '{}': {}".format(path, err))
+
+        if checkpoint.get('field') != label:
+            raise CommandError("Checkpoint file '{}' belongs to '{}'".format(
+                path, checkpoint.get('field')))
+        return checkpoint['last_pk']
+
+    def write_checkpoint(self, path, label, pk):
+        tmp_path = path+'.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'field': label, 'last_pk': pk}, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from itertools import islice
+from param_field.catalog import CatalogWriter
+from param_field.models import get_param_field, iter_param_sources
+from param_field.params import ParamDict
+from param_field.parser import parse_many
+from param_field.quarantine import source_digest
+
+
+class Command(BaseCommand):
+    help = "Compile the distinct definitions stored in one or more ParamField "\
+           "columns into a memory mapped catalog file (see param_field.catalog)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', metavar='FILE')
+        parser.add_argument('fields', metavar='app_label.Model.field', nargs='+')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+            help="Rows read at once (default 2000)")
+        parser.add_argument('--workers', type=int, default=1,
+            help="Processes used for parsing (default 1)")
+
+    def handle(self, *args, **options):
+        fields = []
+        for label in options['fields']:
+            try:
+                fields.append(get_param_field(label))
+            except (LookupError, ValueError) as err:
+                raise CommandError(str(err))
+
+        self.totals = {'rows': 0, 'invalid': 0}
+        # Digests of the sources already parsed
+        self.seen = set()
+
+        chunk_size = max(1, options['chunk_size'])
+        try:
+            with CatalogWriter(options['output']) as writer:
+                for model, field in fields:
+                    queryset = model._default_manager\
+                        .exclude(**{field.attname+'__isnull': True})
+                    rows = iter_param_sources(queryset, field, chunk_size)
+                    while True:
+                        chunk = list(islice(rows, chunk_size))
+                        if not chunk:
+                            break
+                        self.process_chunk(writer, field, chunk, options['workers'])
+        except OSError as err:
+            raise CommandError("Couldn't write catalog '{}': {}".format(
+                options['output'], err))
+
+        self.stdout.write("{} definitions from {} rows written to {}, {} invalid "
+            "definitions skipped".format(len(writer), self.totals['rows'],
+                options['output'], self.totals['invalid']))
+
+    def process_chunk(self, writer, field, chunk, workers):
+        self.totals['rows'] += len(chunk)
+
+        pending = {}
+        for pk, source in chunk:
+            digest = source_digest(source, field._file_support)
+            if digest not in self.seen:
+                pending[digest] = source
+
+        sources = list(pending.values())
+        for source, fields in zip(sources,
+                parse_many(sources, field._file_support, workers)):
+            if isinstance(fields, Exception):
+                self.totals['invalid'] += 1
+                continue
+            params = ParamDict(source, field._file_support, parse=False)
+            params._set_fields(fields)
+            writer.add(params)
+        self.seen.update(pending.keys())
@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from param_field.generator import DefinitionGenerator
+from param_field.models import get_param_field
+
+
+class Command(BaseCommand):
+    help = "Fill a model table with rows containing random valid ParamField "\
+           "definitions, for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('field', metavar='app_label.Model.field')
+        parser.add_argument('count', type=int, help="Number of rows created")
+        parser.add_argument('--fields', type=int, default=10,
+            help="Fields per definition (default 10)")
+        parser.add_argument('--distinct', type=int, default=None,
+            help="Number of distinct definitions shared by the rows "
+                 "(default one per row)")
+        parser.add_argument('--density', type=float, default=0.5,
+            help="Probability of each optional property (default 0.5)")
+        parser.add_argument('--choices-ratio', type=float, default=0.2,
+            help="Probability of a parameter having choices (default 0.2)")
+        parser.add_argument('--canonical', action='store_true', default=False,
+            help="Store definitions in canonical form")
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            model, field = get_param_field(options['field'])
+        except (LookupError, ValueError) as err:
+            raise CommandError(str(err))
+
+        try:
+            generator = DefinitionGenerator(seed=options['seed'],
+                property_density=options['density'],
+                choices_ratio=options['choices_ratio'],
+                file_support=field._file_support,
+                canonical=options['canonical'])
+        except ValueError as err:
+            raise CommandError(str(err))
+
+        count, distinct = options['count'], options['distinct']
+        definitions = None
+        if distinct:
+            definitions = [self.definition(generator, options['fields'], field)
+                    for _ in range(distinct)]
+
+        batch_size = max(1, options['batch_size'])
+        created = 0
+        while created < count:
+            batch = []
+            for i in range(created, min(count, created+batch_size)):
+                if definitions:
+                    source = definitions[generator.rng.randrange(len(definitions))]
+                else:
+                    source = self.definition(generator, options['fields'], field)
+
+                # ParamField.pre_save stores the fingerprint in bulk_create
+                batch.append(model(**{field.attname: source}))
+
+            with transaction.atomic(using=model._default_manager.db):
+                model._default_manager.bulk_create(batch)
+            created += len(batch)
+
+        self.stdout.write("{} rows created in {}".format(created, options['field']))
+
+    def definition(self, generator, fields, field):
+        try:
+            source = generator.definition(fields)
+        except ValueError as err:
+            raise CommandError(str(err))
+
+        if field.max_length and len(source) > field.max_length:
+            raise CommandError("Generated definition longer than the field's "
+                "max_length ({}), use fewer --fields".format(field.max_length))
+        return source
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+import json
+from param_field.lint import lint_files
+
+
+class Command(BaseCommand):
+    help = "Check the definitions in '.params' files and in the ParamField "\
+           "values of fixtures, reporting the errors with their line and column."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', metavar='PATH', nargs='*', default=['.'],
+            help="Files or directories to lint (default current directory)")
+        parser.add_argument('--workers', type=int, default=None,
+            help="Processes used for parsing (default number of CPUs)")
+        parser.add_argument('--cache', metavar='FILE', default=None,
+            help="File caching the results of unchanged files (default none)")
+        parser.add_argument('--file-support', action='store_true', default=False,
+            help="Allow File and Image parameters in '.params' files")
+        parser.add_argument('--format', choices=('text', 'json'), default='text',
+            help="'text' (path:line:column: message) or 'json' (an object "
+                 "per line)")
+
+    def handle(self, *args, **options):
+        results, totals = lint_files(options['paths'], options['workers'],
+            options['cache'], options['file_support'])
+
+        for path, errors in results:
+            for error in errors:
+                if options['format'] == 'json':
+                    self.stdout.write(json.dumps(dict(error, path=path), sort_keys=True))
+                else:
+                    self.stdout.write(self.format_error(path, error))
+
+        summary = "{} files ({} cached), {} errors".format(totals['files'],
+            totals['cached'], totals['errors'])
+        if totals['errors']:
+            raise CommandError(summary)
+        self.stderr.write(summary)
+
+    def format_error(self, path, error):
+        location = ':'.join(str(error[k]) for k in ('line', 'column')
+                if error[k] is not None)
+        message = error['message']
+        if 'field' in error:
+            message = "{}(pk={}).{}: {}".format(error['model'], error['pk'],
+                error['field'], message)
+        return "{}:{}: {}".format(path, location, message) if location\
+            else "{}: {}".format(path, message)
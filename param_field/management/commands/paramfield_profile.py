@@ -0,0 +1,175 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from pyparsing import ParseBaseException, ParserElement
+import gc
+import time
+import tracemalloc
+from param_field.cache import definition_cache
+from param_field.models import get_param_field, iter_param_sources
+from param_field.parser import parse_fields
+from param_field.quarantine import source_digest
+
+
+class DefinitionProfile(object):
+    """Timings for one distinct definition"""
+
+    def __init__(self, pk, source):
+        self.pk = pk
+        self.size = len(source)
+        self.rows = 0
+        self.fields = 0
+        self.fingerprint = None
+        self.error = None
+        self.parse = 0.0
+        self.load = 0.0
+        self.form = 0.0
+
+    @property
+    def total(self):
+        return self.parse+self.load+self.form
+
+
+def weighted_percentile(values, percent):
+    """
+    Arguments:
+        values (list): (value, weight) tuples
+        percent (float): 0-100
+    """
+    values = sorted(values)
+    total = sum(w for v, w in values)
+    if not total:
+        return None
+
+    rank = total*percent/100.0
+    seen = 0
+    for value, weight in values:
+        seen += weight
+        if seen >= rank:
+            return value
+    return values[-1][0]
+
+
+def definition_memory(source, field):
+    """Bytes allocated by a loaded ParamDict (tracemalloc must be tracing)"""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    params = field._parse_db_value(source)
+    # Discard parser memoization, it isn't kept by the ParamDict
+    ParserElement.resetCache()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]-before
+    del params
+    return size
+
+
+class Command(BaseCommand):
+    help = "Time the parse, load and form build of the definitions stored in "\
+           "a ParamField column, and report percentiles, slowest definitions, "\
+           "deduplication ratio and memory per definition."
+
+    def add_arguments(self, parser):
+        parser.add_argument('field', metavar='app_label.Model.field')
+        parser.add_argument('--limit', type=int, default=None,
+            help="Max number of rows profiled")
+        parser.add_argument('--top', type=int, default=10,
+            help="Number of slowest definitions listed (default 10)")
+        parser.add_argument('--memory-sample', type=int, default=100,
+            help="Distinct definitions used to estimate memory (default 100, "
+                 "0 disables it)")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            model, field = get_param_field(options['field'])
+        except (LookupError, ValueError) as err:
+            raise CommandError(str(err))
+
+        queryset = model._default_manager.exclude(**{field.attname+'__isnull': True})\
+            .order_by('pk')
+        if options['limit']:
+            queryset = queryset[:options['limit']]
+
+        # Loads are timed parsing the definitions, not reading them from the
+        # definition cache or the shared file
+        with definition_cache.disabled():
+            profiles = {}
+            sample = []
+            rows = 0
+            start = time.perf_counter()
+            for pk, source in iter_param_sources(queryset, field, options['chunk_size']):
+                rows += 1
+                digest = source_digest(source, field._file_support)
+                profile = profiles.get(digest, None)
+                if profile is None:
+                    profile = profiles[digest] = self.profile(pk, source, field)
+                    if len(sample) < options['memory_sample']:
+                        sample.append(source)
+                profile.rows += 1
+            elapsed = time.perf_counter()-start
+
+            self.stdout.write(options['field'])
+            if not rows:
+                self.stdout.write("No rows")
+                return
+
+            self.report(profiles, rows, elapsed, options['top'])
+            if sample:
+                self.report_memory(sample, field)
+
+    def profile(self, pk, source, field):
+        profile = DefinitionProfile(pk, source)
+
+        start = time.perf_counter()
+        try:
+            parse_fields(source, field._file_support)
+        except (ParseBaseException, ValueError) as err:
+            profile.error = str(err)
+        profile.parse = time.perf_counter()-start
+
+        start = time.perf_counter()
+        params = field.from_db_value(source, None, connection, {})
+        profile.load = time.perf_counter()-start
+
+        start = time.perf_counter()
+        params.form()
+        profile.form = time.perf_counter()-start
+
+        profile.fields = len(params)
+        profile.fingerprint = params.fingerprint
+        return profile
+
+    def report(self, profiles, rows, elapsed, top):
+        distinct = len(profiles)
+        invalid = sum(p.rows for p in profiles.values() if p.error)
+        self.stdout.write("rows: {}  distinct: {}  dedup ratio: {:.2f}  invalid rows: {}"\
+            .format(rows, distinct, rows/float(distinct), invalid))
+        self.stdout.write("profiled in {:.2f}s".format(elapsed))
+
+        self.stdout.write("{:8s}{:>12s}{:>12s}{:>12s}{:>12s}".format(
+            '', 'p50', 'p90', 'p99', 'max'))
+        for name in ('parse', 'load', 'form', 'total'):
+            values = [(getattr(p, name), p.rows) for p in profiles.values()]
+            self.stdout.write("{:8s}".format(name)+''.join(
+                "{:10.3f}ms".format(weighted_percentile(values, percent)*1000)
+                for percent in (50, 90, 99, 100)))
+
+        self.stdout.write("slowest definitions:")
+        slowest = sorted(profiles.values(), key=lambda p: p.total, reverse=True)
+        for p in slowest[:top]:
+            self.stdout.write("  fingerprint:{} pk:{} rows:{} size:{} fields:{} "
+                "parse:{:.3f}ms load:{:.3f}ms form:{:.3f}ms{}".format(
+                p.fingerprint, p.pk, p.rows, p.size, p.fields, p.parse*1000,
+                p.load*1000, p.form*1000, ' error:'+p.error if p.error else ''))
+
+    def report_memory(self, sample, field):
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        try:
+            sizes = [definition_memory(s, field) for s in sample]
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+
+        self.stdout.write("memory per definition: {:.1f} KiB (mean of {}, max {:.1f} KiB)"\
+            .format(sum(sizes)/len(sizes)/1024.0, len(sizes), max(sizes)/1024.0))
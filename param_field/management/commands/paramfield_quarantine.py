@@ -0,0 +1,123 @@
+from django.core.management.base import BaseCommand, CommandError
+from pyparsing import ParseBaseException
+from param_field.models import get_param_field
+from param_field.parser import parse_fields, field_spans
+from param_field.quarantine import quarantine, source_digest
+
+
+def split_fields(source, file_support=False):
+    """Return (valid, invalid) lists with the field strings from source that
+    can and can't be parsed on their own."""
+    valid, invalid = [], []
+    for start, end in field_spans(source):
+        field_str = source[start:end].strip()
+        try:
+            parse_fields(field_str, file_support)
+            valid.append(field_str)
+        except (ParseBaseException, ValueError):
+            invalid.append(field_str)
+
+    return valid, invalid
+
+
+def salvage_fields(source, file_support=False):
+    """Return a definition string with only the fields from source that can
+    be parsed on their own."""
+    return '\n'.join(split_fields(source, file_support)[0])
+
+
+class Command(BaseCommand):
+    help = "List the rows whose ParamField definition can't be parsed, "\
+           "and optionally repair them keeping only their valid fields."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fields', nargs='+', metavar='app_label.Model.field')
+        parser.add_argument('--repair', action='store_true', default=False,
+            help="Replace invalid definitions with their valid fields, only "
+                 "when no field is lost unless --force is used")
+        parser.add_argument('--force', action='store_true', default=False,
+            help="Repair even when fields are dropped or nothing is left")
+        parser.add_argument('--dry-run', action='store_true', default=False,
+            help="Show the repairs without writing them")
+
+    def handle(self, *args, **options):
+        for label in options['fields']:
+            try:
+                model, field = get_param_field(label)
+            except (LookupError, ValueError) as err:
+                raise CommandError(str(err))
+
+            self.stdout.write(label)
+            invalid, repaired = self.check_field(model, field, options)
+            if options['repair']:
+                self.stdout.write("{} invalid rows, {} {}".format(invalid, repaired,
+                    'would be repaired' if options['dry_run'] else 'repaired'))
+            else:
+                self.stdout.write("{} invalid rows".format(invalid))
+
+    def get_error(self, value, field):
+        """Return parse error for a loaded ParamDict or None if valid"""
+        source = str(value)
+        entry = quarantine.get(source, field._file_support)
+        if entry is not None:
+            return entry.error
+
+        if len(value) or not source.strip():
+            return None
+
+        # Quarantine disabled
+        try:
+            parse_fields(source, field._file_support)
+        except (ParseBaseException, ValueError) as err:
+            return str(err)
+
+    def check_field(self, model, field, options):
+        rows = model._default_manager.exclude(**{field.attname+'__isnull': True})\
+            .order_by('pk').values_list('pk', field.attname).iterator()
+
+        invalid = repaired = 0
+        for pk, value in rows:
+            error = self.get_error(value, field)
+            if error is None:
+                continue
+
+            invalid += 1
+            source = str(value)
+            self.stdout.write("  pk:{} digest:{} error:{}".format(
+                pk, source_digest(source, field._file_support), error))
+
+            if options['repair'] and self.repair(model, field, pk, source, options):
+                repaired += 1
+
+        return invalid, repaired
+
+    def repair(self, model, field, pk, source, options):
+        """Replace the definition of a row with its valid fields, returns
+        True if it was (or would be) repaired"""
+        valid, invalid = split_fields(source, field._file_support)
+        for field_str in invalid:
+            self.stdout.write("    drop: {!r}".format(field_str))
+
+        if not options['force']:
+            if not valid:
+                self.stdout.write("    skipped: no valid fields left, use --force "
+                    "to clear the definition")
+                return False
+            if invalid:
+                self.stdout.write("    skipped: {} of {} fields would be dropped, "
+                    "use --force".format(len(invalid), len(valid)+len(invalid)))
+                return False
+
+        repaired = '\n'.join(valid)
+        if options['dry_run']:
+            self.stdout.write("    would repair: {!r}".format(repaired))
+            return True
+
+        # Only if it wasn't modified since it was read
+        updated = model._default_manager.filter(pk=pk, **{field.attname: source})\
+            .update(**{field.attname: repaired})
+        if updated:
+            self.stdout.write("    repaired: {!r}".format(repaired))
+        else:
+            self.stdout.write("    skipped: modified since it was read")
+        return bool(updated)
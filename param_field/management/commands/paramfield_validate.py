@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from pyparsing import ParseBaseException
+import sys
+from param_field.models import get_param_field
+from param_field.params import ParamDict
+from param_field.stream import FORMATS, validate_stream
+
+
+class Command(BaseCommand):
+    help = "Validate the records of a JSONL or CSV file against a definition, "\
+           "loaded from a ParamField row or a file, writing a JSON line with the "\
+           "result of each record."
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', metavar='FILE', help="Records file ('-' for stdin)")
+        parser.add_argument('--field', metavar='app_label.Model.field', default=None,
+            help="ParamField holding the definition, with --pk")
+        parser.add_argument('--pk', default=None,
+            help="Primary key of the row holding the definition")
+        parser.add_argument('--definition', metavar='FILE', default=None,
+            help="File holding the definition")
+        parser.add_argument('--file-support', action='store_true', default=False,
+            help="Allow File and Image parameters in --definition")
+        parser.add_argument('--format', choices=FORMATS, default=None,
+            help="Records format (default from the file extension, or jsonl)")
+        parser.add_argument('--output', metavar='FILE', default=None,
+            help="Results file (default stdout)")
+        parser.add_argument('--errors-only', action='store_true', default=False,
+            help="Only write the invalid records")
+        parser.add_argument('--workers', type=int, default=1,
+            help="Processes used for validation (default 1)")
+        parser.add_argument('--chunk-size', type=int, default=1000,
+            help="Records sent to a worker at once (default 1000)")
+
+    def handle(self, *args, **options):
+        params = self.load_definition(options)
+
+        path = options['input']
+        format = options['format']
+        if format is None:
+            format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+        try:
+            infile = sys.stdin if path == '-' else open(path, newline='')
+            output = options['output']
+            outfile = open(output, 'w') if output else self.stdout
+        except OSError as err:
+            raise CommandError(str(err))
+
+        try:
+            report = validate_stream(params, infile, outfile, format,
+                workers=options['workers'], chunk_size=options['chunk_size'],
+                errors_only=options['errors_only'])
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
+            if outfile is not self.stdout:
+                outfile.close()
+
+        self.stderr.write("{} records, {} valid, {} invalid in {:.2f}s "
+            "({:.0f} records/s)".format(report['records'], report['valid'],
+                report['invalid'], report['seconds'], report['rate']))
+
+    def load_definition(self, options):
+        if options['definition'] is not None:
+            try:
+                with open(options['definition']) as f:
+                    return ParamDict(f.read(), options['file_support'])
+            except OSError as err:
+                raise CommandError(str(err))
+            except (ParseBaseException, ValueError) as err:
+                raise CommandError("Invalid definition '{}': {}".format(
+                    options['definition'], err))
+
+        if options['field'] is None or options['pk'] is None:
+            raise CommandError("Either --definition or --field and --pk are required")
+
+        try:
+            model, field = get_param_field(options['field'])
+        except (LookupError, ValueError) as err:
+            raise CommandError(str(err))
+
+        try:
+            instance = model._default_manager.get(pk=options['pk'])
+        except model.DoesNotExist:
+            raise CommandError("{} with pk {} doesn't exist".format(
+                model.__name__, options['pk']))
+
+        params = getattr(instance, field.attname)
+        if not params:
+            raise CommandError("{} with pk {} has no parameters".format(
+                model.__name__, options['pk']))
+        return params
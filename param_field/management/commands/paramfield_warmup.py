@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+import time
+from param_field.cache import definition_cache
+from param_field.conf import settings
+from param_field.warmup import preload_definitions
+
+
+class Command(BaseCommand):
+    help = "Preload the most common definitions of ParamField columns into the "\
+           "definition caches shared by all the processes (PARAM_SHARED_CACHE_PATH "\
+           "or PARAM_CACHE_ALIAS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fields', metavar='app_label.Model.field', nargs='*',
+            help="Fields to preload (default PARAM_WARMUP_FIELDS)")
+        parser.add_argument('--definitions', type=int, default=None,
+            help="Definitions preloaded per field (default PARAM_WARMUP_DEFINITIONS)")
+
+    def handle(self, *args, **options):
+        labels = options['fields'] or settings.PARAM_WARMUP_FIELDS
+        if not labels:
+            raise CommandError("No fields given and PARAM_WARMUP_FIELDS is empty")
+
+        if definition_cache.local_only:
+            raise CommandError("Definitions can only be preloaded when "
+                "PARAM_SHARED_CACHE_PATH or PARAM_CACHE_ALIAS are enabled")
+
+        count = options['definitions']
+        if count is None:
+            count = settings.PARAM_WARMUP_DEFINITIONS
+
+        start = time.perf_counter()
+        try:
+            loaded = preload_definitions(labels, count)
+        except (LookupError, ValueError, DatabaseError) as err:
+            raise CommandError(str(err))
+
+        self.stdout.write("{} definitions preloaded in {:.1f}ms".format(
+            loaded, (time.perf_counter()-start)*1000))
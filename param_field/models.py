@@ -1,15 +1,26 @@
 from django.utils.translation import ugettext, ugettext_lazy as _
-from django.core.exceptions import ValidationError
-from django.core import validators
+from django.core.exceptions import ValidationError, FieldDoesNotExist
+from django.core import validators, checks
 from django.db import models
+from django.db.models import signals
+from django.db.models.query import ModelIterable
 from django import forms
 from pyparsing import ParseBaseException
+from itertools import islice
+import threading
 from .params import ParamDict
+from .parser import parse_many, ParseLimitError
+from .quarantine import quarantine
+from .cache import definition_cache
+from .stats import timed
 from .validators import ParamValidator, ParamLengthValidator
 from .conf import settings
 
 
-# Create your models here.
+# Ids of the ParamFields whose from_db_value must return the raw string because the
+# values are parsed later by ParamBatchIterable
+_deferred_parsing = threading.local()
+
 
 class ParamField(models.TextField):
 
@@ -20,6 +31,9 @@ class ParamField(models.TextField):
         Arguments:
             file_support(bool): Enable or disable support for file fields.
                 default is True
+            fingerprint_field(str): Name of a model CharField (max_length 
+                40, preferably indexed) updated on save with the definition
+                fingerprint.
         """
        
         if kwargs.get('max_length', None) is None:
@@ -28,6 +42,7 @@ class ParamField(models.TextField):
         kwargs['blank'] = True
         
         self._file_support = kwargs.pop('file_support', True)
+        self.fingerprint_field = kwargs.pop('fingerprint_field', None)
         super(ParamField, self).__init__(*args, **kwargs)
         self.validators.append(ParamLengthValidator(self.max_length))
 
@@ -43,21 +58,163 @@ class ParamField(models.TextField):
         if not self._file_support:
             kwargs['file_support'] = False
 
+        if self.fingerprint_field:
+            kwargs['fingerprint_field'] = self.fingerprint_field
+
         return name, path, args, kwargs
 
+    def contribute_to_class(self, cls, name, **kwargs):
+        super(ParamField, self).contribute_to_class(cls, name, **kwargs)
+
+        # Store the fingerprint when it was left out of save()'s update_fields
+        if self.fingerprint_field and not cls._meta.abstract:
+            signals.post_save.connect(self.save_fingerprint_field,
+                    sender=cls, weak=False)
+
+    def pre_save(self, model_instance, add):
+        # Field values are read in declaration order, by save() and by
+        # bulk_create (that doesn't send signals), so the fingerprint
+        # field must be declared after this one (see param_field.E003)
+        if self.fingerprint_field:
+            self.update_fingerprint_field(model_instance)
+        return super(ParamField, self).pre_save(model_instance, add)
+
+    def update_fingerprint_field(self, instance):
+        """Store the fingerprint of the field's definition in fingerprint_field"""
+        value = getattr(instance, self.attname)
+        if value is None:
+            fingerprint = ''
+        elif isinstance(value, ParamDict):
+            fingerprint = value.fingerprint
+        else:
+            try:
+                fingerprint = ParamDict(value, self._file_support).fingerprint
+            except (ParseBaseException, ValueError):
+                fingerprint = ParamDict(value, parse=False).fingerprint
+
+        setattr(instance, self.fingerprint_field, fingerprint)
+
+    def save_fingerprint_field(self, instance, update_fields=None, raw=False, **kwargs):
+        """Store the fingerprint of instances saved with update_fields 
+        including the field but not fingerprint_field"""
+        if raw or not update_fields or self.name not in update_fields\
+                or self.fingerprint_field in update_fields:
+            return
+        instance.__class__._base_manager.filter(pk=instance.pk).update(
+            **{self.fingerprint_field: getattr(instance, self.fingerprint_field)})
+
+    def check(self, **kwargs):
+        errors = super(ParamField, self).check(**kwargs)
+        errors.extend(self._check_fingerprint_field())
+        return errors
+
+    def _check_fingerprint_field(self):
+        if not self.fingerprint_field:
+            return []
+        try:
+            field = self.model._meta.get_field(self.fingerprint_field)
+        except FieldDoesNotExist:
+            return [checks.Error(
+                "fingerprint_field '{}' doesn't exist".format(self.fingerprint_field),
+                obj=self, id='param_field.E001')]
+
+        if not isinstance(field, models.CharField) or (field.max_length or 0) < 40:
+            return [checks.Error(
+                "fingerprint_field '{}' must be a CharField with max_length>=40"\
+                    .format(self.fingerprint_field),
+                obj=self, id='param_field.E002')]
+
+        fields = self.model._meta.concrete_fields
+        if fields.index(field) < fields.index(self):
+            return [checks.Error(
+                "fingerprint_field '{}' must be declared after '{}', its value is "
+                "read before the fingerprint is updated".format(
+                    self.fingerprint_field, self.name),
+                obj=self, id='param_field.E003')]
+        return []
+
     def from_db_value(self, value, expression, connection, context):
         if value is None:
             return value
 
+        if id(self) in getattr(_deferred_parsing, 'fields', ()):
+            return value
+
+        params = self._parse_db_value(value)
+        params._loaded = value
+        return params
+
+    @timed('from_db_value', lambda args, kwargs, result: result)
+    def _parse_db_value(self, value):
+        # Definitions known to be invalid aren't parsed again
+        if quarantine.get(value, self._file_support) is not None:
+            return ParamDict(value, self._file_support, parse=False)
+
         try:
-            return ParamDict(value, self._file_support)
+            params = ParamDict(value, self._file_support, parse=False)
+            if value:
+                params._set_fields(definition_cache.load(value, self._file_support))
+            return params
+        except ParseLimitError:
+            # Limit errors depend on the settings and, for the timeout, on the
+            # machine load, so they aren't quarantined
+            return ParamDict(value, self._file_support, parse=False)
         except ParseBaseException as err:
             # Couldn't parse form definition return empty dict
+            quarantine.add(value, self._file_support, err, self)
             return ParamDict(value, self._file_support, parse=False)
         except ValueError as err:
             # Couldn't parse form definition return empty dict
+            quarantine.add(value, self._file_support, err, self)
             return ParamDict(value, self._file_support, parse=False)
 
+    @timed('from_db_values')
+    def from_db_values(self, values, workers=1):
+        """
+        Batch version of from_db_value, each distinct value is parsed once 
+        and the same ParamDict returned for all its occurrences.
+
+        Arguments:
+            values (list): Strings loaded from the db (or None)
+            workers (int): Number of processes used for parsing
+        """
+        sources = set(v for v in values if v is not None)
+        invalid = set(s for s in sources 
+                if quarantine.get(s, self._file_support) is not None)
+        sources = list(sources-invalid)
+
+        cached = {}
+        if definition_cache.enabled and not definition_cache.bypassed:
+            for source in sources:
+                fields = definition_cache.get(source, self._file_support)
+                if fields is not None:
+                    cached[source] = fields
+            sources = [s for s in sources if s not in cached]
+
+        parsed = dict(zip(sources, parse_many(sources, self._file_support, workers)))
+        for source, fields in parsed.items():
+            if not isinstance(fields, Exception):
+                definition_cache.set(source, self._file_support, fields)
+        parsed.update(cached)
+
+        params = {}
+        for source in invalid:
+            params[source] = ParamDict(source, self._file_support, parse=False)
+
+        for source, fields in parsed.items():
+            params[source] = pd = ParamDict(source, self._file_support, parse=False)
+            if isinstance(fields, ParseLimitError):
+                pass
+            elif isinstance(fields, Exception):
+                quarantine.add(source, self._file_support, fields, self)
+            else:
+                pd._set_fields(fields)
+
+        for source, pd in params.items():
+            pd._loaded = source
+
+        return [None if v is None else params[v] for v in values]
+
     def get_prep_value(self, value):
         """Convert objects to string"""
         return str(value)
@@ -85,3 +242,148 @@ class ParamField(models.TextField):
         defaults.update(kwargs)
         return super(ParamField, self).formfield(**defaults)
 
+
+
+def param_update_fields(instance):
+    """
+    Return the update_fields for saving a model instance without rewriting 
+    the ParamField columns that haven't changed since it was loaded.
+
+        instance.save(update_fields=param_update_fields(instance))
+
+    Arguments:
+        instance (Model):
+
+    Returns:
+        list: Field names
+    """
+    update_fields = []
+    for field in instance._meta.concrete_fields:
+        if field.primary_key or field.attname not in instance.__dict__:
+            continue
+
+        if isinstance(field, ParamField):
+            value = instance.__dict__[field.attname]
+            if isinstance(value, ParamDict) and not value.has_changed():
+                continue
+        
+        update_fields.append(field.name)
+
+    return update_fields
+
+
+def get_param_field(label):
+    """
+    Return the model and ParamField referenced by a label.
+
+    Arguments:
+        label (str): 'app_label.Model.field'
+
+    Returns:
+        (model, field) tuple
+
+    Raises:
+        LookupError: Unknown model or field
+        ValueError: Malformed label or the field isn't a ParamField
+    """
+    from django.apps import apps
+    try:
+        app_label, model_name, field_name = label.split('.')
+    except ValueError:
+        raise ValueError("Expected 'app_label.Model.field' received '{}'".format(label))
+
+    model = apps.get_model(app_label, model_name)
+    try:
+        field = model._meta.get_field(field_name)
+    except FieldDoesNotExist as err:
+        raise LookupError(str(err))
+    if not isinstance(field, ParamField):
+        raise ValueError("'{}' isn't a ParamField".format(label))
+
+    return model, field
+
+
+def iter_param_sources(queryset, field, chunk_size=2000):
+    """
+    Yield a (pk, definition string) tuple for each row of queryset without
+    parsing the definitions, rows are fetched in chunks using iterator().
+
+    Arguments:
+        queryset (QuerySet): 
+        field (ParamField): 
+        chunk_size (int): Rows fetched at once
+    """
+    rows = queryset.values_list('pk', field.attname).iterator()
+    while True:
+        _deferred_parsing.fields = frozenset((id(field),))
+        try:
+            chunk = list(islice(rows, chunk_size))
+        finally:
+            _deferred_parsing.fields = ()
+
+        if not chunk:
+            break
+
+        for row in chunk:
+            yield row
+
+
+class ParamBatchIterable(ModelIterable):
+    """
+    Iterable yielding model instances whose ParamField values are parsed
+    in chunks, every distinct definition within a chunk is parsed only once.
+    """
+    def __iter__(self):
+        chunk_size, workers = self.queryset._param_batch
+        fields = [f for f in self.queryset.model._meta.concrete_fields 
+                if isinstance(f, ParamField)]
+
+        rows = super(ParamBatchIterable, self).__iter__()
+        while True:
+            # Load raw strings while fetching the chunk
+            _deferred_parsing.fields = frozenset(id(f) for f in fields)
+            try:
+                chunk = list(islice(rows, chunk_size))
+            finally:
+                _deferred_parsing.fields = ()
+
+            if not chunk:
+                break
+
+            for field in fields:
+                loaded = [obj for obj in chunk if field.attname in obj.__dict__]
+                values = field.from_db_values(
+                        [obj.__dict__[field.attname] for obj in loaded], workers)
+                for obj, value in zip(loaded, values):
+                    obj.__dict__[field.attname] = value
+
+            for obj in chunk:
+                yield obj
+
+
+class ParamQuerySet(models.QuerySet):
+
+    _param_batch = None
+
+    def with_parsed_params(self, chunk_size=2000, workers=1):
+        """
+        Parse ParamField values in chunks instead of row by row, the 
+        instances with the same definition share the same ParamDict so
+        it shouldn't be modified in place.
+        
+        Arguments:
+            chunk_size (int): Number of rows parsed at once
+            workers (int): Number of processes used for parsing
+        """
+        clone = self._clone()
+        clone._param_batch = (chunk_size, workers)
+        clone._iterable_class = ParamBatchIterable
+        return clone
+
+    def _clone(self, *args, **kwargs):
+        clone = super(ParamQuerySet, self)._clone(*args, **kwargs)
+        clone._param_batch = self._param_batch
+        return clone
+
+
+ParamManager = models.Manager.from_queryset(ParamQuerySet)
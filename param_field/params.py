@@ -5,10 +5,26 @@ from decimal import Decimal
 from numbers import Number
 from collections import OrderedDict
 import json
+import hashlib
 from .conf import settings
+from .stats import stats, timed
 
 
 class ParamDict(OrderedDict):
+
+    _source = None
+
+    # State of the fields when the source was set, see _fields_state()
+    _source_state = ()
+    
+    # Memoized to_str() result, and the state of the fields it was
+    # generated from
+    _str_memo = None
+
+    # Definition string loaded from db
+    _loaded = None
+
+    _file_support = False
   
     def __init__(self, fields='', file_support=False, parse=True):
         """
@@ -21,17 +37,222 @@ class ParamDict(OrderedDict):
         from .parser import parse_fields # Solve circular import
         super(ParamDict, self).__init__()
 
+        if parse and fields:
+            f = parse_fields(fields, file_support)
+        else:
+            f = {}
+
+        self._set_fields(f)
+
         # Store source used to generate ParamDict
         self._source = fields
+        self._file_support = file_support
+
+    def _set_fields(self, fields):
+        """Add parsed fields without discarding the source"""
+        for name, field in fields.items():
+            OrderedDict.__setitem__(self, name, field)
+        self._source_state = self._fields_state()
+
+    def _changed(self):
+        """Fields were modified, source and serialization are out of date"""
+        self._source = None
+        self._str_memo = None
+
+    def _fields_state(self):
+        """Value that changes whenever a Param is modified, including in 
+        place edits of its choices"""
+        return tuple(param._state() for param in self.values())
+
+    def _valid_source(self):
+        """Return the source, or None when a Param was modified after the
+        source was set"""
+        source = self._source
+        if source is not None and self._source_state != self._fields_state():
+            self._source = source = None
+        return source
+
+    def __setitem__(self, key, value):
+        super(ParamDict, self).__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super(ParamDict, self).__delitem__(key)
+        self._changed()
+
+    def pop(self, *args, **kwargs):
+        self._changed()
+        return super(ParamDict, self).pop(*args, **kwargs)
+
+    def popitem(self, *args, **kwargs):
+        self._changed()
+        return super(ParamDict, self).popitem(*args, **kwargs)
+
+    def setdefault(self, *args, **kwargs):
+        self._changed()
+        return super(ParamDict, self).setdefault(*args, **kwargs)
+
+    def move_to_end(self, *args, **kwargs):
+        self._changed()
+        return super(ParamDict, self).move_to_end(*args, **kwargs)
+
+    def clear(self):
+        self._changed()
+        return super(ParamDict, self).clear()
+
+    def update(self, *args, **kwargs):
+        self._changed()
+        return super(ParamDict, self).update(*args, **kwargs)
+
+    def outline(self):
+        """
+        Return the name, type and property span of each field, see 
+        parser.outline_fields. (spans refer to str(self))
+        """
+        from .parser import outline_fields # Solve circular import
+        return outline_fields(str(self))
+
+    def reparse(self, fields):
+        """
+        Return a new ParamDict for a modified version of this definition,
+        only the fields that changed are parsed, the others are shared 
+        with this ParamDict.
+
+        Arguments:
+            fields (str): String containig fields definitions.
+        """
+        from .parser import reparse_fields # Solve circular import
+        params = ParamDict(fields, self._file_support, parse=False)
+        if fields:
+            params._set_fields(reparse_fields(fields, self, self._file_support))
+        return params
+
+    def _check_param(self, name, param):
+        """Check name and param can be added to the definition"""
+        from .parser import is_valid_name # Solve circular import
+        if not is_valid_name(name):
+            raise ValueError("Invalid parameter name '{}'".format(name))
+        
+        if not isinstance(param, Param):
+            raise ValueError("Expected 'Param' received '{}'"\
+                    .format(type(param).__name__))
+
+        if isinstance(param, FileParam) and not self._file_support:
+            raise ValueError("File parameters not supported")
+
+    def _source_spans(self):
+        """Return the named field spans of the source, or None when there's
+        no source or its fields don't match the parameters (i.e. it couldn't
+        be parsed)"""
+        from .parser import named_field_spans # Solve circular import
+        source = self._valid_source()
+        if not source:
+            return None
+
+        spans = named_field_spans(source)
+        if [n for n, start, end in spans] != list(self.keys()):
+            return None
+        # Text before the first field isn't a field
+        if source[:spans[0][1] if spans else len(source)].strip():
+            return None
+        return spans
+
+    def _edit_source(self, name, field_str):
+        """
+        Return source with the definition of field name replaced by field_str,
+        or removed when field_str is None. Returns None when source fields
+        can't be located without parsing.
+        """
+        source = self._valid_source()
+        spans = self._source_spans()
+        if spans is None:
+            return None
+
+        for n, start, end in spans:
+            if n == name:
+                break
+
+        if field_str is None:
+            return source[:start]+source[end:]
 
-        if parse:
-            f = parse_fields(fields or '', file_support)
+        chunk = source[start:end]
+        leading = chunk[:len(chunk)-len(chunk.lstrip())]
+        trailing = chunk[len(chunk.rstrip()):]
+        return source[:start]+leading+field_str+trailing+source[end:]
+
+    def add(self, name, param):
+        """
+        Add a new parameter at the end of the definition, the source is
+        extended instead of generated again.
+
+        Arguments:
+            name (str): Parameter name
+            param (Param): 
+        """
+        self._check_param(name, param)
+        if name in self:
+            raise ValueError("Parameter '{}' already defined".format(name))
+
+        field_str = "{}:{}".format(name, param.to_str())
+        source = self._valid_source() if self._source_spans() is not None else None
+        memo, state = self._str_memo, self._fields_state()
+        OrderedDict.__setitem__(self, name, param)
+        new_state = state+(param._state(),)
+
+        if source and source.strip():
+            self._source = source.rstrip()+'\n'+field_str
+            self._source_state = new_state
         else:
-            f = {}
+            self._source = None
+
+        if memo is not None and memo[0] == state:
+            self._str_memo = (new_state, memo[1]+'\n'+field_str if memo[1] else field_str)
+        else:
+            self._str_memo = None
+        return self
+
+    def remove(self, name):
+        """
+        Remove parameter from definition
+
+        Arguments:
+            name (str): Parameter name
+        """
+        if name not in self:
+            raise KeyError(name)
+
+        source = self._edit_source(name, None)
+        OrderedDict.__delitem__(self, name)
+        self._source = source
+        self._source_state = self._fields_state()
+        self._str_memo = None
+        return self
+
+    def replace(self, name, param):
+        """
+        Replace parameter keeping its position in the definition
 
-        for name, field in f.items():
-            self[name] = field
+        Arguments:
+            name (str): Parameter name
+            param (Param): 
+        """
+        if name not in self:
+            raise KeyError(name)
+        self._check_param(name, param)
+
+        source = self._edit_source(name, "{}:{}".format(name, param.to_str()))
+        OrderedDict.__setitem__(self, name, param)
+        self._source = source
+        self._source_state = self._fields_state()
+        self._str_memo = None
+        return self
+
+    def has_changed(self):
+        """Return True unless it was loaded from the db and its definition
+        hasn't been modified since."""
+        return self._loaded is None or str(self) != self._loaded
     
+    @timed('form', lambda args, kwargs, result: args[0])
     def form(self, *args, **kwargs):
         """Return a form containig all parameters stored in ParamDict
         Arguments:
@@ -49,6 +270,7 @@ class ParamDict(OrderedDict):
         kwargs['params'] = self
         return ParamInputForm(*args, **kwargs)
 
+    @timed('validate', lambda args, kwargs, result: args[0])
     def validate(self, request):
         """
         Validate request against ParamDict parameters
@@ -99,25 +321,73 @@ class ParamDict(OrderedDict):
 
         return with_defaults
 
-        dict_str = ""
-        for name, param in self.items():        
-            dict_str += name+':'+str(param)+'\n'
-
+    def to_str(self):
+        """Return the canonical definition string, generated from the fields 
+        so it doesn't depend on the whitespace or property order used in 
+        the source."""
+        memo, state = self._str_memo, self._fields_state()
+        if memo is not None and memo[0] == state:
+            if stats.enabled:
+                stats.incr('to_str.hits')
+            return memo[1]
+
+        if stats.enabled:
+            stats.incr('to_str.misses')
+        dict_str = '\n'.join(["{}:{}"\
+            .format(name, param.to_str()) for name, param in self.items()])
+        self._str_memo = (state, dict_str)
         return dict_str
 
+    @property
+    def fingerprint(self):
+        """Hash of the canonical definition string, the same for all the
+        definitions with equivalent fields. (Definitions that couldn't be
+        parsed are hashed from their source.)"""
+        if not len(self) and self._source and self._source.strip():
+            canonical = 'unparsed:'+self._source
+        else:
+            canonical = self.to_str()
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+    def __reduce__(self):
+        """Pickle the fields, and the source unless it's the canonical string
+        generated from them. Unpickling doesn't parse the source."""
+        source, loaded = self._valid_source(), self._loaded
+        if source is not None and source == self.to_str():
+            source = None
+        if loaded is not None and loaded == str(self):
+            loaded = True
+        return (_unpickle_param_dict, (source, self._file_support, loaded,
+            tuple(self.items())))
+
     def __str__(self):
-        if self._source:
-            return self._source
+        source = self._valid_source()
+        if source:
+            return source
         else:
             # Generate from fields
-            return '\n'.join(["{}:{}"\
-                .format(name, str(param)) for name, param in self.items()])
+            return self.to_str()
+
+
+def _unpickle_param_dict(source, file_support, loaded, fields):
+    """Rebuild a pickled ParamDict"""
+    params = ParamDict(source, file_support, parse=False)
+    params._set_fields(OrderedDict(fields))
+    # True when it was the same as the definition string
+    params._loaded = str(params) if loaded is True else loaded
+    return params
 
 
 # Property -> allowed types | limits
 
 class Param(object):
     native_type = str
+
+    # Memoized to_str() result, and the _state() it was generated from
+    _str_memo = None
+
+    # Incremented on each property assignment
+    _version = 0
    
     # Property and type supported, in order of initialization
     allowed_properties = [
@@ -176,7 +446,7 @@ class Param(object):
         Initialize property by calling its custom initialzation function or
         storing its value if none is available.
         """
-        allowed_type = self._prop_type_dict[name]
+        allowed_type = self._property_types()[name]
         if not isinstance(value, allowed_type):
             allowed_type.__class__.__name__
             err = "'{}' expected '{}' received '{}'"\
@@ -189,17 +459,45 @@ class Param(object):
         else:
             setattr(self, name, value)
     
+    @classmethod
+    def _property_types(cls):
+        """Return {property: type} dict, built once for each class"""
+        prop_types = cls.__dict__.get('_prop_type_dict', None)
+        if prop_types is None:
+            prop_types = dict((prop, typ) for prop, typ, default in cls.allowed_properties)
+            cls._prop_type_dict = prop_types
+        return prop_types
+
+    @classmethod
+    def _property_defaults(cls):
+        """Return {property: default value} dict, built once for each class"""
+        defaults = cls.__dict__.get('_prop_default_dict', None)
+        if defaults is None:
+            defaults = dict((prop, default) for prop, typ, default in cls.allowed_properties)
+            cls._prop_default_dict = defaults
+        return defaults
+
+    @classmethod
+    def _validators(cls):
+        """Return the names of the property validation methods, in property
+        order, built once for each class"""
+        validators = cls.__dict__.get('_validator_names', None)
+        if validators is None:
+            validators = tuple('_validate_'+prop for prop, typ, default 
+                in cls.allowed_properties if hasattr(cls, '_validate_'+prop))
+            cls._validator_names = validators
+        return validators
+
     def __init__(self, *args, **kwargs):
         """Custom init method responsible of initializing and checking parameters"""
         # Initialize all possible properties to default values
-        self._prop_type_dict = {}
         for prop, typ, default in self.allowed_properties:
-            self._prop_type_dict[prop] = typ
             setattr(self, prop, default)
 
         # Check only allowed properties were provided
+        prop_types = self._property_types()
         for prop, value in kwargs.items():
-            if prop not in self._prop_type_dict:
+            if prop not in prop_types:
                 raise ValueError("Unexpected property '{}'".format(prop))
 
         # If available call custom initialization function for each property 
@@ -238,10 +536,8 @@ class Param(object):
             raise TypeError(err)
         
         # Validate against available property validators
-        for name, typ, default in self.allowed_properties:
-            validate_func = getattr(self, '_validate_'+name, None)
-            if validate_func:
-                validate_func(value) 
+        for validator in self._validators():
+            getattr(self, validator)(value)
 
     def is_valid(self, value):
         try:
@@ -274,11 +570,31 @@ class Param(object):
         else:
             return str(value)
 
+    def __setattr__(self, name, value):
+        # Any modification invalidates the memoized definition strings
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_version', self._version+1)
+
+    def _state(self):
+        """Value that changes whenever the parameter is modified, choices
+        are included as lists can be edited in place"""
+        choices = getattr(self, 'choices', None)
+        if isinstance(choices, list):
+            return (self._version, tuple(choices))
+        return self._version
+
     def to_str(self):
         """Convert parameter to its parameter definition language
         representation, including all properties with user defined
         values."""
-
+        memo, state = self._str_memo, self._state()
+        if memo is None or memo[0] != state:
+            memo = (state, self._render_str())
+            object.__setattr__(self, '_str_memo', memo)
+        return memo[1]
+
+    def _render_str(self):
+        """Generate to_str() result"""
         # Render properties
         prop_str = ""
         for name, typ, default in self.allowed_properties:
@@ -300,10 +616,30 @@ class Param(object):
 
         return self.type_name+('->'+prop_str if prop_str else '')
 
+    def __reduce__(self):
+        """Pickle only the properties without their default value, they
+        were already checked so they aren't initialized again when unpickled"""
+        defaults = self._property_defaults()
+        state = tuple((name, value) for name, value in self.__dict__.items()
+            if name not in ('_str_memo', '_version') and not (value == defaults.get(name, _no_default)
+                and type(value) is type(defaults[name])))
+        return (_unpickle_param, (self.__class__, state))
+
     def __str__(self):
          return self.to_str()
 
 
+_no_default = object()
+
+def _unpickle_param(cls, state):
+    """Rebuild a pickled Param"""
+    param = cls.__new__(cls)
+    for prop, typ, default in cls.allowed_properties:
+        param.__dict__[prop] = default
+    param.__dict__.update(state)
+    return param
+
+
 class NumberMixin(object):
 
     def _init_min(self, value):
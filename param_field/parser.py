@@ -1,7 +1,14 @@
 from pyparsing import *
+import threading
+import time
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
 from .params import *
+from .stats import timed
 
 FIELD_TO_PARAM = {
     'Bool': BoolParam,
@@ -57,6 +64,76 @@ def lengthCheck(max_length=settings.PARAM_TEXT_MAX_LENGTH):
 
     return lengthCheckParseAction
 
+class ParseLimitError(ParseFatalException):
+    """Definition exceeds one of the parser resource limits (PARAM_MAX_FIELDS,
+    PARAM_MAX_CHOICES, PARAM_MAX_TOKENS or PARAM_PARSE_TIMEOUT)"""
+    pass
+
+
+class _ParseBudget(object):
+    """
+    Resource usage of a definition, with the limits loaded from settings
+    when it's created. Definitions parsed one field at a time share the 
+    same budget for all their fields, only the time spent parsing counts
+    towards PARAM_PARSE_TIMEOUT.
+    """
+    def __init__(self):
+        self.fields = 0
+        self.tokens = 0
+        self.max_fields = settings.PARAM_MAX_FIELDS
+        self.max_choices = settings.PARAM_MAX_CHOICES
+        self.max_tokens = settings.PARAM_MAX_TOKENS
+        self.remaining = settings.PARAM_PARSE_TIMEOUT
+        self.deadline = None
+
+    def resume(self):
+        if self.remaining:
+            self.deadline = time.monotonic()+self.remaining
+
+    def pause(self):
+        if self.deadline is not None:
+            self.remaining = max(self.deadline-time.monotonic(), 1e-9)
+            self.deadline = None
+
+
+class _ActiveBudget(threading.local):
+    """Budget of the definition being parsed by each thread"""
+    budget = None
+
+_active = _ActiveBudget()
+
+def tokenCount(string, loc, tokens):
+    """Enforce token and time limits, the clock is checked every 32 tokens"""
+    budget = _active.budget
+    if budget is None:
+        return
+    budget.tokens += 1
+    if budget.max_tokens is not None and budget.tokens > budget.max_tokens:
+        err = "definition exceeds maximum number of tokens ({})"\
+                .format(budget.max_tokens)
+        raise ParseLimitError(string, loc, err)
+
+    if budget.deadline is not None and budget.tokens % 32 == 0\
+            and time.monotonic() > budget.deadline:
+        raise ParseLimitError(string, loc, "definition parse time limit exceeded")
+
+def fieldCount(string, loc, tokens):
+    budget = _active.budget
+    if budget is None:
+        return
+    budget.fields += 1
+    if budget.max_fields is not None and budget.fields > budget.max_fields:
+        err = "definition exceeds maximum number of fields ({})"\
+                .format(budget.max_fields)
+        raise ParseLimitError(string, loc, err)
+
+def choicesCheck(string, loc, tokens):
+    budget = _active.budget
+    max_choices = budget.max_choices if budget is not None else None
+    if max_choices is not None and len(tokens[0]) > max_choices:
+        err = "list exceeds maximum number of elements ({})".format(max_choices)
+        raise ParseLimitError(string, loc, err)
+
 def propToDict(tokens):
     """Convert field property list to dictionary"""
     prop_dict = OrderedDict()
@@ -82,72 +159,205 @@ def fieldToParam(token):
 
 lowercase = "abcdefghijklmnopqrstuvwxyz"
 lowercasenums = "abcdefghijklmnopqrstuvwxyz0123456789"
-arithOp = Word("+-*/^", max=1)
-lparen,rparen,lbrack,rbrack,lbrace,rbrace = map(Suppress,"()[]{}")
-colon = Suppress(":")
-comma = Suppress(",")
-plusorminus = oneOf("+ -")
-arrow = Suppress("->")
-number = Word(nums)
-
-
-# Define data primitives and limits
-integer = Combine(Optional(plusorminus)+number)\
-    .setName("integer").setParseAction(cvtInt)\
-    .addParseAction(rangeCheck(settings.PARAM_INT_MIN, settings.PARAM_INT_MAX))
-real = Combine(Optional(plusorminus)+number+"."+number)\
-    .setName("real").setParseAction(cvtDec)\
-    .addParseAction(rangeCheck(settings.PARAM_DECIMAL_MIN, settings.PARAM_DECIMAL_MAX))
-string = QuotedString('"', escChar='\\')\
-    .setName("string")\
-    .addParseAction(lengthCheck())
-boolean = oneOf("True False").setName("bool")\
-    .setParseAction(cvtBool)
-lst_elem = real | integer | string
-lst = Group(lbrack+lst_elem+ZeroOrMore(comma+lst_elem)+Optional(comma)+rbrack)\
-    .addParseAction(lstToList)
-
-
-
-identifier = ~reserved_keywords+Word(lowercase, lowercasenums+"_", min=1, max=settings.PARAM_NAME_MAX_LENGTH)
-
-
-key = oneOf("default min_length max_length min max help_text label hidden odd even choices required max_digits max_decimals")\
-    .setResultsName("property_name")
-value = (real | integer | boolean | string | lst).setResultsName("property_value")
-field_property = Group(key + colon + value)
-
 
 
 def create_parser(types="Integer Dimmension Decimal Bool Text TextArea"):
     """
+    Build a new parser instance, every call creates the whole grammar from 
+    scratch so no pyparsing element is shared between instances.
+
     Arguments:
         types: Supported types string
     """ 
-    field_type = oneOf(types)
+    lbrack,rbrack = map(Suppress,"[]")
+    colon = Suppress(":")
+    comma = Suppress(",")
+    plusorminus = oneOf("+ -")
+    arrow = Suppress("->")
+    number = Word(nums)
+
+    # Define data primitives and limits
+    integer = Combine(Optional(plusorminus)+number)\
+        .setName("integer").setParseAction(tokenCount, cvtInt)\
+        .addParseAction(rangeCheck(settings.PARAM_INT_MIN, settings.PARAM_INT_MAX))
+    real = Combine(Optional(plusorminus)+number+"."+number)\
+        .setName("real").setParseAction(tokenCount, cvtDec)\
+        .addParseAction(rangeCheck(settings.PARAM_DECIMAL_MIN, settings.PARAM_DECIMAL_MAX))
+    string = QuotedString('"', escChar='\\')\
+        .setName("string")\
+        .setParseAction(tokenCount)\
+        .addParseAction(lengthCheck())
+    boolean = oneOf("True False").setName("bool")\
+        .setParseAction(tokenCount, cvtBool)
+    lst_elem = real | integer | string
+    lst = Group(lbrack+lst_elem+ZeroOrMore(comma+lst_elem)+Optional(comma)+rbrack)\
+        .addParseAction(lstToList)\
+        .addParseAction(choicesCheck)
+
+    identifier = ~reserved_keywords+Word(lowercase, lowercasenums+"_", 
+            min=1, max=settings.PARAM_NAME_MAX_LENGTH)\
+        .setParseAction(tokenCount)
+
+    key = oneOf("default min_length max_length min max help_text label hidden "
+            "odd even choices required max_digits max_decimals")\
+        .setParseAction(tokenCount)\
+        .setResultsName("property_name")
+    value = (real | integer | boolean | string | lst).setResultsName("property_value")
+    field_property = Group(key + colon + value)
+
+    field_type = oneOf(types).setParseAction(tokenCount)
 
     field = Group(identifier + colon + field_type +\
                 Optional(arrow+OneOrMore(field_property))\
                     .setParseAction(propToDict)\
                     .setResultsName("property_dict"))\
-            .setResultsName("field").setParseAction(fieldToParam)
+            .setResultsName("field")\
+            .setParseAction(fieldCount)\
+            .addParseAction(fieldToParam)
 
     params = ZeroOrMore(field)
 
     return params
 
 
+def enable_packrat(cache_size=128):
+    """
+    Enable pyparsing packrat memoization. It's a process wide pyparsing 
+    setting, so it also applies to any other pyparsing grammar, and its 
+    single cache is shared by all threads.
+
+    Arguments:
+        cache_size (int): Max cache entries of the process, None for unbounded.
+    """
+    ParserElement.enablePackrat(cache_size)
+
+
+if settings.PARAM_PACKRAT:
+    enable_packrat(settings.PARAM_PACKRAT_CACHE_SIZE)
+
+
+# Parser instances used by each thread
+_thread_parsers = threading.local()
+
+def get_parser(file_support=False):
+    """
+    Return the calling thread's parser, it is created the first time a 
+    thread requests it.
+
+    Arguments:
+        file_support (bool): Return parser with support for File and Image
+    """
+    try:
+        parsers = _thread_parsers.parsers
+    except AttributeError:
+        parsers = _thread_parsers.parsers = {}
+
+    try:
+        return parsers[file_support]
+    except KeyError:
+        if file_support:
+            types = "Integer Dimmension Decimal Bool Text TextArea File Image"
+        else:
+            types = "Integer Dimmension Decimal Bool Text TextArea"
+        parser = parsers[file_support] = create_parser(types=types)
+        return parser
+
+
+# Matches quoted strings and field starts ("name: Type"), strings are matched
+# so any field-like text within them is skipped.
+_field_start = re.compile(r'''
+    "(?:[^"\n\r\\]|\\.)*"
+    | (?<![A-Za-z0-9_])([a-z][a-z0-9_]*)\s*:\s*
+      (Integer|Dimmension|Decimal|Bool|TextArea|Text|File|Image)(?![A-Za-z0-9_])
+      (?:\s*->)?
+    ''', re.VERBOSE)
+
+_reserved_names = frozenset(("default min_length max_length min max help_text label "
+    "hidden odd even choices required max_digits max_decimals").split())
+
+_valid_name = re.compile(r'[a-z][a-z0-9_]*\Z')
+
+def is_valid_name(name):
+    """Check name follows the same rules as field names in the definition 
+    language"""
+    return bool(_valid_name.match(name)) and name not in _reserved_names\
+        and len(name) <= settings.PARAM_NAME_MAX_LENGTH
+
+def _scan_fields(input_str):
+    """Return (name, type_name, name_start, header_end) for each field start
+    found in input_str"""
+    return [(m.group(1), m.group(2), m.start(1), m.end()) 
+            for m in _field_start.finditer(input_str)
+            if m.group(1) is not None and m.group(1) not in _reserved_names]
+
+def named_field_spans(input_str):
+    """
+    Split a field definition string into the spans of its fields without
+    parsing them, each span starts at a field name and ends where the next 
+    one starts. (the first one also includes any leading text)
+
+    Arguments:
+        input_str (string):
+
+    Returns:
+        list: (name, start, end) tuples, empty if no field was found
+    """
+    fields = _scan_fields(input_str)
+    if not fields:
+        return []
+
+    names = [f[0] for f in fields]
+    starts = [0] + [f[2] for f in fields[1:]]
+    ends = starts[1:] + [len(input_str)]
+    return list(zip(names, starts, ends))
 
-params = create_parser(
-        types = "Integer Dimmension Decimal Bool Text TextArea")
+def field_spans(input_str):
+    """
+    Same as named_field_spans but returning only (start, end) tuples
+    """
+    return [(start, end) for name, start, end in named_field_spans(input_str)]
 
-params_file = create_parser(
-        types = "Integer Dimmension Decimal Bool Text TextArea File Image")
 
-params.enablePackrat()
-params_file.enablePackrat()
+FieldOutline = namedtuple('FieldOutline', ['name', 'type_name', 'props'])
 
+@lru_cache(maxsize=settings.PARAM_OUTLINE_CACHE_SIZE)
+def outline_fields(input_str):
+    """
+    Fast scan of a definition returning each field name and type, plus the
+    span of its property list, without parsing properties or creating 
+    Params. The definition isn't validated, for invalid definitions the 
+    result may not match the parsed fields.
 
+    Arguments:
+        input_str (string): 
+
+    Returns:
+        tuple: FieldOutline(name, type_name, props) for each field, where
+            props is the (start, end) span of the properties string.
+    """
+    fields = _scan_fields(input_str)
+    ends = [f[2] for f in fields[1:]] + [len(input_str)]
+
+    outline = []
+    for (name, type_name, start, header_end), end in zip(fields, ends):
+        props = input_str[header_end:end]
+        props_start = header_end + len(props) - len(props.lstrip())
+        props_end = header_end + len(props.rstrip())
+        outline.append(FieldOutline(name, type_name, 
+            (min(props_start, props_end), props_end)))
+
+    return tuple(outline)
+
+
+def _parsed_subject(args, kwargs, fields):
+    """ParamDict for a parse_fields call, used by the slow log"""
+    source = args[0] if args else kwargs['input_str']
+    params = ParamDict(source, parse=False)
+    if fields is not None:
+        params._set_fields(fields)
+    return params
+
+@timed('parse_fields', _parsed_subject)
 def parse_fields(input_str, file_support=False):
     """
     Arguments:
@@ -156,10 +366,19 @@ def parse_fields(input_str, file_support=False):
             File
             Image
     """ 
-    if file_support:
-        ast = params_file.parseString(input_str, parseAll=True)
-    else:
-        ast = params.parseString(input_str, parseAll=True)
+    return _parse(input_str, file_support, _ParseBudget())
+
+
+def _parse(input_str, file_support, budget):
+    """Parse input_str charging its usage to budget"""
+    previous = _active.budget
+    _active.budget = budget
+    budget.resume()
+    try:
+        ast = get_parser(file_support).parseString(input_str, parseAll=True)
+    finally:
+        budget.pause()
+        _active.budget = previous
     
     d = OrderedDict()
     for name, field in ast:
@@ -167,20 +386,146 @@ def parse_fields(input_str, file_support=False):
     return d
 
 
+def _check_field_count(input_str, spans, budget):
+    """Enforce PARAM_MAX_FIELDS for definitions parsed one field at a time"""
+    max_fields = budget.max_fields
+    if max_fields is not None and len(spans) > max_fields:
+        err = "definition exceeds maximum number of fields ({})".format(max_fields)
+        raise ParseLimitError(input_str, spans[max_fields][0], err)
 
 
+def parse_fields_iter(input_str, file_support=False):
+    """
+    Generator version of parse_fields, parses one field at a time yielding
+    (name, Param) tuples, so the rest of the definition isn't parsed when
+    the caller stops early. Raises on the first error found, resource 
+    limits apply to the whole definition as in parse_fields. (If a name is
+    repeated each occurrence is yielded)
 
+    Arguments:
+        input_str (string): 
+        file_support (bool): Enable support to file parameters
+    """
+    spans = field_spans(input_str)
+    if not spans:
+        for item in parse_fields(input_str, file_support).items():
+            yield item
+        return
+    
+    budget = _ParseBudget()
+    _check_field_count(input_str, spans, budget)
 
+    for start, end in spans:
+        try:
+            fields = _parse(input_str[start:end], file_support, budget)
+        except ParseBaseException as err:
+            # Report location within the whole definition
+            raise err.__class__(input_str, start+err.loc, err.msg, err.parserElement)
+       
+        for item in fields.items():
+            yield item
 
 
+def reparse_fields(input_str, previous, file_support=False):
+    """
+    Parse a modified definition reusing the fields from a previous parse, 
+    only the fields whose text changed are parsed. The result is the same
+    as parse_fields(input_str, file_support). With PARAM_MAX_TOKENS set the
+    whole definition is parsed, as the tokens of the reused fields aren't
+    known.
+
+    Arguments:
+        input_str (string): New definition
+        previous (ParamDict): Result of parsing the previous definition 
+            with the same file_support.
+        file_support (bool): Enable support to file parameters
+    """
+    spans = named_field_spans(input_str)
+    prev_source = str(previous)
+    prev_spans = named_field_spans(prev_source)
+
+    # Unchanged fields can only be identified when each one has its own span
+    reusable = {}
+    if [name for name, start, end in prev_spans] == list(previous.keys()):
+        for name, start, end in prev_spans:
+            reusable[prev_source[start:end].strip()] = (name, previous[name])
+    
+    budget = _ParseBudget()
+    if not spans or not reusable or budget.max_tokens is not None:
+        return parse_fields(input_str, file_support)
+
+    _check_field_count(input_str, spans, budget)
+
+    d = OrderedDict()
+    try:
+        for name, start, end in spans:
+            field_str = input_str[start:end].strip()
+            if field_str in reusable:
+                name, field = reusable[field_str]
+                d[name] = field
+            else:
+                for name, field in _parse(field_str, file_support, budget).items():
+                    d[name] = field
+    except (ParseBaseException, ValueError):
+        # Parse again as a whole so errors are reported the same way
+        return parse_fields(input_str, file_support)
 
+    return d
 
 
+def _parse_chunk(chunk, file_support):
+    """Parse a list of sources returning for each one the parsed fields, or
+    the exception raised. (used by parse_many worker processes)"""
+    results = []
+    for source in chunk:
+        try:
+            results.append(parse_fields(source, file_support))
+        except (ParseBaseException, ValueError) as err:
+            results.append(err)
+    return results
 
 
+def parse_many(sources, file_support=False, workers=None, chunk_size=500):
+    """
+    Parse many field definitions, identical sources are only parsed once 
+    and the unique ones are distributed in chunks over a process pool.
 
+    Arguments:
+        sources (iterable): Field definition strings
+        file_support (bool): Enable support to file parameters
+        workers (int): Number of worker processes, defaults to the number 
+            of CPUs. With 1 (or less) all sources are parsed in the calling 
+            process.
+        chunk_size (int): Number of unique sources sent to a worker at once
+
+    Returns:
+        list: In the same order as sources, each element is the OrderedDict
+            returned by parse_fields, or the ParseBaseException/ValueError 
+            raised while parsing it. Duplicated sources share the same 
+            result object.
+    """
+    sources = list(sources)
+    unique = list(OrderedDict.fromkeys(sources))
 
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, workers)
 
+    # Smaller chunks when there aren't enough sources to keep all workers busy
+    chunk_size = max(1, min(chunk_size, -(-len(unique)//workers)))
+    chunks = [unique[i:i+chunk_size] for i in range(0, len(unique), chunk_size)]
+    workers = min(workers, len(chunks))
 
+    if workers <= 1:
+        parsed = [_parse_chunk(c, file_support) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(_parse_chunk, chunks, 
+                [file_support]*len(chunks)))
 
+    results = {}
+    for chunk, chunk_results in zip(chunks, parsed):
+        for source, result in zip(chunk, chunk_results):
+            results[source] = result
 
+    return [results[s] for s in sources]
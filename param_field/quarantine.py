@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import threading
+from .conf import settings
+from .stats import stats
+
+
+def source_digest(source, file_support=False):
+    """Hash identifying a definition string parsed with or without file
+    support."""
+    prefix = 'F:' if file_support else 'N:'
+    return hashlib.sha1((prefix+source).encode('utf-8')).hexdigest()
+
+
+class QuarantineEntry(object):
+    """
+    Definition that failed to parse.
+
+    Attributes:
+        digest (str): source_digest of the definition
+        error (str): Parser error message
+        field (str): Field where it was first loaded ('app_label.Model.field')
+        first_seen (datetime):
+        hits (int): Number of times a parse was skipped because of the entry
+    """
+    def __init__(self, digest, error, field=None):
+        self.digest = digest
+        self.error = error
+        self.field = field
+        self.first_seen = datetime.now()
+        self.hits = 0
+
+
+class Quarantine(object):
+    """
+    Negative cache for definitions that failed to parse, so they aren't
+    parsed again each time they are loaded, doubles as a report of the
+    invalid definitions found.
+
+    Arguments:
+        size (int): Max entries, the oldest ones are discarded first (0
+            disables the quarantine)
+    """
+    def __init__(self, size=1000):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source, file_support=False):
+        """Return definition's QuarantineEntry or None if it isn't quarantined"""
+        if not self.size:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(source_digest(source, file_support), None)
+            if entry is not None:
+                entry.hits += 1
+
+        if stats.enabled:
+            stats.incr('quarantine.hits' if entry is not None else 'quarantine.misses')
+        return entry
+
+    def add(self, source, file_support, error, field=None):
+        """
+        Arguments:
+            source (str): Definition string
+            file_support (bool):
+            error (Exception|str): Error raised while parsing source
+            field (Field): Field where the definition was stored
+        """
+        if not self.size:
+            return
+
+        digest = source_digest(source, file_support)
+        # Unbound fields have no label
+        field = str(field) if getattr(field, 'model', None) is not None else None
+        with self._lock:
+            if digest not in self._entries:
+                self._entries[digest] = QuarantineEntry(digest, str(error), field)
+                if len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+
+    def entries(self):
+        """Return list with all QuarantineEntry, ordered by first_seen"""
+        with self._lock:
+            return list(self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+quarantine = Quarantine(settings.PARAM_QUARANTINE_SIZE)
@@ -0,0 +1,220 @@
+"""
+Host wide cache of compiled definitions stored in a memory mapped file, all
+the processes using the same file (the workers of a pre-fork server) share
+the definitions parsed by any of them. The payloads are read directly from
+the shared page cache, so the memory used doesn't grow with the number of
+workers.
+
+File layout:
+    header  magic, format version, slots, data size, data used, entries
+    slots   open addressing hash table of (digest, offset, length)
+    data    payloads, appended until the file is full
+
+Readers take a shared flock and writers an exclusive one. When the file
+is full new definitions aren't added (clear() or a larger file size
+are needed), existing entries are never evicted so offsets stay valid.
+
+The file name includes the format version and the layout (path.V-slots-size)
+so a file is never resized while other processes have it mapped, which
+would make them crash with SIGBUS. Payloads are unpickled, so the file must
+be owned by the user and not accessible by the group or others (it's
+created with mode 0600 and symbolic links aren't followed).
+"""
+from hashlib import sha1
+import logging
+import mmap
+import os
+import stat
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover
+    fcntl = None
+
+
+logger = logging.getLogger('param_field.cache')
+
+MAGIC = b'PFSC'
+VERSION = 1
+
+HEADER = struct.Struct('<4sIIQQQ')   # magic, version, slots, data size, used, entries
+HEADER_SIZE = 64
+SLOT = struct.Struct('<20sQI')       # digest, offset, length
+SLOT_SIZE = 32
+
+# Max fraction of used slots
+MAX_LOAD = 0.75
+
+
+class SharedFileCache(object):
+    """
+    Arguments:
+        path (str): Cache file prefix, the file is created if it doesn't exist
+        size (int): Bytes available for payloads
+        slots (int): Hash table size, max entries is slots*MAX_LOAD
+    """
+    def __init__(self, path, size=64*1024*1024, slots=65536):
+        if fcntl is None:
+            raise ValueError("Shared file cache requires fcntl (unix only)")
+        self.path = path
+        self.size = size
+        self.slots = slots
+        self.file_path = '{}.{}-{}-{}'.format(path, VERSION, slots, size)
+        self._data_start = HEADER_SIZE+slots*SLOT_SIZE
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._full = False
+
+    def _open(self):
+        """Open and map the file, again after a fork because flock locks
+        are shared with the parent process"""
+        if self._pid == os.getpid():
+            return
+        self.close()
+
+        fd = self._open_file()
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                total = self._data_start+self.size
+                file_size = os.fstat(fd).st_size
+                if file_size == 0:
+                    # New file, not mapped by any process yet
+                    os.ftruncate(fd, total)
+                elif file_size != total:
+                    raise ValueError("Shared cache file '{}' has an invalid size"\
+                            .format(self.file_path))
+                mapped = mmap.mmap(fd, total)
+                magic, version, slots, size, used, entries = \
+                    HEADER.unpack_from(mapped, 0)
+                if magic == bytes(len(MAGIC)):
+                    self._reset(mapped)
+                elif (magic, version, slots, size) != (MAGIC, VERSION, self.slots, self.size):
+                    mapped.close()
+                    raise ValueError("'{}' isn't a shared cache file".format(self.file_path))
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        except Exception:
+            os.close(fd)
+            raise
+
+        self._fd = fd
+        self._map = mapped
+        self._pid = os.getpid()
+        self._full = False
+
+    def _open_file(self):
+        """Create the file, or open it checking it's a regular file only
+        accessible by its owner, the current user"""
+        flags = os.O_RDWR | getattr(os, 'O_NOFOLLOW', 0)
+        try:
+            return os.open(self.file_path, flags | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+
+        fd = os.open(self.file_path, flags)
+        info = os.fstat(fd)
+        if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid()\
+                or info.st_mode & 0o077:
+            os.close(fd)
+            raise ValueError("Shared cache file '{}' must be a regular file owned "
+                "by the user without group or other permissions".format(self.file_path))
+        return fd
+
+    def _reset(self, mapped):
+        mapped[HEADER_SIZE:self._data_start] = bytes(self.slots*SLOT_SIZE)
+        HEADER.pack_into(mapped, 0, MAGIC, VERSION, self.slots, self.size, 0, 0)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._fd is not None:
+            os.close(self._fd)
+        self._map = self._fd = self._pid = None
+
+    def _find(self, digest):
+        """Return (slot index, offset, length) for digest, length is 0 when
+        missing and the slot the first empty one."""
+        mapped = self._map
+        index = int.from_bytes(digest[:8], 'little') % self.slots
+        for _ in range(self.slots):
+            slot_digest, offset, length = SLOT.unpack_from(mapped,
+                HEADER_SIZE+index*SLOT_SIZE)
+            if not length or slot_digest == digest:
+                return index, offset, length
+            index = (index+1) % self.slots
+        return None, 0, 0
+
+    @staticmethod
+    def digest(key):
+        return sha1(key.encode('utf-8')).digest()
+
+    def get(self, key):
+        """Return payload bytes stored for key, or None"""
+        digest = self.digest(key)
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+            try:
+                index, offset, length = self._find(digest)
+                if not length:
+                    return None
+                start = self._data_start+offset
+                return self._map[start:start+length]
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def set(self, key, payload):
+        """Store payload, returns False if the file is full"""
+        digest = self.digest(key)
+        with self._lock:
+            self._open()
+            if self._full:
+                if HEADER.unpack_from(self._map, 0)[5]:
+                    return False
+                # Cleared by another process
+                self._full = False
+
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                mapped = self._map
+                magic, version, slots, size, used, entries = HEADER.unpack_from(mapped, 0)
+                index, offset, length = self._find(digest)
+                if length:
+                    return True
+
+                if index is None or entries+1 > self.slots*MAX_LOAD\
+                        or used+len(payload) > self.size:
+                    self._full = True
+                    logger.warning("Shared definition cache '%s' is full", self.path)
+                    return False
+
+                start = self._data_start+used
+                mapped[start:start+len(payload)] = payload
+                SLOT.pack_into(mapped, HEADER_SIZE+index*SLOT_SIZE,
+                        digest, used, len(payload))
+                HEADER.pack_into(mapped, 0, magic, version, slots, size,
+                        used+len(payload), entries+1)
+                return True
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def clear(self):
+        """Remove all entries (for all the processes using the file)"""
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                self._reset(self._map)
+                self._full = False
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def __len__(self):
+        with self._lock:
+            self._open()
+            return HEADER.unpack_from(self._map, 0)[5]
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent for each timed operation while param_field.stats is enabled, name is
+# the operation ('parse_fields', 'validate', ...) and duration in seconds.
+operation_timed = Signal(providing_args=['name', 'duration'])
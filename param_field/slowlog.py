@@ -0,0 +1,155 @@
+"""
+Slow operation log, parses, validations and form builds taking longer than
+PARAM_SLOW_PARSE_MS are logged to the 'param_field.slow' logger with the
+definition fingerprint, size, field count and the time spent in each nested
+operation.
+
+With PARAM_SLOW_PROFILE_DIR set the operation is run again under cProfile
+by a background thread, so the request that was already slow isn't delayed,
+and the stats dumped to that directory (once per operation and definition)
+so they can be inspected with pstats or snakeviz. The rerun doesn't record
+stats and bypasses the definition cache, so it isn't counted twice and
+profiles the actual parse.
+"""
+from datetime import datetime
+import cProfile
+import logging
+import os
+import threading
+from .conf import settings
+
+
+logger = logging.getLogger('param_field.slow')
+
+
+class SlowLog(object):
+    """
+    Arguments:
+        threshold_ms (float): Operations slower than this are logged, None
+            disables the log.
+        profile_dir (str): Directory where profiles are stored, None
+            disables profiling.
+    """
+    def __init__(self, threshold_ms=None, profile_dir=None):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._profiled = set()
+        self._threads = []
+        self.configure(threshold_ms, profile_dir)
+
+    def configure(self, threshold_ms=None, profile_dir=None):
+        self.threshold_ms = threshold_ms
+        self.profile_dir = profile_dir
+        self.enabled = threshold_ms is not None
+        self._threshold = threshold_ms/1000.0 if self.enabled else None
+        with self._lock:
+            self._profiled.clear()
+
+    def _frames(self):
+        try:
+            return self._local.frames
+        except AttributeError:
+            self._local.frames = []
+            return self._local.frames
+
+    def enter(self):
+        """Start collecting the nested operation timings"""
+        self._frames().append({})
+
+    def exit(self, name, duration):
+        """
+        Stop collecting nested operation timings, returns them as a
+        {name: seconds} dict. The duration is added to the enclosing
+        operation.
+        """
+        frames = self._frames()
+        breakdown = frames.pop()
+        if frames:
+            parent = frames[-1]
+            parent[name] = parent.get(name, 0.0)+duration
+        return breakdown
+
+    def is_slow(self, duration):
+        """True if duration exceeds the threshold and the operation isn't nested
+        in another one (nested ones are reported in their breakdown)"""
+        return self.enabled and duration > self._threshold and not self._frames()\
+            and not getattr(self._local, 'profiling', False)
+
+    def report(self, name, params, duration, breakdown, rerun=None):
+        """
+        Log slow operation
+
+        Arguments:
+            name (str): Operation name
+            params (ParamDict): Definition used by the operation
+            duration (float): seconds
+            breakdown (dict): {nested operation name: seconds}
+            rerun (callable): Repeats the operation, used for profiling. It's
+                called from another thread.
+        """
+        fingerprint = params.fingerprint
+        source = str(params)
+        profile = None
+        if self.profile_dir and rerun is not None:
+            profile = self._profile(name, fingerprint, rerun)
+
+        breakdown_str = ' '.join('{}={:.1f}ms'.format(n, d*1000)
+                for n, d in sorted(breakdown.items()))
+        logger.warning("slow %s %.1fms fingerprint:%s size:%d fields:%d %s",
+            name, duration*1000, fingerprint, len(source), len(params), breakdown_str,
+            extra={
+                'operation': name,
+                'duration_ms': duration*1000,
+                'fingerprint': fingerprint,
+                'size': len(source),
+                'fields': len(params),
+                'breakdown': breakdown,
+                'profile': profile})
+
+    def _profile(self, name, fingerprint, rerun):
+        """Start profiling the operation in a background thread, returns the
+        stats file path or None if the definition was already profiled"""
+        key = (name, fingerprint)
+        with self._lock:
+            if key in self._profiled:
+                return None
+            self._profiled.add(key)
+            self._threads = [t for t in self._threads if t.is_alive()]
+
+            path = os.path.join(self.profile_dir, '{}-{}-{}.prof'.format(name,
+                fingerprint[:12], datetime.now().strftime('%Y%m%d%H%M%S')))
+            thread = threading.Thread(target=self._run_profile, args=(path, rerun),
+                name='param_field-profile', daemon=True)
+            self._threads.append(thread)
+        thread.start()
+        return path
+
+    def wait(self):
+        """Wait until the pending profiles are stored"""
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
+
+    def _run_profile(self, path, rerun):
+        """Run operation under cProfile and dump the stats to path"""
+        from .cache import definition_cache # Solve circular import
+        from .stats import stats # Solve circular import
+        profiler = cProfile.Profile()
+        self._local.profiling = True
+        try:
+            with stats.paused(), definition_cache.disabled():
+                profiler.runcall(rerun)
+        except Exception:
+            pass
+        finally:
+            self._local.profiling = False
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            profiler.dump_stats(path)
+        except OSError as err:
+            logger.error("Couldn't store profile %s: %s", path, err)
+
+
+slow_log = SlowLog(settings.PARAM_SLOW_PARSE_MS, settings.PARAM_SLOW_PROFILE_DIR)
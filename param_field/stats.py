@@ -0,0 +1,202 @@
+"""
+Opt-in runtime instrumentation, counts and latency histograms for the
+parse, load, validate and form paths, plus cache hits and misses.
+
+    >>> from param_field.stats import stats
+    >>> stats.enable()
+    >>> stats.snapshot()['timings']['parse_fields']['p90']
+
+Disabled by default (PARAM_STATS setting), instrumented functions then
+only check a flag before running. The same instrumentation feeds the slow
+operation log (see slowlog.py)
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+from .conf import settings
+from .signals import operation_timed
+from .slowlog import slow_log
+
+
+class Histogram(object):
+    """
+    Latency histogram with fixed exponential buckets.
+
+    Attributes:
+        count (int): Number of values recorded
+        total (float): Sum of all values
+        min (float):
+        max (float):
+    """
+    # Bucket upper bounds in seconds, from 10us doubling up to ~40s
+    BOUNDS = tuple(0.00001*2**i for i in range(23))
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0]*(len(self.BOUNDS)+1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.buckets[bisect_left(self.BOUNDS, value)] += 1
+
+    def percentile(self, percent):
+        """Return approximate percentile, the upper bound of the bucket
+        containing it (never above the max value recorded)"""
+        if not self.count:
+            return None
+
+        rank = self.count*percent/100.0
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index < len(self.BOUNDS):
+                    return min(self.BOUNDS[index], self.max)
+                break
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total/self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': [(bound, count) for bound, count 
+                in zip(self.BOUNDS+(None,), self.buckets) if count],
+        }
+
+
+class Stats(object):
+    """
+    Counters and timing histograms shared by all threads.
+
+    Arguments:
+        enabled (bool): Start recording
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._pause = threading.local()
+        self._counters = {}
+        self._timings = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    @contextmanager
+    def paused(self):
+        """Don't record anything from the calling thread within the with
+        block, other threads keep recording"""
+        self._pause.depth = getattr(self._pause, 'depth', 0)+1
+        try:
+            yield self
+        finally:
+            self._pause.depth -= 1
+
+    def _paused(self):
+        return getattr(self._pause, 'depth', 0) > 0
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+    def incr(self, name, value=1):
+        """Increase counter name"""
+        if not self.enabled or self._paused():
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0)+value
+
+    def record(self, name, duration):
+        """
+        Add a timing to the histogram of operation name
+
+        Arguments:
+            name (str): Operation name
+            duration (float): seconds
+        """
+        if not self.enabled or self._paused():
+            return
+        with self._lock:
+            histogram = self._timings.get(name, None)
+            if histogram is None:
+                histogram = self._timings[name] = Histogram()
+            histogram.add(duration)
+
+        operation_timed.send(sender=self.__class__, name=name, duration=duration)
+
+    def snapshot(self):
+        """
+        Return the current counters and timings
+
+        Returns:
+            dict: {'enabled': bool, 'counters': {name: int}, 
+                'timings': {name: Histogram.as_dict()}}
+        """
+        from .parser import outline_fields # Solve circular import
+        with self._lock:
+            counters = dict(self._counters)
+            timings = dict((name, h.as_dict()) for name, h in self._timings.items())
+
+        outline = outline_fields.cache_info()
+        counters['outline_fields.hits'] = outline.hits
+        counters['outline_fields.misses'] = outline.misses
+        return {'enabled': self.enabled, 'counters': counters, 'timings': timings}
+
+
+stats = Stats(settings.PARAM_STATS)
+
+
+def timed(name, subject=None):
+    """
+    Decorator recording the duration of each call in the histogram name,
+    failed calls are also counted in the counter name+'.errors'.
+
+    Arguments:
+        name (str): Operation name
+        subject (callable): subject(args, kwargs, result) returns the
+            ParamDict used by the call, required for slow calls to be 
+            reported to the slow log. (Only successful calls are reported)
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not (stats.enabled or slow_log.enabled):
+                return func(*args, **kwargs)
+
+            slow_log.enter()
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                stats.incr(name+'.errors')
+                raise
+            finally:
+                duration = time.perf_counter()-start
+                breakdown = slow_log.exit(name, duration)
+                stats.record(name, duration)
+
+            if subject is not None and slow_log.is_slow(duration):
+                slow_log.report(name, subject(args, kwargs, result), 
+                    duration, breakdown, lambda: func(*args, **kwargs))
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,220 @@
+"""
+Validation of large files of requests (JSONL or CSV) against a ParamDict,
+records are read, validated and written in chunks so the memory used
+doesn't depend on the file size, and the chunks can be spread over a
+process pool.
+"""
+from django.core.exceptions import ValidationError
+from collections import deque
+from decimal import Decimal, InvalidOperation
+import csv
+import json
+import multiprocessing
+import time
+from .params import BoolParam, IntegerParam, DecimalParam
+
+
+FORMATS = ('jsonl', 'csv')
+
+TRUE_STRINGS = frozenset(('true', '1', 'yes', 'on'))
+FALSE_STRINGS = frozenset(('false', '0', 'no', 'off'))
+
+
+def coerce_value(param, value):
+    """
+    Convert a value read from JSON or CSV to the param's native type, empty
+    strings are handled as missing values (None). Values that can't be
+    converted are returned unchanged so validation reports them.
+    """
+    if value is None or value == '':
+        return None
+
+    try:
+        if isinstance(param, BoolParam):
+            if isinstance(value, str):
+                lower = value.strip().lower()
+                if lower in TRUE_STRINGS:
+                    return True
+                if lower in FALSE_STRINGS:
+                    return False
+        elif isinstance(param, IntegerParam):
+            if isinstance(value, str):
+                return int(value)
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+        elif isinstance(param, DecimalParam):
+            if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+                return Decimal(str(value).strip())
+    except (ValueError, InvalidOperation):
+        pass
+    return value
+
+
+def coerce_request(params, request):
+    """Return a copy of request with the values of params coerced, unknown
+    parameters are kept so validate() rejects them"""
+    coerced = {}
+    for name, value in request.items():
+        param = params.get(name, None)
+        coerced[name] = value if param is None else coerce_value(param, value)
+    return coerced
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError("{} isn't JSON serializable".format(type(value).__name__))
+
+
+def validate_request(params, request):
+    """Validate request like ParamDict.validate(), except the parameters
+    that aren't required can be left out"""
+    for name in request:
+        if name not in params:
+            raise ValidationError("Unknown parameter '{}'".format(name))
+
+    for name, param in params.items():
+        value = request.get(name, None)
+        try:
+            if value is None:
+                if param.required and param.get_default() is None:
+                    raise ValidationError("No value supplied for {}".format(name))
+            else:
+                param.validate(value)
+        except (TypeError, ValueError, ValidationError) as err:
+            raise ValidationError(str(err))
+
+
+def validate_record(params, number, record):
+    """
+    Validate a record, returns (valid, result line)
+
+    Arguments:
+        params (ParamDict):
+        number (int): Record number reported in the result
+        record (str|dict): JSONL line or CSV row
+    """
+    try:
+        if isinstance(record, str):
+            record = json.loads(record)
+        if not isinstance(record, dict):
+            raise ValueError("Expected an object")
+    except ValueError as err:
+        result = {'record': number, 'valid': False, 'error': 'Invalid JSON: {}'.format(err)}
+        return False, json.dumps(result)
+
+    # Missing values (null or empty CSV cells) are left out
+    request = dict((name, value) for name, value
+            in coerce_request(params, record).items() if value is not None)
+    try:
+        validate_request(params, request)
+    except ValidationError as err:
+        result = {'record': number, 'valid': False, 'error': ' '.join(err.messages)}
+        return False, json.dumps(result)
+
+    values = params.add_defaults(request)
+    result = {'record': number, 'valid': True, 'values': values}
+    return True, json.dumps(result, default=_json_default, sort_keys=True)
+
+
+def validate_chunk(params, chunk):
+    """Validate a list of (number, record) tuples"""
+    return [validate_record(params, number, record) for number, record in chunk]
+
+
+# ParamDict of each pool worker, sent once by the pool initializer
+_worker_params = None
+
+def _init_worker(params):
+    global _worker_params
+    _worker_params = params
+
+def _validate_worker_chunk(chunk):
+    return validate_chunk(_worker_params, chunk)
+
+
+def read_records(f, format='jsonl'):
+    """
+    Yield (record number, record) for each record in a file, JSONL lines are
+    returned undecoded (blank lines are skipped) and CSV rows as dicts.
+    """
+    if format == 'jsonl':
+        number = 0
+        for line in f:
+            if line.strip():
+                number += 1
+                yield number, line
+    elif format == 'csv':
+        for number, row in enumerate(csv.DictReader(f), 1):
+            yield number, row
+    else:
+        raise ValueError("Unknown format '{}', expected one of: {}".format(
+            format, ', '.join(FORMATS)))
+
+
+def _chunks(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_stream(params, infile, outfile, format='jsonl', workers=1,
+        chunk_size=1000, errors_only=False):
+    """
+    Validate every record of infile against params, writing a JSON line to
+    outfile for each one in input order:
+
+        {"record": 1, "valid": true, "values": {...}}   (with defaults added)
+        {"record": 2, "valid": false, "error": "..."}
+
+    Arguments:
+        params (ParamDict):
+        infile (file): Text file with the records
+        outfile (file): Text file for the results
+        format (str): 'jsonl' or 'csv'
+        workers (int): Number of processes, with 1 records are validated
+            in the calling process.
+        chunk_size (int): Records sent to a worker at once
+        errors_only (bool): Only write the invalid records
+
+    Returns:
+        dict: {'records', 'valid', 'invalid', 'seconds', 'rate'}
+    """
+    report = {'records': 0, 'valid': 0, 'invalid': 0}
+    start = time.perf_counter()
+
+    def write(results):
+        for valid, line in results:
+            report['records'] += 1
+            report['valid' if valid else 'invalid'] += 1
+            if not (errors_only and valid):
+                outfile.write(line+'\n')
+
+    chunks = _chunks(read_records(infile, format), max(1, chunk_size))
+    if workers <= 1:
+        for chunk in chunks:
+            write(validate_chunk(params, chunk))
+    else:
+        # Bounded number of chunks in flight, so a slow writer or a large
+        # file don't fill the memory with pending results
+        pool = multiprocessing.Pool(workers, _init_worker, (params,))
+        try:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_validate_worker_chunk, (chunk,)))
+                if len(pending) >= workers*2:
+                    write(pending.popleft().get())
+            while pending:
+                write(pending.popleft().get())
+        finally:
+            pool.terminate()
+            pool.join()
+
+    report['seconds'] = time.perf_counter()-start
+    report['rate'] = report['records']/report['seconds'] if report['seconds'] else 0.0
+    return report
@@ -0,0 +1,21 @@
+from django.db import models
+from param_field.models import ParamField, ParamManager
+
+
+class Product(models.Model):
+    name = models.CharField(max_length=40, blank=True)
+    params = ParamField(file_support=False)
+
+    objects = ParamManager()
+
+    class Meta:
+        app_label = 'param_field'
+
+
+class FingerprintProduct(models.Model):
+    params = ParamField(fingerprint_field='params_fingerprint')
+    params_fingerprint = models.CharField(max_length=40, db_index=True, 
+            editable=False, blank=True)
+
+    class Meta:
+        app_label = 'param_field'
@@ -0,0 +1,166 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.exceptions import ValidationError
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest.mock import patch
+from pyparsing import ParseBaseException
+import asyncio
+import os
+import shutil
+import tempfile
+import param_field.aio
+from param_field import aio
+from param_field.params import *
+from param_field.cache import definition_cache
+from .models import Product
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+LARGE = '\n'.join('p{}: Integer-> min:0 max:{} default:0'.format(i, i+10)
+        for i in range(30))
+
+
+class TestAsync(TestCase):
+
+    def tearDown(self):
+        aio.set_executor(None)
+        definition_cache.configure(settings.PARAM_CACHE_SIZE, 
+                settings.PARAM_CACHE_ALIAS, settings.PARAM_CACHE_TIMEOUT)
+
+    def test_parse(self):
+        for source in ('', 'a: Integer-> max:10', LARGE):
+            params = run(aio.parse(source))
+            self.assertIsInstance(params, ParamDict)
+            self.assertEqual(str(params), source)
+            self.assertEqual(params.to_str(), ParamDict(source).to_str())
+
+        image = run(aio.parse('a: Image', True))
+        self.assertIsInstance(image['a'], ImageParam)
+
+        with self.assertRaises(ParseBaseException):
+            run(aio.parse('a: Invalid'))
+        with self.assertRaises(ParseBaseException):
+            run(aio.parse(LARGE+'\nb: Invalid'))
+
+    def test_inline(self):
+        executor = ThreadPoolExecutor(1)
+        aio.set_executor(executor)
+        with patch.object(executor, 'submit', wraps=executor.submit) as submit:
+            params = run(aio.parse('a: Integer-> max:10'))
+            run(aio.validate(params, {'a': 5}))
+            run(aio.form(params))
+            self.assertEqual(submit.call_count, 0)
+
+            params = run(aio.parse(LARGE))
+            run(aio.validate(params, {}))
+            run(aio.form(params))
+            self.assertEqual(submit.call_count, 3)
+
+            # Cached definitions aren't parsed again
+            definition_cache.configure(size=10)
+            run(aio.parse(LARGE))
+            params = run(aio.parse(LARGE))
+            self.assertEqual(submit.call_count, 4)
+            self.assertEqual(params['p29'].max, 39)
+
+            # Shared file lookups run in the executor
+            path = os.path.join(tempfile.mkdtemp(), 'cache')
+            definition_cache.configure(size=10, path=path, path_size=64*1024)
+            with patch.object(definition_cache, 'get', 
+                    wraps=definition_cache.get) as get:
+                params = run(aio.parse('a: Integer-> max:10'))
+                run(aio.parse('a: Integer-> max:10'))
+                self.assertEqual(submit.call_count, 6)
+                self.assertEqual(get.call_count, 2)
+            self.assertEqual(params['a'].max, 10)
+            definition_cache.configure()
+            shutil.rmtree(os.path.dirname(path))
+        executor.shutdown()
+
+    @override_settings(PARAM_ASYNC_EXECUTOR=None)
+    def test_no_executor(self):
+        params = run(aio.parse(LARGE))
+        self.assertIsNone(aio.get_executor())
+        run(aio.validate(params, {'p0': 5}))
+
+    def test_validate(self):
+        for source in ('a: Integer-> max:10', LARGE.replace('p0', 'a')):
+            params = ParamDict(source)
+            self.assertIsNone(run(aio.validate(params, {'a': 5})))
+            with self.assertRaises(ValidationError):
+                run(aio.validate(params, {'a': 50}))
+            with self.assertRaises(ValidationError):
+                run(aio.validate(params, {'unknown': 5}))
+
+    def test_form(self):
+        for source in ('a: Integer-> max:10', LARGE.replace('p0', 'a')):
+            params = ParamDict(source)
+            form = run(aio.form(params, {'a': 5}))
+            self.assertEqual(list(form.fields.keys()), list(params.keys()))
+            self.assertEqual(form.is_valid(), params.form({'a': 5}).is_valid())
+        self.assertIsNone(run(aio.form(ParamDict(''))))
+
+    def test_process_executor(self):
+        executor = ProcessPoolExecutor(1)
+        aio.set_executor(executor)
+        params = run(aio.parse(LARGE))
+        self.assertEqual(params['p29'].max, 39)
+
+        # Validation runs in a thread, the ParamDict isn't sent to the workers
+        with patch.object(executor, 'submit', wraps=executor.submit) as submit:
+            run(aio.validate(params, {'p1': 5}))
+            with self.assertRaises(ValidationError):
+                run(aio.validate(params, {'p1': 50}))
+            self.assertEqual(submit.call_count, 0)
+        self.assertEqual(len(run(aio.form(params)).fields), 30)
+
+        # Shared caches are used from a thread, only the parse is sent to the
+        # process
+        path = os.path.join(tempfile.mkdtemp(), 'cache')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        definition_cache.configure(path=path, path_size=64*1024)
+        with patch.object(executor, 'submit', wraps=executor.submit) as submit:
+            params = run(asyncio.wait_for(aio.parse(LARGE), 30))
+            self.assertEqual(params['p29'].max, 39)
+            self.assertEqual(submit.call_count, 1)
+            params = run(asyncio.wait_for(aio.parse(LARGE), 30))
+            self.assertEqual(submit.call_count, 1)
+        self.assertIsNotNone(definition_cache.get(LARGE))
+        executor.shutdown()
+
+    @override_settings(PARAM_ASYNC_EXECUTOR='fork')
+    def test_invalid_executor(self):
+        with self.assertRaises(ValueError):
+            run(aio.parse(LARGE))
+
+
+class TestAsyncIterator(TransactionTestCase):
+
+    def test_aiter_params(self):
+        sources = ['a: Integer-> max:{}'.format(i % 3) for i in range(10)]
+        for i, source in enumerate(sources):
+            Product.objects.create(name=str(i), params=source)
+        Product.objects.create(name='invalid', params='a: Invalid')
+
+        async def collect():
+            return [row async for row in aio.aiter_params(
+                Product.objects.order_by('pk'), 'params', chunk_size=3)]
+        rows = run(collect())
+
+        self.assertEqual([pk for pk, _ in rows], 
+            list(Product.objects.order_by('pk').values_list('pk', flat=True)))
+        self.assertEqual([params['a'].max for _, params in rows[:10]], 
+            [i % 3 for i in range(10)])
+        # Invalid definitions aren't parsed
+        self.assertEqual(len(rows[10][1]), 0)
+        self.assertEqual(str(rows[10][1]), 'a: Invalid')
+
+        # Abandoned
+        async def first():
+            rows = aio.aiter_params(Product.objects.all(), 'params', chunk_size=3)
+            async for row in rows:
+                await rows.aclose()
+                return row
+        self.assertIsInstance(run(first())[1], ParamDict)
@@ -0,0 +1,124 @@
+from django.test import TestCase
+from django.core.cache import caches
+from unittest.mock import patch
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pyparsing import ParseBaseException
+import param_field.parser
+from param_field.params import *
+from param_field.cache import DefinitionCache, definition_cache, FORMAT_VERSION
+from param_field.quarantine import quarantine
+from .models import Product
+
+
+class TestDefinitionCache(TestCase):
+
+    def setUp(self):
+        quarantine.clear()
+        caches['default'].clear()
+
+    def tearDown(self):
+        definition_cache.configure(settings.PARAM_CACHE_SIZE, 
+                settings.PARAM_CACHE_ALIAS, settings.PARAM_CACHE_TIMEOUT)
+        caches['default'].clear()
+
+    def test_local(self):
+        cache = DefinitionCache(size=2)
+        source = "a: Integer-> max:10\nb: Bool"
+        with patch('param_field.parser.parse_fields', 
+                wraps=param_field.parser.parse_fields) as parse:
+            first = cache.load(source)
+            second = cache.load(source)
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(list(first.keys()), ['a', 'b'])
+        self.assertEqual(second['a'].max, 10)
+
+        # Each lookup returns new Params
+        self.assertIsNot(first['a'], second['a'])
+
+        # Definitions parsed with file support are cached separately
+        self.assertIsNone(cache.get(source, True))
+
+        # LRU
+        cache.load("c: Integer")
+        cache.load("d: Integer")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(source))
+
+        with self.assertRaises(ParseBaseException):
+            cache.load("a: Invalid")
+
+    def test_disabled(self):
+        cache = DefinitionCache()
+        self.assertFalse(cache.enabled)
+        cache.load("a: Integer")
+        self.assertIsNone(cache.get("a: Integer"))
+
+    def test_bypass(self):
+        """Test disabled() only bypasses the cache in the calling thread"""
+        source = "a: Integer"
+        cache = DefinitionCache(size=10)
+        cache.load(source)
+
+        with cache.disabled():
+            with cache.disabled():
+                self.assertIsNone(cache.get(source))
+            self.assertIsNone(cache.get(source))
+            cache.set("b: Integer", False, OrderedDict())
+
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                self.assertIsNotNone(executor.submit(cache.get, source).result())
+
+            # Reconfigured within the block, the new settings are kept
+            cache.configure(size=20)
+            cache.load(source)
+
+        self.assertTrue(cache.enabled)
+        self.assertEqual(cache.size, 20)
+        self.assertIsNone(cache.get("b: Integer"))
+        self.assertIsNone(cache.get(source))
+        cache.load(source)
+        self.assertIsNotNone(cache.get(source))
+
+    def test_shared(self):
+        """Test definitions cached by one process are available to others"""
+        source = "a: Integer-> max:10"
+        DefinitionCache(alias='default').load(source)
+
+        other = DefinitionCache(size=10, alias='default')
+        with patch('param_field.parser.parse_fields') as parse:
+            fields = other.load(source)
+        self.assertEqual(parse.call_count, 0)
+        self.assertEqual(fields['a'].max, 10)
+        self.assertEqual(len(other), 1)
+
+        key = other.key(source)
+        self.assertIn(':{}:'.format(FORMAT_VERSION), key)
+        self.assertIsNotNone(caches['default'].get(key))
+
+    def test_shared_errors(self):
+        cache = DefinitionCache(alias='unknown')
+        with self.assertLogs('param_field.cache', level='WARNING'):
+            fields = cache.load("a: Integer")
+        self.assertEqual(list(fields.keys()), ['a'])
+
+    def test_from_db_value(self):
+        definition_cache.configure(size=10, alias='default')
+        Product.objects.create(name='a', params='a: Integer')
+        Product.objects.create(name='b', params='a: Integer')
+        Product.objects.create(name='c', params='a: Invalid')
+
+        with patch('param_field.parser.parse_fields', 
+                wraps=param_field.parser.parse_fields) as parse:
+            products = list(Product.objects.all())
+            list(Product.objects.all())
+        self.assertEqual(parse.call_count, 2)
+        self.assertIsNot(products[0].params['a'], products[1].params['a'])
+        self.assertEqual(len(products[2].params), 0)
+
+        # with_parsed_params
+        definition_cache.clear()
+        with patch('param_field.parser.parse_fields') as parse:
+            products = list(Product.objects.with_parsed_params())
+        self.assertEqual(parse.call_count, 0)
+        self.assertEqual(list(products[0].params.keys()), ['a'])
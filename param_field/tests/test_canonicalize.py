@@ -0,0 +1,84 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+import json
+import os
+import tempfile
+from param_field.params import *
+from .models import Product
+
+
+class TestCanonicalizeCommand(TestCase):
+
+    def setUp(self):
+        self.sources = [
+            'width: Dimmension-> max:50.0 min:5.0',
+            'width:Dimmension->min:5.0   max:50.0',
+            'width: Dimmension-> min:5.0 max:50.0',
+            'count: Integer',
+            'a: Invalid',
+        ]
+        self.products = [Product.objects.create(name=str(i), params=s)
+                for i, s in enumerate(self.sources)]
+        self.canonical = ParamDict(self.sources[0]).to_str()
+
+    def stored(self):
+        return [str(Product.objects.get(pk=p.pk).params) for p in self.products]
+
+    def test_canonicalize(self):
+        out = StringIO()
+        call_command('paramfield_canonicalize', 'param_field.Product.params',
+                chunk_size=2, stdout=out)
+        self.assertIn('5 rows, 4 changed, 1 invalid', out.getvalue())
+
+        stored = self.stored()
+        self.assertEqual(stored[:3], [self.canonical]*3)
+        self.assertEqual(stored[3], 'count:Integer')
+        self.assertEqual(stored[4], 'a: Invalid')
+
+        # Nothing left to do
+        out = StringIO()
+        call_command('paramfield_canonicalize', 'param_field.Product.params', stdout=out)
+        self.assertIn('5 rows, 0 changed, 1 invalid', out.getvalue())
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command('paramfield_canonicalize', 'param_field.Product.params',
+                dry_run=True, stdout=out)
+        output = out.getvalue()
+        self.assertIn('--- pk:{} stored'.format(self.products[0].pk), output)
+        self.assertIn('+++ pk:{} canonical'.format(self.products[0].pk), output)
+        self.assertIn('-'+self.sources[1], output)
+        self.assertIn('+'+self.canonical, output)
+        self.assertIn('5 rows, 4 would change, 1 invalid', output)
+        self.assertEqual(self.stored(), self.sources)
+
+    def test_resume(self):
+        fd, checkpoint = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(checkpoint)
+        self.addCleanup(lambda: os.path.exists(checkpoint) and os.remove(checkpoint))
+
+        call_command('paramfield_canonicalize', 'param_field.Product.params',
+                start_after=self.products[1].pk, checkpoint=checkpoint, 
+                chunk_size=1, stdout=StringIO())
+        stored = self.stored()
+        self.assertEqual(stored[:2], self.sources[:2])
+        self.assertEqual(stored[2], self.canonical)
+
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f), 
+                {'field': 'param_field.Product.params', 'last_pk': self.products[-1].pk})
+
+        # Resumes from the checkpoint
+        Product.objects.filter(pk=self.products[2].pk).update(params=self.sources[2])
+        out = StringIO()
+        call_command('paramfield_canonicalize', 'param_field.Product.params',
+                checkpoint=checkpoint, stdout=out)
+        self.assertIn('0 rows', out.getvalue())
+        self.assertEqual(self.stored()[2], self.sources[2])
+
+        with self.assertRaises(CommandError):
+            call_command('paramfield_canonicalize', 'param_field.Product.name',
+                checkpoint=checkpoint, stdout=StringIO())
@@ -0,0 +1,114 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+import os
+import shutil
+import tempfile
+from param_field.params import *
+from param_field.catalog import Catalog, CatalogWriter
+from .models import Product, FingerprintProduct
+
+
+class TestCatalog(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'definitions.catalog')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_write_read(self):
+        definitions = [ParamDict('a: Integer-> max:{}\nb: Bool'.format(i)) 
+                for i in range(50)]
+        with CatalogWriter(self.path) as writer:
+            for params in definitions:
+                self.assertTrue(writer.add(params))
+            # Equivalent definitions are only stored once
+            self.assertFalse(writer.add(ParamDict('a:Integer->max:0  \nb:Bool')))
+        self.assertEqual(len(writer), 50)
+
+        with Catalog(self.path) as catalog:
+            self.assertEqual(len(catalog), 50)
+            for params in definitions:
+                loaded = catalog[params.fingerprint]
+                self.assertEqual(loaded.to_str(), params.to_str())
+                self.assertEqual(loaded.fingerprint, params.fingerprint)
+                self.assertIn(params.fingerprint, catalog)
+
+            # New ParamDict on each lookup
+            fingerprint = definitions[0].fingerprint
+            catalog[fingerprint]['a'].max = 100
+            self.assertEqual(catalog[fingerprint]['a'].max, 0)
+
+            self.assertEqual(sorted(catalog.fingerprints()), 
+                sorted(p.fingerprint for p in definitions))
+
+            missing = ParamDict('c: Text').fingerprint
+            self.assertIsNone(catalog.get(missing))
+            self.assertNotIn(missing, catalog)
+            self.assertNotIn('not hex', catalog)
+            with self.assertRaises(KeyError):
+                catalog[missing]
+
+    def test_empty(self):
+        with CatalogWriter(self.path):
+            pass
+        with Catalog(self.path) as catalog:
+            self.assertEqual(len(catalog), 0)
+            self.assertIsNone(catalog.get(ParamDict('a: Bool').fingerprint))
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'x'*100)
+        with self.assertRaises(ValueError):
+            Catalog(self.path)
+
+        # Failed build doesn't replace the previous catalog
+        with self.assertRaises(RuntimeError):
+            with CatalogWriter(self.path) as writer:
+                writer.add(ParamDict('a: Bool'))
+                raise RuntimeError()
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), b'x'*100)
+        self.assertEqual(os.listdir(self.dir), ['definitions.catalog'])
+
+
+class TestCatalogCommand(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'definitions.catalog')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_catalog(self):
+        sources = [
+            'width: Dimmension-> max:50.0 min:5.0',
+            'width:Dimmension->min:5.0   max:50.0',
+            'count: Integer',
+            'count: Integer',
+            'a: Invalid',
+        ]
+        for i, source in enumerate(sources):
+            Product.objects.create(name=str(i), params=source)
+        FingerprintProduct.objects.create(params='image: Image')
+        FingerprintProduct.objects.create(params='count:Integer')
+
+        out = StringIO()
+        call_command('paramfield_catalog', self.path, 'param_field.Product.params',
+                'param_field.FingerprintProduct.params', chunk_size=2, stdout=out)
+        self.assertIn('3 definitions from 7 rows', out.getvalue())
+        self.assertIn('1 invalid definitions skipped', out.getvalue())
+
+        with Catalog(self.path) as catalog:
+            for product in FingerprintProduct.objects.all():
+                params = catalog[product.params_fingerprint]
+                self.assertEqual(params.to_str(), product.params.to_str())
+            params = catalog[ParamDict(sources[0]).fingerprint]
+            self.assertEqual(params['width'].max, 50.0)
+
+        with self.assertRaises(CommandError):
+            call_command('paramfield_catalog', self.path, 'param_field.Product.name')
@@ -0,0 +1,72 @@
+from django.test import TestCase, override_settings
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from io import StringIO
+from param_field.params import *
+from param_field.generator import DefinitionGenerator
+from .models import Product, FingerprintProduct
+
+
+class TestDefinitionGenerator(TestCase):
+
+    def test_valid_definitions(self):
+        """Test generated definitions parse and the generated requests
+        validate as expected"""
+        for seed in range(30):
+            gen = DefinitionGenerator(seed=seed, file_support=True,
+                    property_density=(seed%5)/4.0, choices_ratio=0.5)
+            params = ParamDict(gen.definition(15), file_support=True)
+            self.assertEqual(len(params), 15)
+
+            params.validate(gen.valid_request(params))
+            with self.assertRaises(ValidationError):
+                params.validate(gen.invalid_request(params))
+
+    def test_reproducible(self):
+        self.assertEqual(DefinitionGenerator(seed=3).definition(10),
+                DefinitionGenerator(seed=3).definition(10))
+
+    def test_canonical(self):
+        source = DefinitionGenerator(seed=5, canonical=True).definition(10)
+        self.assertEqual(ParamDict(source).to_str(), source)
+
+    def test_type_mix(self):
+        gen = DefinitionGenerator(seed=1, type_mix={'Bool': 1})
+        params = ParamDict(gen.definition(10))
+        self.assertTrue(all(isinstance(p, BoolParam) for p in params.values()))
+
+        with self.assertRaises(ValueError):
+            DefinitionGenerator(type_mix={'File': 1})
+        with self.assertRaises(ValueError):
+            DefinitionGenerator(type_mix={'Float': 1})
+
+    @override_settings(PARAM_MAX_FIELDS=10)
+    def test_limits(self):
+        gen = DefinitionGenerator(seed=2, name_length=(100, 100),
+                choices_size=(500, 500), choices_ratio=1.0)
+        params = ParamDict(gen.definition(5))
+        for name, param in params.items():
+            self.assertEqual(len(name), settings.PARAM_NAME_MAX_LENGTH)
+
+        with self.assertRaises(ValueError):
+            gen.definition(settings.PARAM_MAX_FIELDS+1)
+
+
+class TestFillCommand(TestCase):
+
+    def test_fill(self):
+        out = StringIO()
+        call_command('paramfield_fill', 'param_field.Product.params', '25',
+                fields=5, distinct=3, seed=1, batch_size=10, stdout=out)
+        self.assertIn('25 rows created', out.getvalue())
+
+        products = list(Product.objects.with_parsed_params())
+        self.assertEqual(len(products), 25)
+        self.assertLessEqual(len(set(str(p.params) for p in products)), 3)
+        self.assertTrue(all(len(p.params) == 5 for p in products))
+
+    def test_fingerprint(self):
+        call_command('paramfield_fill', 'param_field.FingerprintProduct.params',
+                '5', seed=1, stdout=StringIO())
+        for product in FingerprintProduct.objects.all():
+            self.assertEqual(product.params_fingerprint, product.params.fingerprint)
@@ -0,0 +1,135 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from unittest.mock import patch
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
+import param_field.lint
+from param_field.lint import lint_files, lint_params, lint_fixture
+from .models import Product
+
+
+FIXTURE = [
+    {'model': 'param_field.product', 'pk': 1, 
+        'fields': {'name': 'a', 'params': 'width: Dimmension-> max:50.0'}},
+    {'model': 'param_field.product', 'pk': 2, 
+        'fields': {'name': 'b', 'params': 'width: Dimmension\nheight: Invalid'}},
+    {'model': 'param_field.fingerprintproduct', 'pk': 1, 
+        'fields': {'params': 'doc: File', 'params_fingerprint': ''}},
+    {'model': 'param_field.product', 'pk': 3, 
+        'fields': {'name': 'c', 'params': 'doc: File'}},
+    {'model': 'unknown.model', 'pk': 1, 'fields': {'params': 'x: Invalid'}},
+]
+
+
+class TestLint(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = os.path.join(self.dir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_lint_params(self):
+        self.assertEqual(lint_params('a: Integer\nb: Bool'), [])
+        errors = lint_params('a: Integer\nb: Bool-> max:3')
+        self.assertEqual(len(errors), 1)
+        self.assertEqual((errors[0]['line'], errors[0]['column']), (2, 1))
+        self.assertEqual(lint_params('a: Integer\n  b: Invalid')[0]['line'], 2)
+
+        self.assertEqual(len(lint_params('a: File')), 1)
+        self.assertEqual(lint_params('a: File', True), [])
+
+    def test_lint_fixture(self):
+        text = json.dumps(FIXTURE, indent=2)
+        errors = lint_fixture(text)
+        self.assertEqual([(e['pk'], e['field']) for e in errors], [(2, 'params'), (3, 'params')])
+        self.assertEqual(errors[0]['definition_line'], 2)
+        line = text.splitlines()[errors[0]['line']-1]
+        self.assertIn('height: Invalid', line[errors[0]['column']-1:])
+
+        # Non-ASCII values, escaped or not
+        fixture = [{'model': 'param_field.product', 'pk': 4,
+            'fields': {'name': 'd', 'params': 'a: Text-> label:"Año"\nb: Invalid'}}]
+        for ensure_ascii in (False, True):
+            text = json.dumps(fixture, indent=2, ensure_ascii=ensure_ascii)
+            errors = lint_fixture(text)
+            line = text.splitlines()[errors[0]['line']-1]
+            self.assertIn('b: Invalid', line[errors[0]['column']-1:])
+
+        errors = lint_fixture('[{"model": ')
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]['line'], 1)
+
+    def test_lint_files(self):
+        self.write('a.params', 'a: Integer')
+        self.write('sub/b.params', 'b: Invalid')
+        self.write('.hidden/c.params', 'c: Invalid')
+        self.write('app/fixtures/products.json', json.dumps(FIXTURE, indent=2))
+        self.write('app/other.json', '[]')
+        self.write('notes.txt', 'x: Invalid')
+
+        results, totals = lint_files([self.dir], workers=2, cache_path=self.cache)
+        self.assertEqual(totals, {'files': 3, 'cached': 0, 'errors': 3})
+        self.assertEqual([os.path.relpath(p, self.dir) for p, e in results],
+            ['a.params', 'app/fixtures/products.json', 'sub/b.params'])
+
+        # Unchanged files aren't parsed again
+        self.write('a.params', 'a: Integer\nb: Bool')
+        with patch('param_field.lint.lint_text', wraps=param_field.lint.lint_text) as lint:
+            results, totals = lint_files([self.dir], workers=1, cache_path=self.cache)
+        self.assertEqual(lint.call_count, 1)
+        self.assertEqual(totals, {'files': 3, 'cached': 2, 'errors': 3})
+
+        results, totals = lint_files([self.dir], workers=1, cache_path=self.cache,
+                file_support=True)
+        self.assertEqual(totals['cached'], 1)
+
+        # Fixtures are linted again when the models change
+        with patch('param_field.lint.fixture_signature', return_value='other'):
+            results, totals = lint_files([self.dir], workers=1, cache_path=self.cache,
+                    file_support=True)
+        self.assertEqual(totals['cached'], 2)
+
+        # Without cache_path nothing is cached
+        results, totals = lint_files([self.dir], workers=1)
+        self.assertEqual(totals['cached'], 0)
+
+    def test_command(self):
+        self.write('a.params', 'a: Integer')
+        out = StringIO()
+        call_command('paramfield_lint', self.dir, cache=self.cache, stdout=out, 
+            stderr=StringIO())
+        self.assertEqual(out.getvalue(), '')
+
+        path = self.write('b.params', 'b: Integer\nc: Invalid')
+        with self.assertRaisesRegex(CommandError, '2 files \(1 cached\), 1 errors'):
+            call_command('paramfield_lint', self.dir, cache=self.cache, stdout=out)
+        self.assertTrue(out.getvalue().startswith(path+':2:'))
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('paramfield_lint', path, format='json', stdout=out)
+        error = json.loads(out.getvalue())
+        self.assertEqual((error['path'], error['line']), (path, 2))
+
+        # The cache is opt-in
+        cwd = os.getcwd()
+        os.chdir(self.dir)
+        try:
+            with self.assertRaisesRegex(CommandError, '2 files \(0 cached\)'):
+                call_command('paramfield_lint', stdout=StringIO())
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(sorted(os.listdir(self.dir)), ['a.params', 'b.params', 'cache'])
@@ -1,10 +1,16 @@
 from django.test import TestCase, override_settings
+from django.test.utils import isolate_apps
 from django.core.exceptions import ValidationError
 from param_field.models import ParamField
 from param_field.params import *
 from param_field.forms import *
+from param_field.models import param_update_fields
+from unittest.mock import patch
+import param_field.parser
 
 from django.db import models
+from param_field.quarantine import quarantine
+from .models import Product, FingerprintProduct
 
 
 class TestParamField(TestCase):
@@ -78,3 +84,183 @@ class TestParamField(TestCase):
         params = "enable_field1: Bool"
         with self.assertRaises(ValidationError):
             valid = p.clean(params, None)
+
+
+
+class TestParamQuerySet(TestCase):
+
+    def setUp(self):
+        quarantine.clear()
+        self.definitions = [
+            'width: Dimmension-> max:50.0 min:5.0',
+            'count: Integer-> default:2',
+            'invalid: Invalidparam']
+
+        for i in range(10):
+            Product.objects.create(name=str(i), 
+                params=self.definitions[i%len(self.definitions)])
+
+    def test_with_parsed_params(self):
+        products = list(Product.objects.with_parsed_params(chunk_size=4)) 
+        self.assertEqual(len(products), 10)
+
+        for p in products:
+            source = self.definitions[int(p.name)%len(self.definitions)]
+            self.assertIsInstance(p.params, ParamDict)
+            self.assertEqual(str(p.params), source)
+
+        self.assertIsInstance(products[0].params['width'], DimmensionParam)
+        self.assertIsInstance(products[1].params['count'], IntegerParam)
+
+        # Invalid definitions return an empty ParamDict
+        self.assertEqual(len(products[2].params), 0)
+
+        # Instances within the same chunk share the definition
+        self.assertIs(products[0].params, products[3].params)
+        self.assertIsNot(products[3].params, products[6].params)
+
+    def test_distinct_parsed_once(self):
+        """Test each distinct definition is parsed once per chunk"""
+        with patch('param_field.parser.parse_fields', 
+                wraps=param_field.parser.parse_fields) as parse:
+            list(Product.objects.with_parsed_params(chunk_size=10))
+        self.assertEqual(parse.call_count, 3)
+
+        with patch('param_field.parser.parse_fields', 
+                wraps=param_field.parser.parse_fields) as parse:
+            list(Product.objects.all())
+        
+        # The invalid definition was quarantined by the previous load
+        self.assertEqual(parse.call_count, 7)
+
+    def test_chained_queryset(self):
+        qs = Product.objects.with_parsed_params(chunk_size=2)\
+            .filter(name__in=['0', '1']).order_by('name')
+        products = list(qs.iterator())
+        self.assertEqual(len(products), 2)
+        self.assertIsInstance(products[1].params['count'], IntegerParam)
+
+        # Deferred field isn't loaded
+        product = Product.objects.with_parsed_params().only('name')[0]
+        self.assertIsInstance(product.params, ParamDict)
+
+    def test_parse_not_deferred_after_iteration(self):
+        it = Product.objects.with_parsed_params(chunk_size=2).iterator()
+        next(it)
+        self.assertIsInstance(Product.objects.get(name='0').params, ParamDict)
+
+
+
+class TestFingerprintField(TestCase):
+
+    def test_fingerprint_updated(self):
+        p = FingerprintProduct.objects.create(params='a: Integer-> max:5 min:1')
+        self.assertEqual(p.params_fingerprint, 
+                ParamDict('a: Integer-> max:5 min:1').fingerprint)
+
+        p = FingerprintProduct.objects.get(pk=p.pk)
+        self.assertEqual(p.params_fingerprint, p.params.fingerprint)
+
+        FingerprintProduct.objects.create(params='a:Integer->min:1 max:5')
+        FingerprintProduct.objects.create(params='b: Integer')
+        FingerprintProduct.objects.create(params='invalid: Invalid')
+
+        groups = FingerprintProduct.objects.values('params_fingerprint')\
+            .annotate(n=models.Count('pk')).order_by('-n')
+        self.assertEqual(len(groups), 3)
+        self.assertEqual(groups[0]['n'], 2)
+
+        # Modified definition
+        p.params = 'b: Integer'
+        p.save()
+        self.assertEqual(
+            FingerprintProduct.objects.filter(
+                params_fingerprint=p.params_fingerprint).count(), 2)
+
+    def test_fingerprint_update_fields(self):
+        p = FingerprintProduct.objects.create(params='a: Integer')
+        p.params = 'b: Bool'
+        p.save(update_fields=['params'])
+        self.assertEqual(FingerprintProduct.objects.get(pk=p.pk).params_fingerprint,
+                ParamDict('b: Bool').fingerprint)
+
+        p = FingerprintProduct.objects.get(pk=p.pk)
+        p.params['c'] = IntegerParam()
+        p.save(update_fields=['params', 'params_fingerprint'])
+        self.assertEqual(FingerprintProduct.objects.get(pk=p.pk).params_fingerprint,
+                ParamDict('b: Bool\nc: Integer').fingerprint)
+
+    def test_fingerprint_bulk_create(self):
+        FingerprintProduct.objects.bulk_create([
+            FingerprintProduct(params='a: Integer'),
+            FingerprintProduct(params='a:Integer')])
+        self.assertEqual(set(FingerprintProduct.objects.values_list(
+            'params_fingerprint', flat=True)), set([ParamDict('a: Integer').fingerprint]))
+
+    def test_deconstruct(self):
+        field = FingerprintProduct._meta.get_field('params')
+        name, path, args, kwargs = field.deconstruct()
+        self.assertEqual(kwargs['fingerprint_field'], 'params_fingerprint')
+
+    def test_check(self):
+        field = FingerprintProduct._meta.get_field('params')
+        self.assertEqual(field.check(), [])
+
+        field = ParamField(fingerprint_field='missing')
+        field.model = Product
+        self.assertEqual(field._check_fingerprint_field()[0].id, 'param_field.E001')
+        
+        field = ParamField(fingerprint_field='id')
+        field.model = Product
+        self.assertEqual(field._check_fingerprint_field()[0].id, 'param_field.E002')
+
+    @isolate_apps('param_field')
+    def test_check_order(self):
+        """Test the fingerprint field must be declared after the ParamField,
+        as bulk_create reads the field values in declaration order"""
+        class Before(models.Model):
+            fingerprint = models.CharField(max_length=40, blank=True)
+            params = ParamField(fingerprint_field='fingerprint')
+
+        class After(models.Model):
+            params = ParamField(fingerprint_field='fingerprint')
+            fingerprint = models.CharField(max_length=40, blank=True)
+
+        errors = Before._meta.get_field('params').check()
+        self.assertEqual([e.id for e in errors], ['param_field.E003'])
+        self.assertEqual(After._meta.get_field('params').check(), [])
+
+    def test_fingerprint_parsed_once(self):
+        with patch('param_field.parser.parse_fields', 
+                wraps=param_field.parser.parse_fields) as parse:
+            FingerprintProduct.objects.create(params='a: Integer')
+        self.assertEqual(parse.call_count, 1)
+
+
+
+class TestDirtyTracking(TestCase):
+
+    def test_param_update_fields(self):
+        p = Product.objects.create(name='a', params='a: Integer-> max:3')
+        self.assertEqual(param_update_fields(p), ['name', 'params'])
+
+        p = Product.objects.get(pk=p.pk)
+        self.assertFalse(p.params.has_changed())
+        self.assertEqual(param_update_fields(p), ['name'])
+
+        # Modified in place
+        p.params['b'] = BoolParam()
+        self.assertEqual(param_update_fields(p), ['name', 'params'])
+        p.save(update_fields=param_update_fields(p))
+        self.assertEqual(str(Product.objects.get(pk=p.pk).params), 
+                'a:Integer-> max:3\nb:Bool')
+
+        # Replaced
+        p = Product.objects.with_parsed_params().get(pk=p.pk)
+        self.assertEqual(param_update_fields(p), ['name'])
+        p.params = 'c: Text'
+        self.assertEqual(param_update_fields(p), ['name', 'params'])
+
+        # Deferred fields aren't included
+        p = Product.objects.only('params').get(pk=p.pk)
+        self.assertEqual(param_update_fields(p), [])
@@ -5,6 +5,7 @@ from param_field.params import *
 from param_field.forms import ParamInputForm
 from param_field.conf import settings
 from decimal import Decimal
+import pickle
 
 class TestParamDict(TestCase):
 
@@ -123,6 +124,199 @@ class TestParamDict(TestCase):
         for name in ('p1', 'p2', 'p3', 'p4'):
             self.assertTrue(name in str(d))
 
+    def test_fingerprint(self):
+        """Test equivalent definitions have the same fingerprint"""
+        d1 = ParamDict("""
+            width: Decimal -> max:50.0 min:5.0
+            painted : Bool-> default:False""")
+        d2 = ParamDict("""width:Decimal->min:5.0    max:50.0
+            painted:Bool->default:False required:True""")
+        d3 = ParamDict("""width:Decimal->min:5.0 max:50.0""")
+        self.assertEqual(d1.to_str(), d2.to_str())
+        self.assertEqual(d1.fingerprint, d2.fingerprint)
+        self.assertNotEqual(d1.fingerprint, d3.fingerprint)
+        self.assertEqual(len(d1.fingerprint), 40)
+
+        # Field order is significant
+        d4 = ParamDict("""painted:Bool->default:False
+            width:Decimal->min:5.0 max:50.0""")
+        self.assertNotEqual(d1.fingerprint, d4.fingerprint)
+
+        # Empty and unparsed definitions
+        self.assertEqual(ParamDict('').fingerprint, ParamDict('  ').fingerprint)
+        unparsed = ParamDict('a: Invalid', parse=False)
+        self.assertNotEqual(unparsed.fingerprint, ParamDict('').fingerprint)
+
+    def test_memoized_str(self):
+        """Test memoized definition string is updated on modification"""
+        d = ParamDict("a: Integer-> max:10\nb: Bool")
+        self.assertEqual(str(d), "a: Integer-> max:10\nb: Bool")
+        self.assertEqual(d.to_str(), "a:Integer-> max:10\nb:Bool")
+        self.assertIs(d.to_str(), d.to_str())
+        self.assertIs(d['a'].to_str(), d['a'].to_str())
+
+        # Param modified
+        d['a'].max = 20
+        self.assertEqual(d['a'].to_str(), "Integer-> max:20")
+        self.assertEqual(d.to_str(), "a:Integer-> max:20\nb:Bool")
+
+        # ParamDict modified, the source no longer matches the fields
+        d['c'] = TextParam()
+        self.assertEqual(str(d), "a:Integer-> max:20\nb:Bool\nc:Text")
+        del d['b']
+        self.assertEqual(str(d), "a:Integer-> max:20\nc:Text")
+        d.pop('c')
+        self.assertEqual(str(d), "a:Integer-> max:20")
+        d.update({'e': BoolParam()})
+        self.assertEqual(str(d), "a:Integer-> max:20\ne:Bool")
+        d.clear()
+        self.assertEqual(str(d), "")
+
+    def test_has_changed(self):
+        d = ParamDict("a: Integer")
+        self.assertTrue(d.has_changed())
+
+        d._loaded = "a: Integer"
+        self.assertFalse(d.has_changed())
+        d['a'].max = 3
+        self.assertTrue(d.has_changed())
+        self.assertEqual(str(d), "a:Integer-> max:3")
+
+        # Params modified in place
+        d = ParamDict("a: Integer-> choices:[1, 2]")
+        d._loaded = "a: Integer-> choices:[1, 2]"
+        self.assertEqual(d.to_str(), "a:Integer-> choices:[1, 2]")
+        d['a'].choices.append(3)
+        self.assertTrue(d.has_changed())
+        self.assertEqual(str(d), "a:Integer-> choices:[1, 2, 3]")
+        self.assertEqual(d['a'].to_str(), "Integer-> choices:[1, 2, 3]")
+
+        d = ParamDict("a: Integer")
+        d._loaded = "a: Integer"
+        d['b'] = BoolParam()
+        self.assertTrue(d.has_changed())
+
+        # The source isn't reused for modified fields
+        previous = ParamDict("a: Integer\nb: Bool")
+        previous['a'].max = 3
+        params = previous.reparse("a:Integer\nb:Bool")
+        self.assertNotEqual(params['a'].max, 3)
+        self.assertIs(params['b'], previous['b'])
+
+    def test_pickle(self):
+        source = """
+            width: Dimmension-> max:50.0 min:5.0 label:"Width" choices:[5.0, 10.0]
+            count: Integer-> even:True default:4 hidden:True
+            name: Text-> max_length:20 required:False
+            doc: File-> help_text:"Document"
+            """
+        d = ParamDict(source, file_support=True)
+        d._loaded = source
+
+        with patch('param_field.parser.parse_fields') as parse:
+            p = pickle.loads(pickle.dumps(d))
+        self.assertEqual(parse.call_count, 0)
+
+        self.assertEqual(str(p), source)
+        self.assertEqual(p.to_str(), d.to_str())
+        self.assertEqual(p._file_support, True)
+        self.assertFalse(p.has_changed())
+        for name, param in d.items():
+            self.assertIs(type(p[name]), type(param))
+            self.assertEqual(
+                dict((k, v) for k, v in p[name].__dict__.items() if not k.startswith('_')),
+                dict((k, v) for k, v in param.__dict__.items() if not k.startswith('_')))
+        self.assertEqual(p['count'].choices, None)
+        self.assertIs(p['count'].hidden, True)
+        self.assertIsInstance(p['width'].max, Decimal)
+
+        # Params only pickle the properties without default values
+        state = pickle.loads(pickle.dumps(d['name'])).__reduce__()[1][1]
+        self.assertEqual(dict(state), {'max_length': 20, 'required': False})
+
+        # Unpickled Params can be modified
+        p['count'].default = 6
+        self.assertIn('default:6', p.to_str())
+        self.assertNotIn('default:6', d.to_str())
+
+        # The canonical source isn't pickled
+        canonical = ParamDict(d.to_str(), file_support=True)
+        self.assertLess(len(pickle.dumps(canonical)), len(pickle.dumps(d)))
+        self.assertEqual(str(pickle.loads(pickle.dumps(canonical))), d.to_str())
+
+        # Modified ParamDict
+        d['other'] = BoolParam()
+        self.assertTrue(pickle.loads(pickle.dumps(d)).has_changed())
+        self.assertEqual(str(pickle.loads(pickle.dumps(d))), d.to_str())
+
+    def test_add_unparsed_source(self):
+        """Test add doesn't extend a source that doesn't match the fields"""
+        for d in (ParamDict("invalid: Invalidparam", parse=False),
+                ParamDict("a: Integer", parse=False)):
+            d.add('b', IntegerParam())
+            self.assertEqual(str(d), "b:Integer")
+            self.assertEqual(ParamDict(str(d)).to_str(), d.to_str())
+
+        d = ParamDict("a: Integer\n")
+        d.add('b', BoolParam())
+        self.assertEqual(str(d), "a: Integer\nb:Bool")
+
+    def test_builder(self):
+        """Test add, remove and replace methods"""
+        d = ParamDict()
+        d.add('width', DecimalParam(min=Decimal('5.0'), max=Decimal('50.0')))\
+         .add('painted', BoolParam(default=False))
+        self.assertEqual(str(d), 
+                "width:Decimal-> min:5.0 max:50.0\npainted:Bool-> default:False")
+        self.assertEqual(str(d), str(ParamDict(str(d))))
+       
+        # Source is edited in place
+        d = ParamDict("""
+            width: Decimal -> max:50.0 min:5.0
+            painted : Bool-> default:False""")
+        d.add('inscription', TextParam(max_length=30))
+        self.assertEqual(str(d), """
+            width: Decimal -> max:50.0 min:5.0
+            painted : Bool-> default:False\ninscription:Text-> max_length:30""")
+
+        d.replace('painted', BoolParam(default=True))
+        self.assertEqual(str(d), """
+            width: Decimal -> max:50.0 min:5.0
+            painted:Bool-> default:True\ninscription:Text-> max_length:30""")
+        self.assertIs(d['painted'].default, True)
+
+        d.remove('width')
+        self.assertEqual(str(d), 
+                "painted:Bool-> default:True\ninscription:Text-> max_length:30")
+        self.assertEqual(list(d.keys()), ['painted', 'inscription'])
+        self.assertEqual(d.to_str(), str(d))
+
+        # Missing and duplicated names
+        with self.assertRaises(KeyError):
+            d.remove('width')
+        with self.assertRaises(KeyError):
+            d.replace('width', BoolParam())
+        with self.assertRaises(ValueError):
+            d.add('inscription', BoolParam())
+
+    def test_builder_validation(self):
+        d = ParamDict()
+        for name in ('Width', '1width', 'wid-th', 'default', 'max', '', 
+                'a'*(settings.PARAM_NAME_MAX_LENGTH+1)):
+            with self.assertRaises(ValueError):
+                d.add(name, BoolParam())
+
+        d.add('a'*settings.PARAM_NAME_MAX_LENGTH, BoolParam())
+        d.add('a_2', BoolParam())
+
+        with self.assertRaises(ValueError):
+            d.add('number', 12)
+
+        # File support
+        with self.assertRaises(ValueError):
+            d.add('doc', FileParam())
+        ParamDict(file_support=True).add('doc', FileParam())
+
     def test_form_generation(self): 
 
         # test ParamDict.form() generates a valid Form
@@ -1,10 +1,12 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-from pyparsing import ParseBaseException, ParseException, ParseFatalException
+from pyparsing import ParseBaseException, ParseException, ParseFatalException, ParserElement
 from decimal import Decimal
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
 
-from param_field.parser import parse_fields
+from param_field.parser import parse_fields, parse_fields_iter, outline_fields, ParseLimitError, parse_many, reparse_fields, field_spans, get_parser
 from param_field.params import *
 from param_field.conf import settings
 
@@ -480,3 +482,351 @@ class TestParserBase(TestCase):
 
         with self.assertRaises(ParseException):
             p = parse_fields('{}: Bool'.format("a"*settings.PARAM_NAME_MAX_LENGTH+"b"))
+
+
+
+class TestParserThreads(TestCase):
+
+    definitions = [
+        'width: Dimmension-> max:50.0 min:5.0 default:10.0',
+        'count: Integer-> choices:[1, 2, 3, 4] default:2\npainted: Bool-> default:False',
+        'inscription: Text-> max_length:30 label:"Inscription"',
+        'price: Decimal-> max_digits:8 max_decimals:2 default:3.50',
+        'notes: TextArea-> required:False\nholes: Integer-> even:True max:100',
+    ]
+
+    def _parse_all(self, rounds):
+        results = []
+        for _ in range(rounds):
+            for d in self.definitions:
+                results.append(
+                    [(n, str(p)) for n, p in parse_fields(d).items()])
+        return results
+
+    def test_parser_per_thread(self):
+        """Test each thread uses its own parser instance"""
+        main = get_parser()
+        self.assertIs(main, get_parser())
+        self.assertIsNot(main, get_parser(file_support=True))
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            other = executor.submit(get_parser).result()
+        self.assertIsNot(main, other)
+
+    def test_packrat_disabled(self):
+        """Test packrat, a process wide pyparsing setting, is opt-in"""
+        self.assertFalse(settings.PARAM_PACKRAT)
+        self.assertFalse(ParserElement._packratEnabled)
+
+    def test_concurrent_stress(self):
+        """Test concurrent parsing returns the same results as serial parsing"""
+        rounds = 20
+        expected = self._parse_all(rounds)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(self._parse_all, rounds) for _ in range(8)]
+            results = [f.result() for f in futures]
+        for r in results:
+            self.assertEqual(r, expected)
+
+
+
+class TestParseMany(TestCase):
+
+    sources = [
+        'width: Dimmension-> max:50.0 min:5.0',
+        'count: Integer-> default:2',
+        'width: Dimmension-> max:50.0 min:5.0',
+        'invalid:Invalidparam',
+        '',
+        'count: Integer-> default:"two"',
+        'count: Integer-> default:2',
+    ]
+
+    def check_results(self, results):
+        self.assertEqual(len(results), len(self.sources))
+
+        for source, result in zip(self.sources, results):
+            try:
+                expected = parse_fields(source)
+            except (ParseBaseException, ValueError) as err:
+                self.assertIsInstance(result, type(err))
+                continue
+            self.assertIsInstance(result, OrderedDict)
+            self.assertEqual(
+                [(n, str(p)) for n, p in result.items()],
+                [(n, str(p)) for n, p in expected.items()])
+
+    def test_serial(self):
+        results = parse_many(self.sources, workers=1)
+        self.check_results(results)
+
+        # Duplicated sources are only parsed once
+        self.assertIs(results[0], results[2])
+        self.assertIs(results[1], results[6])
+
+        # Less than one worker parses in the calling process
+        self.check_results(parse_many(self.sources, workers=0))
+        self.check_results(parse_many(self.sources, workers=-1))
+
+    def test_process_pool(self):
+        results = parse_many(self.sources, workers=2, chunk_size=2)
+        self.check_results(results)
+        self.assertIs(results[0], results[2])
+
+    def test_file_support(self):
+        results = parse_many(['doc: File', 'img: Image'], workers=1)
+        self.assertIsInstance(results[0], ParseException)
+        self.assertIsInstance(results[1], ParseException)
+
+        results = parse_many(['doc: File', 'img: Image'], file_support=True,
+                workers=2)
+        self.assertIsInstance(results[0]['doc'], FileParam)
+        self.assertIsInstance(results[1]['img'], ImageParam)
+
+    def test_empty(self):
+        self.assertEqual(parse_many([]), [])
+
+
+
+class TestReparse(TestCase):
+
+    source = """
+        width: Dimmension-> max:50.0 min:5.0
+        height: Dimmension-> max:40.0 min:3.0 label:"height: Integer"
+        painted : Bool-> default:False
+        inscription: Text-> max_length:30"""
+
+    def assertSameResult(self, result, source):
+        expected = parse_fields(source)
+        self.assertEqual(list(result.keys()), list(expected.keys()))
+        for name in expected:
+            self.assertIs(type(result[name]), type(expected[name]))
+            self.assertEqual(result[name].to_str(), expected[name].to_str())
+
+    def test_field_spans(self):
+        spans = field_spans(self.source)
+        self.assertEqual(len(spans), 4)
+        self.assertEqual(spans[0][0], 0)
+        self.assertEqual(spans[-1][1], len(self.source))
+        self.assertTrue(self.source[spans[1][0]:].startswith('height:'))
+        self.assertEqual(field_spans('  '), [])
+
+    def test_reparse(self):
+        previous = ParamDict(self.source)
+        edits = [
+            self.source.replace('max:50.0', 'max:60.0'),
+            self.source.replace('painted : Bool-> default:False', ''),
+            self.source + '\nholes: Integer-> even:True',
+            'holes: Integer-> even:True' + self.source,
+            self.source.replace('inscription', 'width'),
+            self.source.replace('label:"height: Integer"', 'label:"a"'),
+            '',
+        ]
+        for source in edits:
+            self.assertSameResult(reparse_fields(source, previous), source)
+
+        # Unchanged fields are reused
+        result = reparse_fields(edits[0], previous)
+        self.assertIsNot(result['width'], previous['width'])
+        self.assertIs(result['height'], previous['height'])
+        self.assertIs(result['painted'], previous['painted'])
+        self.assertIs(result['inscription'], previous['inscription'])
+
+    def test_reparse_errors(self):
+        """Test errors are the same as when parsing the whole definition"""
+        previous = ParamDict(self.source)
+        for source in (
+                self.source.replace('max:50.0', 'max:"a"'),
+                self.source.replace('Bool', 'Boolean'),
+                self.source + ' 33',
+                '"' + self.source):
+            with self.assertRaises(Exception) as expected:
+                parse_fields(source)
+            with self.assertRaises(type(expected.exception)) as result:
+                reparse_fields(source, previous)
+            self.assertEqual(str(result.exception), str(expected.exception))
+
+    def test_paramdict_reparse(self):
+        previous = ParamDict(self.source)
+        source = self.source.replace('max:50.0', 'max:60.0')
+        params = previous.reparse(source)
+        self.assertIsInstance(params, ParamDict)
+        self.assertEqual(str(params), source)
+        self.assertEqual(params['width'].max, Decimal('60.0'))
+        self.assertIs(params['painted'], previous['painted'])
+        self.assertEqual(len(previous.reparse('')), 0)
+
+        # File support is preserved
+        previous = ParamDict('doc: File', file_support=True)
+        self.assertIsInstance(previous.reparse('doc: Image')['doc'], ImageParam)
+
+
+
+class TestParseFieldsIter(TestCase):
+
+    source = """width: Dimmension-> max:50.0 min:5.0
+        doc: File-> label:"doc: Integer"
+        painted : Bool-> default:False"""
+
+    def test_same_result(self):
+        fields = list(parse_fields_iter(self.source, file_support=True))
+        expected = parse_fields(self.source, file_support=True)
+        self.assertEqual([n for n, p in fields], list(expected.keys()))
+        self.assertEqual([p.to_str() for n, p in fields],
+                [p.to_str() for p in expected.values()])
+
+        self.assertEqual(list(parse_fields_iter('')), [])
+        self.assertEqual(list(parse_fields_iter('   ')), [])
+
+    def test_early_exit(self):
+        """Test fields after the one requested aren't parsed"""
+        source = self.source + "\n invalid: Bool-> default:3"
+        it = parse_fields_iter(source, file_support=True)
+        self.assertTrue(any(isinstance(p, FileParam) for n, p in it))
+        self.assertEqual(next(it)[0], 'painted')
+        with self.assertRaises(ValueError):
+            next(it)
+
+    def test_errors(self):
+        source = self.source + "\n invalid: Bool-> default:"
+        fields = []
+        with self.assertRaises(ParseException) as cm:
+            for name, param in parse_fields_iter(source, file_support=True):
+                fields.append(name)
+        self.assertEqual(fields, ['width', 'doc', 'painted'])
+
+        # Location within the whole definition
+        self.assertEqual(cm.exception.lineno, 4)
+
+        with self.assertRaises(ParseException):
+            list(parse_fields_iter('not a definition'))
+        with self.assertRaises(ParseException):
+            list(parse_fields_iter(self.source))
+
+
+
+class TestOutline(TestCase):
+
+    source = """  width: Dimmension-> max:50.0 min:5.0
+        doc: File
+        inscription : Text -> label:"doc: Integer"  
+        painted:Bool->default:False"""
+
+    def test_outline(self):
+        outline = outline_fields(self.source)
+        self.assertEqual([(o.name, o.type_name) for o in outline], [
+            ('width', 'Dimmension'), ('doc', 'File'), 
+            ('inscription', 'Text'), ('painted', 'Bool')])
+
+        props = [self.source[o.props[0]:o.props[1]] for o in outline]
+        self.assertEqual(props, 
+            ['max:50.0 min:5.0', '', 'label:"doc: Integer"', 'default:False'])
+
+        # Same names and types as the parsed definition
+        parsed = parse_fields(self.source, file_support=True)
+        self.assertEqual([(o.name, o.type_name) for o in outline],
+            [(n, p.type_name) for n, p in parsed.items()])
+
+        self.assertEqual(outline_fields(''), ())
+
+    def test_cached(self):
+        self.assertIs(outline_fields(self.source), outline_fields(self.source))
+
+    def test_paramdict_outline(self):
+        d = ParamDict(self.source, file_support=True)
+        self.assertEqual([o.name for o in d.outline()], list(d.keys()))
+        d.remove('doc')
+        self.assertEqual([o.name for o in d.outline()], list(d.keys()))
+
+
+
+class TestParseLimits(TestCase):
+
+    def fields(self, count):
+        return '\n'.join('f{}: Integer-> max:10'.format(i) for i in range(count))
+
+    @override_settings(PARAM_MAX_FIELDS=3)
+    def test_max_fields(self):
+        parse_fields(self.fields(3))
+        with self.assertRaises(ParseLimitError):
+            parse_fields(self.fields(4))
+        with self.assertRaises(ParseLimitError):
+            list(parse_fields_iter(self.fields(4)))
+        with self.assertRaises(ParseLimitError):
+            reparse_fields(self.fields(4), ParamDict(self.fields(3)))
+
+        # Limit errors are parse errors
+        with self.assertRaises(ParseFatalException):
+            parse_fields(self.fields(4))
+
+    @override_settings(PARAM_MAX_CHOICES=3)
+    def test_max_choices(self):
+        parse_fields('a: Integer-> choices:[1, 2, 3]')
+        with self.assertRaises(ParseLimitError):
+            parse_fields('a: Integer-> choices:[1, 2, 3, 4]')
+
+    @override_settings(PARAM_MAX_TOKENS=10)
+    def test_max_tokens(self):
+        # name, type, and 2 tokens per property
+        parse_fields('a: Integer-> max:10 min:2 default:4 even:True')
+        with self.assertRaises(ParseLimitError):
+            parse_fields('a: Integer-> max:10 min:2 default:4 even:True odd:False')
+        with self.assertRaises(ParseLimitError):
+            parse_fields('a: Integer-> choices:[{}]'.format(', '.join(['1']*10)))
+
+    @override_settings(PARAM_MAX_TOKENS=5000)
+    def test_definition_budget(self):
+        """Test fields parsed one at a time share the definition limits"""
+        choices = ', '.join(str(i) for i in range(60))
+        source = '\n'.join('f{}: Integer-> choices:[{}]'.format(i, choices)
+                for i in range(150))
+        with self.assertRaises(ParseLimitError):
+            parse_fields(source)
+        with self.assertRaises(ParseLimitError):
+            list(parse_fields_iter(source))
+
+        previous = ParamDict(source.rsplit('\n', 100)[0])
+        with self.assertRaises(ParseLimitError):
+            reparse_fields(source, previous)
+        with self.assertRaises(ParseLimitError):
+            previous.reparse(source)
+
+        # Each definition has its own budget
+        fields = parse_fields_iter(source.rsplit('\n', 100)[0])
+        next(fields)
+        parse_fields(source.rsplit('\n', 100)[0])
+        self.assertEqual(len(list(fields)), 49)
+
+    @override_settings(PARAM_PARSE_TIMEOUT=0.000001)
+    def test_timeout(self):
+        with self.assertRaises(ParseLimitError):
+            parse_fields(self.fields(300))
+
+    def test_disabled(self):
+        """Test limits are disabled by default"""
+        parse_fields(self.fields(300))
+        parse_fields('a: Integer-> choices:[{}]'.format(', '.join(['1']*300)))
+
+    def test_not_quarantined(self):
+        """Test stored definitions over the limits aren't quarantined, a
+        timeout depends on the machine load"""
+        from param_field.quarantine import quarantine
+        from .models import Product
+        quarantine.clear()
+        product = Product.objects.create(name='a', params=self.fields(50))
+        field = Product._meta.get_field('params')
+
+        with override_settings(PARAM_PARSE_TIMEOUT=1e-7):
+            self.assertEqual(len(Product.objects.get(pk=product.pk).params), 0)
+            self.assertEqual(field.from_db_values([self.fields(50)]), [{}])
+        self.assertEqual(len(quarantine), 0)
+        self.assertEqual(len(Product.objects.get(pk=product.pk).params), 50)
+
+    def test_validation_error(self):
+        """Test ParamField reports limit errors as validation errors"""
+        from django.core.exceptions import ValidationError
+        from param_field.models import ParamField
+        with override_settings(PARAM_MAX_FIELDS=1):
+            with self.assertRaises(ValidationError):
+                ParamField().clean(self.fields(2), None)
@@ -0,0 +1,75 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+from unittest.mock import patch
+import param_field.parser
+from param_field.params import *
+from param_field.cache import definition_cache
+from param_field.quarantine import quarantine
+from param_field.management.commands.paramfield_profile import weighted_percentile
+from .models import Product
+
+
+class TestProfileCommand(TestCase):
+
+    def setUp(self):
+        quarantine.clear()
+
+    def test_profile(self):
+        slow = 'a: Integer-> choices:[{}]'.format(', '.join(str(i) for i in range(80)))
+        for i in range(6):
+            Product.objects.create(name=str(i), params='a: Integer')
+        slow_product = Product.objects.create(name='slow', params=slow)
+        Product.objects.create(name='invalid', params='a: Invalid')
+
+        out = StringIO()
+        call_command('paramfield_profile', 'param_field.Product.params',
+                top=1, stdout=out)
+        output = out.getvalue()
+        self.assertIn('rows: 8  distinct: 3  dedup ratio: 2.67  invalid rows: 1', output)
+        for name in ('parse', 'load', 'form', 'total'):
+            self.assertIn('\n'+name+' ', output)
+        self.assertIn('fingerprint:{} pk:{} rows:1'.format(
+            ParamDict(slow).fingerprint, slow_product.pk), output)
+        self.assertIn('memory per definition', output)
+
+        out = StringIO()
+        call_command('paramfield_profile', 'param_field.Product.params',
+                limit=2, memory_sample=0, stdout=out)
+        self.assertIn('rows: 2  distinct: 1', out.getvalue())
+        self.assertNotIn('memory', out.getvalue())
+
+    def test_cache_disabled(self):
+        """Test loads are timed parsing the definitions, not as cache hits"""
+        Product.objects.create(name='a', params='a: Integer')
+        Product.objects.create(name='b', params='b: Bool')
+        definition_cache.configure(size=10)
+        self.addCleanup(definition_cache.configure, settings.PARAM_CACHE_SIZE, 
+                settings.PARAM_CACHE_ALIAS, settings.PARAM_CACHE_TIMEOUT)
+        definition_cache.load('a: Integer')
+        definition_cache.load('b: Bool')
+
+        with patch('param_field.parser.parse_fields', 
+                wraps=param_field.parser.parse_fields) as parse:
+            call_command('paramfield_profile', 'param_field.Product.params',
+                    memory_sample=0, stdout=StringIO())
+        self.assertEqual(parse.call_count, 2)
+        self.assertTrue(definition_cache.enabled)
+        self.assertEqual(len(definition_cache), 2)
+
+    def test_errors(self):
+        with self.assertRaises(CommandError):
+            call_command('paramfield_profile', 'param_field.Product.name', 
+                    stdout=StringIO())
+
+        out = StringIO()
+        call_command('paramfield_profile', 'param_field.Product.params', stdout=out)
+        self.assertIn('No rows', out.getvalue())
+
+    def test_weighted_percentile(self):
+        values = [(1, 90), (5, 9), (10, 1)]
+        self.assertEqual(weighted_percentile(values, 50), 1)
+        self.assertEqual(weighted_percentile(values, 95), 5)
+        self.assertEqual(weighted_percentile(values, 100), 10)
+        self.assertIsNone(weighted_percentile([], 50))
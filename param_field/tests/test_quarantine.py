@@ -0,0 +1,133 @@
+from django.test import TestCase
+from django.core.management import call_command, CommandError
+from unittest.mock import patch
+from io import StringIO
+import param_field.parser
+from param_field.params import *
+from param_field.quarantine import Quarantine, quarantine, source_digest
+from param_field.models import get_param_field
+from param_field.management.commands.paramfield_quarantine import salvage_fields
+from .models import Product
+
+
+class TestQuarantine(TestCase):
+
+    def setUp(self):
+        quarantine.clear()
+
+    def test_negative_cache(self):
+        """Test invalid definitions are only parsed the first time they
+        are loaded"""
+        Product.objects.create(name='a', params='invalid: Invalidparam')
+        Product.objects.create(name='b', params='count: Integer-> default:"two"')
+
+        with patch('param_field.parser.parse_fields', 
+                wraps=param_field.parser.parse_fields) as parse:
+            for _ in range(3):
+                products = list(Product.objects.all())
+        self.assertEqual(parse.call_count, 2)
+        self.assertEqual(len(products[0].params), 0)
+        self.assertEqual(str(products[0].params), 'invalid: Invalidparam')
+
+        entries = quarantine.entries()
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0].field, 'param_field.Product.params')
+        self.assertEqual(entries[0].hits, 2)
+        self.assertEqual(entries[0].digest, 
+                source_digest('invalid: Invalidparam', False))
+        self.assertIn("'default'", entries[1].error)
+
+        # Also used by with_parsed_params
+        with patch('param_field.parser.parse_fields', 
+                wraps=param_field.parser.parse_fields) as parse:
+            list(Product.objects.with_parsed_params())
+        self.assertEqual(parse.call_count, 0)
+
+    def test_bounded(self):
+        q = Quarantine(2)
+        q.add('a', False, 'error a')
+        q.add('b', False, 'error b')
+        q.add('c', False, 'error c')
+        self.assertEqual(len(q), 2)
+        self.assertIsNone(q.get('a'))
+        self.assertEqual(q.get('c').error, 'error c')
+
+        # file_support is part of the key
+        self.assertIsNone(q.get('c', True))
+
+        q = Quarantine(0)
+        q.add('a', False, 'error a')
+        self.assertIsNone(q.get('a'))
+
+    def test_salvage_fields(self):
+        self.assertEqual(
+            salvage_fields('a: Integer b: Bool->default:3\n c: Text->max:3 d: Text'),
+            'a: Integer\nd: Text')
+        self.assertEqual(salvage_fields('a: Integer b: Invalid'), '')
+
+    def test_command(self):
+        valid = Product.objects.create(name='a', params='a: Integer')
+        invalid = Product.objects.create(name='b', 
+                params='a: Integer\nb: Bool->default:3')
+
+        out = StringIO()
+        call_command('paramfield_quarantine', 'param_field.Product.params', stdout=out)
+        self.assertIn('pk:{} '.format(invalid.pk), out.getvalue())
+        self.assertNotIn('pk:{} '.format(valid.pk), out.getvalue())
+        self.assertIn('1 invalid rows', out.getvalue())
+
+        # Fields would be dropped
+        source = str(invalid.params)
+        out = StringIO()
+        call_command('paramfield_quarantine', 'param_field.Product.params', 
+                repair=True, stdout=out)
+        self.assertIn("drop: 'b: Bool->default:3'", out.getvalue())
+        self.assertIn('use --force', out.getvalue())
+        self.assertIn('1 invalid rows, 0 repaired', out.getvalue())
+        self.assertEqual(str(Product.objects.get(pk=invalid.pk).params), source)
+
+        # Dry run
+        out = StringIO()
+        call_command('paramfield_quarantine', 'param_field.Product.params', 
+                repair=True, force=True, dry_run=True, stdout=out)
+        self.assertIn("would repair: 'a: Integer'", out.getvalue())
+        self.assertIn('1 would be repaired', out.getvalue())
+        self.assertEqual(str(Product.objects.get(pk=invalid.pk).params), source)
+
+        # Repair
+        out = StringIO()
+        call_command('paramfield_quarantine', 'param_field.Product.params', 
+                repair=True, force=True, stdout=out)
+        self.assertEqual(str(Product.objects.get(pk=invalid.pk).params), 'a: Integer')
+
+        out = StringIO()
+        call_command('paramfield_quarantine', 'param_field.Product.params', stdout=out)
+        self.assertIn('0 invalid rows', out.getvalue())
+
+    def test_repair_empty(self):
+        invalid = Product.objects.create(name='b', params='a: Invalid')
+        out = StringIO()
+        call_command('paramfield_quarantine', 'param_field.Product.params', 
+                repair=True, stdout=out)
+        self.assertIn('no valid fields left', out.getvalue())
+        self.assertEqual(str(Product.objects.get(pk=invalid.pk).params), 'a: Invalid')
+
+    def test_get_param_field(self):
+        model, field = get_param_field('param_field.Product.params')
+        self.assertIs(model, Product)
+        self.assertIs(field, Product._meta.get_field('params'))
+
+        for label in ('param_field.Unknown.params', 'param_field.Product.unknown'):
+            with self.assertRaises(LookupError):
+                get_param_field(label)
+            with self.assertRaises(CommandError):
+                call_command('paramfield_quarantine', label, stdout=StringIO())
+
+        for label in ('param_field.Product', 'param_field.Product.name'):
+            with self.assertRaises(ValueError):
+                get_param_field(label)
+
+    def test_unbound_field(self):
+        from param_field.models import ParamField
+        quarantine.add('a: Invalid', False, 'error', ParamField())
+        self.assertIsNone(quarantine.get('a: Invalid').field)
@@ -0,0 +1,145 @@
+from django.test import TestCase
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+import param_field.parser
+from param_field.params import *
+from param_field.cache import DefinitionCache
+from param_field.sharedcache import SharedFileCache
+from param_field.stats import stats
+
+
+class TestSharedFileCache(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_get_set(self):
+        cache = SharedFileCache(self.path, size=1024, slots=16)
+        self.assertIsNone(cache.get('a'))
+        self.assertTrue(cache.set('a', b'payload a'))
+        self.assertTrue(cache.set('b', b'payload b'))
+        self.assertTrue(cache.set('a', b'payload a'))
+        self.assertEqual(cache.get('a'), b'payload a')
+        self.assertEqual(cache.get('b'), b'payload b')
+        self.assertEqual(len(cache), 2)
+
+        # Other instances using the same file
+        other = SharedFileCache(self.path, size=1024, slots=16)
+        self.assertEqual(other.get('b'), b'payload b')
+        other.set('c', b'payload c')
+        self.assertEqual(cache.get('c'), b'payload c')
+
+        # Other settings use their own file, the mapped one isn't resized
+        resized = SharedFileCache(self.path, size=2048, slots=16)
+        self.assertIsNone(resized.get('a'))
+        self.assertNotEqual(resized.file_path, cache.file_path)
+        self.assertEqual(cache.get('a'), b'payload a')
+        self.assertEqual(os.stat(cache.file_path).st_mode & 0o777, 0o600)
+        for c in (cache, other, resized):
+            c.close()
+
+    def test_unsafe_file(self):
+        cache = SharedFileCache(self.path, size=1024, slots=16)
+        cache.set('a', b'payload a')
+        cache.close()
+
+        # Accessible by other users
+        os.chmod(cache.file_path, 0o666)
+        with self.assertRaises(ValueError):
+            SharedFileCache(self.path, size=1024, slots=16).get('a')
+        os.chmod(cache.file_path, 0o600)
+
+        # Symbolic link
+        link = SharedFileCache(os.path.join(self.dir, 'link'), size=1024, slots=16)
+        os.symlink(cache.file_path, link.file_path)
+        with self.assertRaises(OSError):
+            link.get('a')
+
+        # Not a cache file, or with an unexpected size
+        with open(cache.file_path, 'r+b') as f:
+            f.write(b'data')
+        with self.assertRaises(ValueError):
+            SharedFileCache(self.path, size=1024, slots=16).get('a')
+        with open(cache.file_path, 'ab') as f:
+            f.write(b'data')
+        with self.assertRaises(ValueError):
+            SharedFileCache(self.path, size=1024, slots=16).get('a')
+
+    def test_full(self):
+        cache = SharedFileCache(self.path, size=100, slots=8)
+        with self.assertLogs('param_field.cache', level='WARNING'):
+            self.assertTrue(cache.set('a', b'x'*60))
+            self.assertFalse(cache.set('b', b'x'*60))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'x'*60)
+
+        # Cleared by another process
+        other = SharedFileCache(self.path, size=100, slots=8)
+        other.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get('a'))
+        self.assertTrue(cache.set('b', b'x'*60))
+        self.assertEqual(other.get('b'), b'x'*60)
+
+        # Max load of the slot table
+        for key in 'cdefg':
+            self.assertTrue(cache.set(key, b'x'))
+        with self.assertLogs('param_field.cache', level='WARNING'):
+            self.assertFalse(cache.set('h', b'x'))
+        self.assertEqual(len(cache), 6)
+        cache.close()
+        other.close()
+
+    def test_fork(self):
+        cache = SharedFileCache(self.path, size=1024, slots=16)
+        cache.set('parent', b'1')
+        pid = os.fork()
+        if pid == 0:
+            try:
+                ok = cache.get('parent') == b'1' and cache.set('child', b'2')
+            finally:
+                os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+        self.assertEqual(cache.get('child'), b'2')
+        cache.close()
+
+
+class TestDefinitionCacheFile(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache')
+
+    def tearDown(self):
+        stats.disable()
+        stats.reset()
+        shutil.rmtree(self.dir)
+
+    def test_shared(self):
+        source = "a: Integer-> max:10\nb: Bool"
+        first = DefinitionCache(size=10, path=self.path, path_size=64*1024)
+        second = DefinitionCache(size=10, path=self.path, path_size=64*1024)
+        stats.enable()
+        with patch('param_field.parser.parse_fields', 
+                wraps=param_field.parser.parse_fields) as parse:
+            first.load(source)
+            fields = second.load(source)
+            second.load(source)
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(fields['a'].max, 10)
+
+        counters = stats.snapshot()['counters']
+        self.assertEqual(counters['cache.file.hits'], 1)
+        self.assertEqual(counters['cache.file.misses'], 1)
+        self.assertEqual(counters['cache.local.hits'], 1)
+
+        # Clear all processes
+        first.clear(shared_file=True)
+        self.assertIsNone(DefinitionCache(path=self.path, path_size=64*1024).get(source))
@@ -0,0 +1,148 @@
+from django.test import TestCase
+from django.core.exceptions import ValidationError
+import os
+import pstats
+import shutil
+import tempfile
+from pyparsing import ParseBaseException
+from param_field.params import *
+from param_field.parser import parse_fields
+from param_field.quarantine import quarantine
+from param_field.slowlog import slow_log
+from param_field.stats import stats
+from param_field.cache import definition_cache
+from concurrent.futures import ThreadPoolExecutor
+from .models import Product
+
+
+class TestSlowLog(TestCase):
+
+    def setUp(self):
+        quarantine.clear()
+        slow_log.configure(0)
+
+    def tearDown(self):
+        slow_log.configure(settings.PARAM_SLOW_PARSE_MS, 
+                settings.PARAM_SLOW_PROFILE_DIR)
+
+    def test_disabled(self):
+        slow_log.configure(None)
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('param_field.slow'):
+                ParamDict("a: Integer").form()
+
+    def test_threshold(self):
+        slow_log.configure(60000)
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('param_field.slow'):
+                ParamDict("a: Integer").form()
+
+    def test_log(self):
+        slow_log.configure(None)
+        params = ParamDict("a: Integer\nb: Bool->default:True")
+        slow_log.configure(0)
+        with self.assertLogs('param_field.slow', level='WARNING') as logs:
+            params.form()
+            params.validate({'a': 1})
+
+        self.assertEqual(len(logs.records), 2)
+        form, validate = logs.records
+        self.assertEqual(form.operation, 'form')
+        self.assertEqual(form.fingerprint, params.fingerprint)
+        self.assertEqual(form.fields, 2)
+        self.assertEqual(form.size, len(str(params)))
+        self.assertIn('form_field', form.breakdown)
+        self.assertIsNone(form.profile)
+        self.assertIn('fingerprint:'+params.fingerprint, form.getMessage())
+        self.assertEqual(validate.operation, 'validate')
+
+    def test_nested(self):
+        """Test nested operations are only reported in the breakdown"""
+        Product.objects.create(name='a', params='a: Integer\nb: Integer')
+        with self.assertLogs('param_field.slow', level='WARNING') as logs:
+            list(Product.objects.all())
+
+        self.assertEqual(len(logs.records), 1)
+        record = logs.records[0]
+        self.assertEqual(record.operation, 'from_db_value')
+        self.assertEqual(list(record.breakdown.keys()), ['parse_fields'])
+        self.assertEqual(record.fields, 2)
+
+    def test_parse_error(self):
+        """Test failed operations aren't reported, and their exception is
+        raised unchanged"""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('param_field.slow', level='WARNING'):
+                with self.assertRaises(ParseBaseException):
+                    parse_fields("a: Invalid")
+
+        slow_log.configure(None)
+        params = ParamDict("a: Integer-> max:10")
+        slow_log.configure(0)
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('param_field.slow', level='WARNING'):
+                with self.assertRaises(ValidationError):
+                    params.validate({'a': 50})
+
+    def test_profile(self):
+        profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profile_dir)
+        slow_log.configure(0, profile_dir)
+
+        with self.assertLogs('param_field.slow', level='WARNING') as logs:
+            parse_fields("a: Integer-> max:10")
+            parse_fields("a: Integer-> max:10")
+        slow_log.wait()
+
+        path = logs.records[0].profile
+        self.assertTrue(path.startswith(profile_dir))
+        self.assertIn('parse_fields', 
+            ' '.join(f[2] for f in pstats.Stats(path).stats.keys()))
+
+        # Each definition is profiled once
+        self.assertIsNone(logs.records[1].profile)
+        self.assertEqual(len(os.listdir(profile_dir)), 1)
+
+    def test_profile_rerun(self):
+        """Test the profile rerun isn't recorded in the stats and parses the
+        definition instead of loading it from the cache"""
+        profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profile_dir)
+        self.addCleanup(definition_cache.configure, settings.PARAM_CACHE_SIZE, 
+                settings.PARAM_CACHE_ALIAS, settings.PARAM_CACHE_TIMEOUT)
+        self.addCleanup(stats.reset)
+        self.addCleanup(stats.disable)
+        definition_cache.configure(size=10)
+        stats.reset()
+        stats.enable()
+
+        source = "a: Integer-> max:10"
+        slow_log.configure(None)
+        definition_cache.load(source)
+        stats.reset()
+
+        slow_log.configure(0, profile_dir)
+        field = Product._meta.get_field('params')
+        with self.assertLogs('param_field.slow', level='WARNING') as logs:
+            field.from_db_value(source, None, None, None)
+        slow_log.wait()
+
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['timings']['from_db_value']['count'], 1)
+        self.assertNotIn('parse_fields', snapshot['timings'])
+        self.assertEqual(snapshot['counters']['cache.local.hits'], 1)
+        self.assertIn('parse_fields', 
+            ' '.join(f[2] for f in pstats.Stats(logs.records[-1].profile).stats.keys()))
+
+    def test_stats_paused(self):
+        """Test stats are only paused in the calling thread"""
+        self.addCleanup(stats.reset)
+        self.addCleanup(stats.disable)
+        stats.reset()
+        stats.enable()
+        with stats.paused():
+            stats.incr('a')
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(stats.incr, 'a').result()
+        stats.incr('a')
+        self.assertEqual(stats.snapshot()['counters']['a'], 2)
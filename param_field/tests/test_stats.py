@@ -0,0 +1,96 @@
+from django.test import TestCase
+from param_field.params import *
+from param_field.parser import parse_fields
+from param_field.quarantine import quarantine
+from param_field.signals import operation_timed
+from param_field.stats import Histogram, stats
+from .models import Product
+
+
+class TestStats(TestCase):
+
+    def setUp(self):
+        quarantine.clear()
+        stats.reset()
+        stats.enable()
+
+    def tearDown(self):
+        stats.disable()
+        stats.reset()
+
+    def test_disabled(self):
+        stats.disable()
+        params = ParamDict("a: Integer")
+        params.validate({'a': 1})
+        params.form()
+        snapshot = stats.snapshot()
+        self.assertFalse(snapshot['enabled'])
+        self.assertEqual(snapshot['timings'], {})
+
+    def test_timings(self):
+        params = ParamDict("a: Integer\nb: Bool")
+        params.validate({'a': 1, 'b': True})
+        params.form()
+        with self.assertRaises(ValidationError):
+            params.validate({'a': 'x'})
+
+        timings = stats.snapshot()['timings']
+        self.assertEqual(timings['parse_fields']['count'], 1)
+        self.assertEqual(timings['validate']['count'], 2)
+        self.assertEqual(timings['form']['count'], 1)
+        self.assertEqual(timings['form_field']['count'], 2)
+        self.assertEqual(stats.snapshot()['counters']['validate.errors'], 1)
+
+        parse = timings['parse_fields']
+        self.assertGreater(parse['total'], 0)
+        self.assertLessEqual(parse['min'], parse['p50'])
+        self.assertLessEqual(parse['p99'], parse['max'])
+
+    def test_load_and_caches(self):
+        Product.objects.create(name='a', params='a: Integer')
+        Product.objects.create(name='b', params='a: Invalid')
+        list(Product.objects.all())
+        list(Product.objects.all())
+
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['timings']['from_db_value']['count'], 4)
+        self.assertEqual(snapshot['counters']['quarantine.hits'], 1)
+        self.assertEqual(snapshot['counters']['quarantine.misses'], 3)
+
+        list(Product.objects.with_parsed_params())
+        self.assertEqual(stats.snapshot()['timings']['from_db_values']['count'], 1)
+
+        params = ParamDict("a: Integer")
+        params.to_str()
+        params.to_str()
+        counters = stats.snapshot()['counters']
+        self.assertEqual(counters['to_str.misses'], 1)
+        self.assertEqual(counters['to_str.hits'], 1)
+        self.assertIn('outline_fields.hits', counters)
+
+    def test_signal(self):
+        received = []
+        def receiver(sender, name, duration, **kwargs):
+            received.append((name, duration))
+
+        operation_timed.connect(receiver)
+        try:
+            parse_fields("a: Integer")
+        finally:
+            operation_timed.disconnect(receiver)
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0][0], 'parse_fields')
+
+    def test_histogram(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.percentile(50))
+        for value in [0.001]*90+[0.1]*10:
+            histogram.add(value)
+
+        self.assertEqual(histogram.count, 100)
+        self.assertLess(histogram.percentile(50), 0.003)
+        self.assertGreaterEqual(histogram.percentile(50), 0.001)
+        self.assertGreaterEqual(histogram.percentile(99), 0.1)
+        self.assertEqual(histogram.percentile(100), 0.1)
+        self.assertEqual(sum(c for b, c in histogram.as_dict()['buckets']), 100)
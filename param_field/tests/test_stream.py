@@ -0,0 +1,171 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from decimal import Decimal
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
+from param_field.params import *
+from django.core.exceptions import ValidationError
+from param_field.stream import coerce_value, validate_request, validate_stream
+from .models import Product
+
+
+DEFINITION = """
+    count: Integer-> min:1 max:10 default:1
+    width: Dimmension-> min:1.0 max:50.0
+    gift: Bool-> required:False
+    color: Text-> choices:["red", "blue"]"""
+
+
+class TestValidateStream(TestCase):
+
+    def setUp(self):
+        self.params = ParamDict(DEFINITION)
+
+    def test_validate_request(self):
+        """Test records can leave out the params that aren't required"""
+        validate_request(self.params, {'width': Decimal('2.0'), 'color': 'red'})
+        with self.assertRaises(ValidationError):
+            validate_request(self.params, {'width': Decimal('2.0'), 'color': 'red',
+                'gift': 'yes'})
+        with self.assertRaises(ValidationError):
+            validate_request(self.params, {'width': Decimal('2.0')})
+        with self.assertRaises(ValidationError):
+            validate_request(self.params, {'width': Decimal('2.0'), 'color': 'red',
+                'unknown': 1})
+
+        # ParamDict.validate isn't affected
+        with self.assertRaises(ValidationError):
+            self.params.validate({'width': Decimal('2.0'), 'color': 'red'})
+
+    def test_param_validators(self):
+        """Test the validator names each Param class checks, in property order"""
+        self.assertEqual(IntegerParam._validators(), ('_validate_even',
+            '_validate_odd', '_validate_min', '_validate_max', '_validate_choices'))
+        self.assertEqual(BoolParam._validators(), ())
+        self.assertIn('_validator_names', IntegerParam.__dict__)
+
+        count = self.params['count']
+        with self.assertRaises(ValidationError):
+            count.validate(11)
+        with self.assertRaises(ValidationError):
+            count.validate(0)
+        self.assertIsNone(count.validate(5))
+
+    def test_coerce(self):
+        count, width, gift, color = [self.params[n] for n in 
+                ('count', 'width', 'gift', 'color')]
+        self.assertEqual(coerce_value(count, '5'), 5)
+        self.assertEqual(coerce_value(count, 5.0), 5)
+        self.assertEqual(coerce_value(count, 'x'), 'x')
+        self.assertEqual(coerce_value(count, True), True)
+        self.assertEqual(coerce_value(width, '2.5'), Decimal('2.5'))
+        self.assertEqual(coerce_value(width, 3), Decimal('3'))
+        self.assertEqual(coerce_value(width, 'x'), 'x')
+        self.assertEqual(coerce_value(gift, 'Yes'), True)
+        self.assertEqual(coerce_value(gift, '0'), False)
+        self.assertEqual(coerce_value(gift, False), False)
+        self.assertEqual(coerce_value(color, 'red'), 'red')
+        self.assertIsNone(coerce_value(color, ''))
+
+    def records(self, count):
+        lines = []
+        for i in range(count):
+            if i % 3 == 0:
+                lines.append(json.dumps({'count': 20, 'width': 2, 'color': 'red'}))
+            else:
+                lines.append(json.dumps({'width': '2.5', 'color': 'blue', 'gift': None}))
+        return '\n'.join(lines)+'\n'
+
+    def test_jsonl(self):
+        out = StringIO()
+        source = self.records(10)+'\n[1, 2]\n{"count": \n'
+        report = validate_stream(self.params, StringIO(source), out, chunk_size=3)
+        self.assertEqual((report['records'], report['valid'], report['invalid']), 
+                (12, 6, 6))
+
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r['record'] for r in results], list(range(1, 13)))
+        self.assertFalse(results[0]['valid'])
+        self.assertTrue(results[1]['valid'])
+        self.assertEqual(results[1]['values'], 
+                {'count': 1, 'width': '2.5', 'color': 'blue'})
+        self.assertIn('Invalid JSON', results[10]['error'])
+        self.assertIn('Invalid JSON', results[11]['error'])
+
+        out = StringIO()
+        validate_stream(self.params, StringIO(source), out, errors_only=True)
+        self.assertEqual(len(out.getvalue().splitlines()), 6)
+
+    def test_csv(self):
+        source = "count,width,gift,color\n5,2.5,yes,red\n,2.5,,blue\n11,2.5,no,red\n"\
+                "1,2,maybe,red\n"
+        out = StringIO()
+        report = validate_stream(self.params, StringIO(source), out, 'csv')
+        self.assertEqual((report['valid'], report['invalid']), (2, 2))
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(results[0]['values'], 
+                {'count': 5, 'width': '2.5', 'gift': True, 'color': 'red'})
+        self.assertEqual(results[1]['values']['count'], 1)
+        self.assertFalse(results[3]['valid'])
+
+        with self.assertRaises(ValueError):
+            validate_stream(self.params, StringIO(source), out, 'xml')
+
+    def test_workers(self):
+        source = self.records(100)
+        single, multi = StringIO(), StringIO()
+        validate_stream(self.params, StringIO(source), single, chunk_size=7)
+        report = validate_stream(self.params, StringIO(source), multi, 
+                workers=2, chunk_size=7)
+        self.assertEqual(report['records'], 100)
+        self.assertEqual(single.getvalue(), multi.getvalue())
+
+
+class TestValidateCommand(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.product = Product.objects.create(name='box', params=DEFINITION)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def path(self, name, content=None):
+        path = os.path.join(self.dir, name)
+        if content is not None:
+            with open(path, 'w') as f:
+                f.write(content)
+        return path
+
+    def test_validate(self):
+        records = self.path('records.csv', "count,width,color\n5,2.5,red\n50,2.5,red\n")
+        out, err = StringIO(), StringIO()
+        call_command('paramfield_validate', records, field='param_field.Product.params',
+                pk=self.product.pk, stdout=out, stderr=err)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+        self.assertIn('2 records, 1 valid, 1 invalid', err.getvalue())
+
+        definition = self.path('box.params', DEFINITION)
+        results = self.path('results.jsonl')
+        call_command('paramfield_validate', records, definition=definition,
+                output=results, errors_only=True, stderr=err)
+        with open(results) as f:
+            self.assertEqual(json.loads(f.read())['record'], 2)
+
+    def test_errors(self):
+        records = self.path('records.jsonl', '{}\n')
+        with self.assertRaises(CommandError):
+            call_command('paramfield_validate', records)
+        with self.assertRaises(CommandError):
+            call_command('paramfield_validate', records, 
+                field='param_field.Product.params', pk=self.product.pk+1)
+        with self.assertRaises(CommandError):
+            call_command('paramfield_validate', records, 
+                definition=self.path('invalid.params', 'a: Invalid'))
+        with self.assertRaises(CommandError):
+            call_command('paramfield_validate', self.path('missing.jsonl'),
+                definition=self.path('box.params', DEFINITION))
@@ -0,0 +1,107 @@
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+import param_field.parser
+from param_field.params import *
+from param_field.cache import definition_cache
+from param_field.quarantine import quarantine
+from param_field.warmup import warmup, common_definitions
+from .models import Product
+
+
+class TestWarmup(TestCase):
+
+    def setUp(self):
+        quarantine.clear()
+        definition_cache.configure(size=100)
+
+    def tearDown(self):
+        definition_cache.configure(settings.PARAM_CACHE_SIZE, 
+                settings.PARAM_CACHE_ALIAS, settings.PARAM_CACHE_TIMEOUT)
+
+    def test_warmup(self):
+        with self.assertLogs('param_field.warmup', level='INFO') as logs:
+            timings = warmup()
+        self.assertEqual(set(timings.keys()), set(['parsers', 'params', 'total']))
+        self.assertIn('0 definitions preloaded', logs.output[0])
+
+        for cls in (IntegerParam, DimmensionParam, FileParam):
+            self.assertIn('_prop_type_dict', cls.__dict__)
+
+    @override_settings(PARAM_WARMUP_FIELDS=['param_field.Product.params'],
+            PARAM_WARMUP_DEFINITIONS=2)
+    def test_preload(self):
+        for i in range(3):
+            Product.objects.create(name='a', params='a: Integer')
+        for i in range(2):
+            Product.objects.create(name='b', params='b: Bool')
+        Product.objects.create(name='c', params='c: Text')
+
+        self.assertEqual(common_definitions('param_field.Product.params', 2)[1],
+                ['a: Integer', 'b: Bool'])
+
+        with self.assertLogs('param_field.warmup', level='INFO') as logs:
+            timings = warmup()
+        self.assertIn('definitions', timings)
+        self.assertIn('2 definitions preloaded', logs.output[-1])
+
+        with patch('param_field.parser.parse_fields', 
+                wraps=param_field.parser.parse_fields) as parse:
+            list(Product.objects.all())
+        self.assertEqual(parse.call_count, 1)
+
+    @override_settings(PARAM_WARMUP_FIELDS=['param_field.Product.params'])
+    def test_preload_without_cache(self):
+        definition_cache.configure()
+        with self.assertLogs('param_field.warmup', level='WARNING'):
+            warmup()
+
+    @override_settings(PARAM_WARMUP_FIELDS=['param_field.Product.unknown'])
+    def test_preload_errors(self):
+        with self.assertLogs('param_field.warmup', level='WARNING'):
+            warmup()
+
+
+
+class TestWarmupCommand(TestCase):
+
+    def setUp(self):
+        quarantine.clear()
+        self.dir = tempfile.mkdtemp()
+        definition_cache.configure(path=os.path.join(self.dir, 'cache'), 
+                path_size=64*1024)
+
+    def tearDown(self):
+        definition_cache.configure(settings.PARAM_CACHE_SIZE, 
+                settings.PARAM_CACHE_ALIAS, settings.PARAM_CACHE_TIMEOUT)
+        shutil.rmtree(self.dir)
+
+    def test_warmup(self):
+        Product.objects.create(name='a', params='a: Integer')
+        Product.objects.create(name='b', params='b: Bool')
+        Product.objects.create(name='c', params='c: Invalid')
+
+        out = StringIO()
+        call_command('paramfield_warmup', 'param_field.Product.params', stdout=out)
+        self.assertIn('2 definitions preloaded', out.getvalue())
+        self.assertIsNotNone(definition_cache.get('b: Bool'))
+
+        with override_settings(PARAM_WARMUP_FIELDS=['param_field.Product.params']):
+            out = StringIO()
+            call_command('paramfield_warmup', definitions=1, stdout=out)
+        self.assertIn('0 definitions preloaded', out.getvalue())
+
+    def test_errors(self):
+        with self.assertRaises(CommandError):
+            call_command('paramfield_warmup')
+        with self.assertRaises(CommandError):
+            call_command('paramfield_warmup', 'param_field.Product.unknown')
+
+        definition_cache.configure(size=10)
+        with self.assertRaises(CommandError):
+            call_command('paramfield_warmup', 'param_field.Product.params')
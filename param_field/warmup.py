@@ -0,0 +1,134 @@
+"""
+Warmup of the parsers, per class tables and definition cache. It isn't run
+automatically, the paramfield_warmup command preloads definitions into the
+caches shared by all the processes (PARAM_SHARED_CACHE_PATH or 
+PARAM_CACHE_ALIAS), and warmup() can be called from a server hook, i.e. a
+pre-fork master (gunicorn --preload) so the workers inherit the result.
+
+Parsers are per thread, so only the calling thread's parsers are built,
+the threads of a threaded worker build theirs on their first parse.
+"""
+from django.db import connections, DatabaseError
+from django.db.models import Count
+from pyparsing import ParseBaseException
+import logging
+import time
+from .conf import settings
+from .cache import definition_cache
+from .parser import FIELD_TO_PARAM, get_parser, parse_fields
+
+
+logger = logging.getLogger('param_field.warmup')
+
+# Definition using every type, parsed to initialize the parser grammar
+WARMUP_DEFINITION = """
+    a: Integer-> min:0 max:10 default:2 choices:[2, 4] even:True label:"A"
+    b: Decimal-> max_digits:5 max_decimals:2 default:1.5 help_text:"B"
+    c: Dimmension-> min:1.0 max:5.0 required:False
+    d: Bool-> default:True hidden:True
+    e: Text-> min_length:1 max_length:10 choices:["x", "y"] default:"x"
+    f: TextArea-> max_length:100
+"""
+
+WARMUP_FILE_DEFINITION = WARMUP_DEFINITION+"""
+    g: File-> label:"G"
+    h: Image-> required:False
+"""
+
+
+def warmup_parsers():
+    """Build the calling thread's parsers and run a parse with each one"""
+    for file_support in (False, True):
+        get_parser(file_support)
+    parse_fields(WARMUP_DEFINITION, False)
+    parse_fields(WARMUP_FILE_DEFINITION, True)
+
+
+def warmup_params():
+    """Build the property tables of every Param class"""
+    for cls in FIELD_TO_PARAM.values():
+        cls._property_types()
+        cls._property_defaults()
+
+
+def common_definitions(label, count):
+    """
+    Return the count most common definitions stored in a ParamField
+
+    Arguments:
+        label (str): 'app_label.Model.field'
+        count (int):
+    """
+    from .models import get_param_field, _deferred_parsing # Solve circular import
+    model, field = get_param_field(label)
+    rows = model._default_manager.exclude(**{field.attname+'__isnull': True})\
+        .values(field.attname).annotate(rows=Count('pk')).order_by('-rows')
+
+    # Load raw strings
+    _deferred_parsing.fields = frozenset((id(field),))
+    try:
+        return field, [row[field.attname] for row in rows[:count]]
+    finally:
+        _deferred_parsing.fields = ()
+
+
+def preload_definitions(labels, count):
+    """
+    Parse the most common definitions of each field into the definition
+    cache, returns the number of definitions loaded.
+    """
+    loaded = 0
+    for label in labels:
+        field, sources = common_definitions(label, count)
+        for source in sources:
+            # from_db_value isn't used so invalid definitions aren't quarantined
+            if definition_cache.get(source, field._file_support) is not None:
+                continue
+            try:
+                definition_cache.load(source, field._file_support)
+                loaded += 1
+            except (ParseBaseException, ValueError):
+                pass
+    return loaded
+
+
+def warmup():
+    """
+    Run warmup, returns a {step: seconds} dict with the time taken by each
+    step, also logged to the 'param_field.warmup' logger.
+    """
+    timings = {}
+    start = time.perf_counter()
+    warmup_parsers()
+    timings['parsers'] = time.perf_counter()-start
+
+    step = time.perf_counter()
+    warmup_params()
+    timings['params'] = time.perf_counter()-step
+
+    labels = settings.PARAM_WARMUP_FIELDS
+    preloaded = 0
+    if labels and not definition_cache.enabled:
+        logger.warning("PARAM_WARMUP_FIELDS ignored, definitions can only be "
+                "preloaded when PARAM_CACHE_SIZE, PARAM_SHARED_CACHE_PATH or "
+                "PARAM_CACHE_ALIAS are enabled")
+    elif labels:
+        step = time.perf_counter()
+        try:
+            preloaded = preload_definitions(labels, settings.PARAM_WARMUP_DEFINITIONS)
+        except (DatabaseError, LookupError, ValueError) as err:
+            logger.warning("Couldn't preload definitions: %s", err)
+        finally:
+            # Connections opened by the master must not be shared by the
+            # forked workers
+            for connection in connections.all():
+                if not connection.in_atomic_block:
+                    connection.close()
+        timings['definitions'] = time.perf_counter()-step
+
+    timings['total'] = time.perf_counter()-start
+    logger.info("param_field warmup %.1fms (%s), %d definitions preloaded",
+        timings['total']*1000, ' '.join('{}={:.1f}ms'.format(name, t*1000)
+            for name, t in sorted(timings.items()) if name != 'total'),
+        preloaded)
+    return timings
@@ -41,7 +41,8 @@ setup(
         'Topic :: Internet :: WWW/HTTP',], 
 
 	# Package
-        packages = ['param_field', 'param_field/tests/'],
+        packages = ['param_field', 'param_field/tests/', 'param_field/management/',
+            'param_field/management/commands/'],
         install_requires = ['Django', 'pyparsing', 'unittest2'],
 	zip_safe = False, 
 	include_package_data=True,